@@ -0,0 +1,69 @@
+"""
+Benchmark - quickfill confusion matrix of KpiCounts vs the former per-pair loop
+
+The former analyzer scanned the rows once per (true, predicted) label pair,
+O(labels^2 * rows); KpiCounts counts the pairs in one np.bincount pass.
+Both matrices are built from the same random labels and compared.
+
+    python -m benchmarks.confusion_matrix --rows 100000 --labels 40
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from utils.analysis import analyzer
+from utils.config import config
+from utils.metrics import KpiCounts
+
+
+def random_results(rows: int, labels: int, seed: int = 0) -> pd.DataFrame:
+    """SR creations only, with 60% of the quickfills predicted right"""
+    rng = np.random.default_rng(seed)
+    names = np.array([f"QF {idx:02d}" for idx in range(labels)], dtype=object)
+    true_codes = rng.integers(0, labels, rows)
+    pred_codes = np.where(rng.random(rows) < 0.6, true_codes, rng.integers(0, labels, rows))
+    return pd.DataFrame({
+        config.analysis["sr_id_column"]: np.arange(1, rows + 1),
+        config.analysis["ground_truth_quickfill_column"]: names[true_codes],
+        config.analysis["predicted_opening_column"]: config.analysis["sr_labels"]["creation"],
+        config.analysis["predicted_quickfill_column"]: names[pred_codes],
+    })
+
+
+def per_pair_matrix(y_true: pd.Series, y_pred: pd.Series) -> dict:
+    """The former implementation: one boolean scan per label pair"""
+    all_labels = sorted(set(y_true.unique()) | set(y_pred.unique()))
+    return {
+        str(true_label): {
+            str(pred_label): int(((y_true == true_label) & (y_pred == pred_label)).sum())
+            for pred_label in all_labels
+        }
+        for true_label in all_labels
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the quickfill confusion matrix")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--labels", type=int, default=40)
+    parser.add_argument("--skip-baseline", action="store_true", help="Do not time the former per-pair loop")
+    args = parser.parse_args()
+
+    df = random_results(args.rows, args.labels)
+
+    started = time.perf_counter()
+    analysis = analyzer.analyze_counts("benchmark", KpiCounts.from_frame(df))
+    elapsed = time.perf_counter() - started
+    matrix = analysis['quickfill_analysis']['confusion_matrix']['matrix']
+    print(f"bincount ({args.rows:,} rows, {args.labels} labels): {elapsed * 1000:.1f} ms")
+
+    if not args.skip_baseline:
+        started = time.perf_counter()
+        expected = per_pair_matrix(df[config.analysis["ground_truth_quickfill_column"]],
+                                   df[config.analysis["predicted_quickfill_column"]])
+        elapsed = time.perf_counter() - started
+        print(f"per-pair loop: {elapsed:.1f} s, identical matrices: {matrix == expected}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,12 @@
 import streamlit as st
+import time
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
 from utils.config import config
+from utils.estimator import estimate_run
 from utils.storage import storage
 from utils.models import TestResult
-from utils.classifier import run_classifier
-from utils.analysis import analyzer
+from utils.jobs import ensure_workers
 
 st.set_page_config(page_title="New Test", page_icon="📝", layout="wide")
 
@@ -34,7 +35,7 @@ st.markdown("Configure and start a new email classification test")
 
 # Check if we have a running test in session state
 if 'running_test_id' in st.session_state:
-    st.info("A test is currently running. Check the results in Test History.")
+    st.info("A test is running in the background. You can leave this page, it will keep running.")
     if st.button("View Test Results"):
         st.session_state['selected_test_id'] = st.session_state['running_test_id']
         st.switch_page("pages/3_📊_Test_Results.py")
@@ -50,7 +51,7 @@ with st.form("new_test_form"):
         source_path = st.text_input(
             "Source Path *",
             placeholder="/path/to/emails.csv or /path/to/folder",
-            help="Path to source file (.csv, .xlsx) or folder containing dataframes"
+            help="Path to source file (.csv, .xlsx, .parquet) or folder containing dataframes"
         )
 
     with col2:
@@ -60,6 +61,13 @@ with st.form("new_test_form"):
             help="Path where results will be saved"
         )
 
+        output_format = st.selectbox(
+            "Result Format",
+            options=['same', 'csv', 'xlsx', 'parquet'],
+            format_func=lambda fmt: "Same as source" if fmt == 'same' else fmt.upper(),
+            help="Format of the *_result files. Parquet is much smaller and faster to analyze."
+        )
+
     st.markdown('<div class="section-header">⚙️ Classification Settings</div>', unsafe_allow_html=True)
 
     mode = st.radio(
@@ -88,12 +96,40 @@ with st.form("new_test_form"):
             help="Apply data filtering before classification"
         )
 
+        collapse_near_duplicates = st.checkbox(
+            "Collapse Near-Duplicates",
+            value=False,
+            help="Classify one email per cluster of near-identical emails (reply chains, notifications) "
+                 "and copy its labels to the rest"
+        )
+
+        cascade = st.checkbox(
+            "Local Model Cascade",
+            value=False,
+            help="Label confident SR / Archive cases with a local TF-IDF model trained on past results; "
+                 "only uncertain emails go to the LLM (SR and Both modes)"
+        )
+
         async_mode = st.checkbox(
             "Async Mode",
             value=config.DEFAULT_ASYNC_MODE,
             help="Run predictions in parallel for faster processing"
         )
 
+        streaming = st.checkbox(
+            "Streaming Mode",
+            value=False,
+            help=f"Read, classify and write files in chunks of {config.CHUNK_SIZE:,} rows "
+                 "to keep memory bounded on very large files"
+        )
+
+        sample_mode = st.selectbox(
+            "Stratified Sample",
+            options=["Off", "Rows per file", "Fraction of each file"],
+            help="Classify only a sample of each desk file, stratified by ground truth SR / Archive, "
+                 "for a quick estimate with confidence intervals"
+        )
+
     with col2:
         max_concurrency = st.slider(
             "Max Concurrency",
@@ -104,10 +140,67 @@ with st.form("new_test_form"):
             help="Number of parallel predictions (only applies if async mode is enabled)"
         )
 
+        adaptive_concurrency = st.checkbox(
+            "Adaptive Concurrency",
+            value=False,
+            disabled=not async_mode,
+            help="Start at Max Concurrency, then raise the limit while responses stay fast and back off "
+                 f"on throttling (up to {config.MAX_CONCURRENCY_LIMIT})"
+        )
+
+        hedging = st.checkbox(
+            "Hedge Slow Requests",
+            value=False,
+            help="Send a duplicate of any request slower than the p95 latency seen so far; "
+                 "the first answer wins"
+        )
+
+        batch_size = st.number_input(
+            "Emails per Request",
+            min_value=0,
+            max_value=50,
+            value=0,
+            help="Number of emails packed into one LLM request (0 = default of the selected mode: "
+                 + ", ".join(f"{m}={n}" for m, n in config.llm["batch_size"].items()) + ")"
+        )
+
+        sample_rows = st.number_input(
+            "Sample Rows",
+            min_value=1,
+            value=config.sampling["default_rows"],
+            step=100,
+            help="Filtered emails classified per desk file (Stratified Sample: Rows per file)"
+        )
+
+        sample_fraction = st.number_input(
+            "Sample Fraction",
+            min_value=0.01,
+            max_value=1.0,
+            value=float(config.sampling["default_fraction"]),
+            step=0.05,
+            help="Share of the filtered emails of each desk file that is classified "
+                 "(Stratified Sample: Fraction of each file)"
+        )
+
+    # At most one of the two sample sizes applies
+    if sample_mode == "Rows per file":
+        sample_options = {'sample_rows': int(sample_rows)}
+    elif sample_mode == "Fraction of each file":
+        sample_options = {'sample_fraction': sample_fraction}
+    else:
+        sample_options = {}
+
     st.divider()
 
     col1, col2, col3 = st.columns([2, 1, 1])
 
+    with col1:
+        estimate_button = st.form_submit_button(
+            "🧮 Estimate Cost & Duration",
+            help="Dry run: scan and filter the source files, count tokens and project LLM calls, "
+                 "cost and duration from the latency of past tests"
+        )
+
     with col2:
         submit_button = st.form_submit_button(
             "🚀 Start Test",
@@ -121,12 +214,62 @@ with st.form("new_test_form"):
             use_container_width=True
         )
 
+# Pre-flight estimate
+if estimate_button:
+    if not source_path:
+        st.error("❌ Please fill in the Source Path")
+    else:
+        try:
+            with st.spinner("Scanning source files..."):
+                estimate = estimate_run(
+                    source_path,
+                    mode=mode,
+                    use_filter=use_filter,
+                    max_concurrency=max_concurrency if async_mode else 1,
+                    batch_size=batch_size or None,
+                    **sample_options
+                )
+        except ValueError as e:
+            st.error(f"❌ {e}")
+        else:
+            st.markdown('<div class="section-header">🧮 Estimate</div>', unsafe_allow_html=True)
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric(
+                    "Emails to Classify",
+                    f"{estimate['classified_total']:,}",
+                    help=f"{estimate['original_total']:,} emails in {len(estimate['files'])} file(s) "
+                         f"before filtering"
+                )
+            with col2:
+                st.metric(
+                    "LLM Calls",
+                    f"{sum(estimate['llm_calls'].values()):,}",
+                    help=", ".join(f"{task.upper()}: {calls:,}" for task, calls in estimate['llm_calls'].items())
+                         + f" ({estimate['batch_size']} emails per request)"
+                )
+            with col3:
+                st.metric(
+                    "Cost",
+                    f"{estimate['cost']:,.2f} {estimate['currency']}",
+                    help=f"{estimate['prompt_tokens']:,} prompt + {estimate['completion_tokens']:,} "
+                         "completion tokens (upper bound)"
+                )
+            with col4:
+                st.metric(
+                    "Duration",
+                    str(timedelta(seconds=round(estimate['duration_seconds']))),
+                    help=f"{estimate['latency_ms']:,.0f} ms per call ({estimate['latency_source']}); "
+                         f"limited by {estimate['bottleneck'].replace('_', ' ')}"
+                )
+            st.caption("Assumes no prediction cache hits, cascade or near-duplicate savings.")
+
 # Handle form submission
 if submit_button:
     if not source_path or not out_path:
         st.error("❌ Please fill in both Source Path and Output Path")
     else:
-        # Create test record
+        # Create test record - background workers pick up pending tests
         test_id = str(uuid.uuid4())
         test = TestResult(
             test_id=test_id,
@@ -135,90 +278,60 @@ if submit_button:
             out_path=out_path,
             mode=mode,
             use_filter=use_filter,
+            collapse_near_duplicates=collapse_near_duplicates,
+            cascade=cascade,
             async_mode=async_mode,
             max_concurrency=max_concurrency,
-            created_at=datetime.now().isoformat()
+            adaptive_concurrency=adaptive_concurrency and async_mode,
+            hedging=hedging,
+            output_format=output_format,
+            **sample_options,
+            created_at=datetime.now().isoformat(),
+            batch_size=batch_size or None,
+            streaming=streaming
         )
 
         storage.save_test(test)
-
-        # Update status to running
-        test.status = 'running'
-        test.started_at = datetime.now().isoformat()
-        storage.save_test(test)
-
-        # Create progress tracking UI
-        progress_bar = st.progress(0, text="Starting classification...")
-        status_text = st.empty()
-
-        def update_progress(current: int, total: int, message: str):
-            """Callback to update progress bar and status"""
-            progress = current / total
-            progress_bar.progress(progress, text=f"🔄 [{current}/{total}] {message}")
-            status_text.info(f"Processing file {current} of {total}: {message}")
-
-        try:
-            # Run classifier with progress callback
-            results = run_classifier(
-                source_path=source_path,
-                out_path=out_path,
-                mode=mode,
-                use_filter=use_filter,
-                async_mode=async_mode,
-                max_concurrency=max_concurrency,
-                progress_callback=update_progress
-            )
-
-            # Clear progress indicators
-            progress_bar.empty()
-            status_text.empty()
-
-            # Update test with basic results
-            test.total_emails = results.get('total_emails', 0)
-            test.processed_emails = results.get('processed_emails', 0)
-            test.sr_positive = results.get('sr_positive')
-            test.sr_negative = results.get('sr_negative')
-            test.category_breakdown = results.get('category_breakdown')
-
-            # Run detailed analysis on output files
-            with st.spinner("📊 Running detailed analysis on prediction results..."):
-                try:
-                    # Get pre-filter stats from run_classifier return
-                    file_stats = results.get('file_stats')
-
-                    # Analyze with pre-filter stats
-                    file_analyses = analyzer.analyze_test_results(out_path, file_stats=file_stats)
-                    test.file_analyses = file_analyses
-                    st.success(f"✅ Analyzed {len(file_analyses)} file(s)")
-                except Exception as analysis_error:
-                    st.warning(f"⚠️ Analysis completed with warnings: {str(analysis_error)}")
-                    test.file_analyses = None
-
-            # Mark as completed
-            test.status = 'completed'
-            test.completed_at = datetime.now().isoformat()
-            storage.save_test(test)
-
+        st.session_state['running_test_id'] = test_id
+
+        if ensure_workers():
+            st.caption("Started background job runner")
+
+        st.success("✅ Test submitted! It will run in the background.")
+
+# Live progress for the submitted test
+poll_running_test = False
+running_test_id = st.session_state.get('running_test_id')
+if running_test_id:
+    running_test = storage.get_test(running_test_id)
+
+    if running_test is None:
+        st.session_state.pop('running_test_id', None)
+    elif running_test.status in ['pending', 'running']:
+        if running_test.status == 'pending':
+            st.progress(0, text="⏳ Waiting for a worker...")
+        else:
+            current = running_test.progress_current or 0
+            total = running_test.progress_total or 0
+            progress = min(current / total, 1.0) if total else 0
+            message = running_test.progress_message or "Starting classification..."
+            st.progress(progress, text=f"🔄 [{current}/{total}] {message}")
+        poll_running_test = True
+    else:
+        st.session_state.pop('running_test_id', None)
+        st.session_state['selected_test_id'] = running_test_id
+
+        if running_test.status == 'completed':
+            if running_test.file_analyses:
+                st.success(f"✅ Analyzed {len(running_test.file_analyses)} file(s)")
+            if running_test.analysis_error:
+                st.warning(f"⚠️ Detailed analysis failed: {running_test.analysis_error}")
             st.success("✅ Test completed successfully!")
             st.balloons()
+        else:
+            st.error(f"❌ Test failed: {running_test.error_message}")
 
-            # Redirect to results
-            if st.button("📊 View Results"):
-                st.session_state['selected_test_id'] = test_id
-                st.switch_page("pages/3_📊_Test_Results.py")
-
-        except Exception as e:
-            # Clear progress indicators
-            progress_bar.empty()
-            status_text.empty()
-
-            # Update status to failed
-            test.status = 'failed'
-            test.completed_at = datetime.now().isoformat()
-            test.error_message = str(e)
-            storage.save_test(test)
-
-            st.error(f"❌ Test failed: {str(e)}")
+        st.page_link("pages/3_📊_Test_Results.py", label="📊 View Results")
 
 if cancel_button:
     st.switch_page("Home.py")
@@ -248,3 +361,8 @@ with st.sidebar:
         st.write(f"**Filters:** {'Enabled' if config.DEFAULT_USE_FILTER else 'Disabled'}")
         st.write(f"**Async:** {'Enabled' if config.DEFAULT_ASYNC_MODE else 'Disabled'}")
         st.write(f"**Concurrency:** {config.DEFAULT_MAX_CONCURRENCY}")
+
+# Poll storage until the background worker finishes
+if poll_running_test:
+    time.sleep(config.JOB_POLL_INTERVAL)
+    st.rerun()
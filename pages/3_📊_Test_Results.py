@@ -3,6 +3,10 @@ import plotly.graph_objects as go
 import plotly.express as px
 import pandas as pd
 from datetime import datetime
+from utils.analysis import analyzer
+from utils.config import config
+from utils.jobs import ensure_workers
+from utils.metrics import KpiCounts
 from utils.storage import storage
 
 st.set_page_config(page_title="Test Results", page_icon="📊", layout="wide")
@@ -48,124 +52,103 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Get test ID from session state
-test_id = st.session_state.get('selected_test_id')
-
-if not test_id:
-    st.warning("⚠️ No test selected. Please select a test from the history page.")
-    if st.button("📚 Go to Test History"):
-        st.switch_page("pages/2_📚_Test_History.py")
-    st.stop()
-
-# Load test
-test = storage.get_test(test_id)
-
-if not test:
-    st.error("❌ Test not found")
-    st.stop()
-
-# Header
-st.title("📊 Test Results")
-
-status_class = f"status-{test.status}"
-st.markdown(f'<span class="status-badge {status_class}">{test.status.upper()}</span>', unsafe_allow_html=True)
-
-# Running indicator
-if test.status in ['pending', 'running']:
-    st.info("🔄 Test is still running. Results will appear here when complete.")
-    if st.button("🔄 Refresh"):
-        st.rerun()
-
-# Test Information
-st.markdown('<div class="section-header">ℹ️ Test Information</div>', unsafe_allow_html=True)
-
-col1, col2, col3, col4 = st.columns(4)
-
-with col1:
-    st.metric("Test ID", test.test_id[:8] + "...")
-    st.caption(f"Mode: **{test.mode.upper()}**")
-
-with col2:
-    created = datetime.fromisoformat(test.created_at)
-    st.metric("Created", created.strftime('%Y-%m-%d'))
-    st.caption(created.strftime('%H:%M:%S'))
-
-with col3:
-    if test.started_at and test.completed_at:
-        start = datetime.fromisoformat(test.started_at)
-        end = datetime.fromisoformat(test.completed_at)
-        duration = (end - start).total_seconds()
-        st.metric("Duration", f"{duration:.1f}s")
-    else:
-        st.metric("Duration", "N/A")
-
-with col4:
-    st.metric("Total Emails", test.total_emails or 0)
-
-# Paths
-with st.expander("📁 File Paths"):
-    st.text(f"Source: {test.source_path}")
-    st.text(f"Output: {test.out_path}")
-
-# Configuration
-st.markdown('<div class="section-header">⚙️ Configuration</div>', unsafe_allow_html=True)
-
-col1, col2, col3 = st.columns(3)
-with col1:
-    st.metric("Use Filter", "✓ Enabled" if test.use_filter else "✗ Disabled")
-with col2:
-    st.metric("Async Mode", "✓ Enabled" if test.async_mode else "✗ Disabled")
-with col3:
-    st.metric("Max Concurrency", test.max_concurrency)
-
-# Per-File Detailed Analysis
-if test.status == 'completed' and test.file_analyses:
-    st.markdown('<div class="section-header">📈 Detailed Analysis (Per File)</div>', unsafe_allow_html=True)
-
-    # Summary stats across all files
-    total_files = len(test.file_analyses)
-    successful_analyses = sum(1 for f in test.file_analyses if f.get('status') == 'success')
+def interval_text(interval, level):
+    """Metric delta text for a confidence interval (None hides the delta)"""
+    if not interval:
+        return None
+    return f"{level:.0%} CI: {interval[0]:.1%} – {interval[1]:.1%}"
 
-    st.info(f"📁 **{successful_analyses}/{total_files}** files analyzed successfully")
 
-    # Tabs for each file
-    if successful_analyses > 0:
-        file_tabs = st.tabs([f"📄 {analysis['file_name']}" for analysis in test.file_analyses if analysis.get('status') == 'success'])
+def display_live_kpis(live_metrics: dict, mode: str):
+    """Precision / accuracy of the emails classified so far, from the counts of the running classifier"""
+    counts = KpiCounts()
+    for file_counts in live_metrics.values():
+        counts.merge(KpiCounts.from_dict(file_counts))
+    live = analyzer.analyze_counts("live", counts)
+    level = live['confidence_level']
+    sr_analysis = live['sr_analysis']
+    qf_analysis = live['quickfill_analysis']
 
-        for idx, analysis in enumerate([a for a in test.file_analyses if a.get('status') == 'success']):
-            with file_tabs[idx]:
-                display_file_analysis(analysis, test.mode)
-
-    # Show failed analyses
-    failed_analyses = [f for f in test.file_analyses if f.get('status') == 'failed']
-    if failed_analyses:
-        with st.expander("⚠️ Failed Analyses", expanded=False):
-            for failed in failed_analyses:
-                st.error(f"**{failed['file_name']}**: {failed.get('error', 'Unknown error')}")
-
-# Error message
-if test.status == 'failed' and test.error_message:
-    st.markdown('<div class="section-header">❌ Error Details</div>', unsafe_allow_html=True)
-    st.error(test.error_message)
-
-# Actions
-st.divider()
-col1, col2, col3 = st.columns(3)
+    kpis = []
+    if mode in ['sr', 'both']:
+        kpis += [
+            ("SR Creation Precision", sr_analysis['sr_creation_precision'], sr_analysis['sr_creation_precision_ci']),
+            ("Archive Precision", sr_analysis['archive_precision'], sr_analysis['archive_precision_ci']),
+            ("Overall Accuracy", sr_analysis['overall_accuracy'], sr_analysis['overall_accuracy_ci']),
+        ]
+    if mode in ['qf', 'both']:
+        kpis.append(("Quickfill Accuracy", qf_analysis['accuracy'], qf_analysis['accuracy_ci']))
 
-with col1:
-    if st.button("🔙 Back to History", use_container_width=True):
-        st.switch_page("pages/2_📚_Test_History.py")
+    st.markdown("#### ⏱️ Live KPIs")
+    st.caption(f"{counts.rows:,} emails classified so far in {len(live_metrics)} file(s)")
+    for column, (title, value, interval) in zip(st.columns(len(kpis)), kpis):
+        with column:
+            st.metric(
+                title,
+                f"{value:.2%}" if value is not None else "N/A",
+                delta=interval_text(interval, level),
+                delta_color="off"
+            )
 
-with col2:
-    if st.button("🆕 New Test", use_container_width=True):
-        st.switch_page("pages/1_📝_New_Test.py")
 
-with col3:
-    if st.button("🗑️ Delete Test", use_container_width=True, type="secondary"):
-        storage.delete_test(test_id)
-        st.success("Test deleted!")
-        st.session_state.pop('selected_test_id', None)
-        st.switch_page("pages/2_📚_Test_History.py")
+def display_confusion_matrix(confusion_matrix: dict, axis_name: str):
+    """Confusion matrix heatmap, with the counts as a table"""
+    labels = confusion_matrix.get('labels', [])
+    matrix_data = confusion_matrix.get('matrix', {})
+
+    # Create matrix for heatmap
+    matrix_values = []
+    for true_label in labels:
+        row = []
+        for pred_label in labels:
+            row.append(matrix_data.get(true_label, {}).get(pred_label, 0))
+        matrix_values.append(row)
+
+    # Heatmap
+    fig = go.Figure(data=go.Heatmap(
+        z=matrix_values,
+        x=[f"Pred: {l}" for l in labels],
+        y=[f"True: {l}" for l in labels],
+        colorscale='Blues',
+        text=matrix_values,
+        texttemplate='%{text}',
+        textfont={"size": 10},
+        colorbar=dict(title="Count")
+    ))
+    fig.update_layout(
+        title="Confusion Matrix",
+        xaxis_title=f"Predicted {axis_name}",
+        yaxis_title=f"Ground Truth {axis_name}",
+        height=max(400, len(labels) * 40),
+        xaxis_tickangle=-45
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+    # Show matrix as table
+    with st.expander("📋 View as Table"):
+        df_matrix = pd.DataFrame(matrix_values, index=labels, columns=labels)
+        st.dataframe(df_matrix, use_container_width=True)
+
+
+def display_per_class_metrics(per_class: dict):
+    """Precision / recall / F1 / support table of each label"""
+    if not per_class:
+        return
+    with st.expander("🎯 Per-Class Metrics"):
+        st.dataframe(
+            pd.DataFrame([
+                {
+                    'Label': label,
+                    'Precision': metrics['precision'],
+                    'Recall': metrics['recall'],
+                    'F1': metrics['f1'],
+                    'Support': metrics['support'],
+                }
+                for label, metrics in per_class.items()
+            ]),
+            use_container_width=True,
+            hide_index=True
+        )
 
 
 def display_file_analysis(analysis: dict, mode: str):
@@ -176,6 +159,8 @@ def display_file_analysis(analysis: dict, mode: str):
     qf_analysis = analysis.get('quickfill_analysis', {})
     original_stats = analysis.get('original_stats', {})
     filtered_total = analysis.get('filtered_total')
+    sampled_total = analysis.get('sampled_total')
+    level = analysis.get('confidence_level', config.sampling["confidence_level"])
 
     # Basic Statistics
     st.markdown("#### 📊 Basic Statistics")
@@ -229,6 +214,23 @@ def display_file_analysis(analysis: dict, mode: str):
                 basic_stats.get('gt_sr_archive_count', 0),
                 help="Ground truth archives in filtered data"
             )
+
+        if sampled_total is not None:
+            st.caption(
+                f"🎲 Stratified sample: {sampled_total:,} of {filtered:,} filtered emails classified; "
+                "KPIs below are estimates with confidence intervals"
+            )
+
+        filter_stats = analysis.get('filter_stats')
+        if filter_stats:
+            st.caption("Rows removed per filter rule (in rule order)")
+            st.dataframe(
+                pd.DataFrame(
+                    [{'Rule': rule, 'Rows Removed': removed} for rule, removed in filter_stats.items()]
+                ),
+                use_container_width=True,
+                hide_index=True
+            )
     else:
         # No original stats, just show filtered stats
         col1, col2, col3 = st.columns(3)
@@ -275,6 +277,8 @@ def display_file_analysis(analysis: dict, mode: str):
                 st.metric(
                     "SR Creation Precision",
                     f"{sr_prec:.2%}",
+                    delta=interval_text(sr_analysis.get('sr_creation_precision_ci'), level),
+                    delta_color="off",
                     help="Of all predicted SR, how many are actually SR?"
                 )
             else:
@@ -286,6 +290,8 @@ def display_file_analysis(analysis: dict, mode: str):
                 st.metric(
                     "Archive Precision",
                     f"{arch_prec:.2%}",
+                    delta=interval_text(sr_analysis.get('archive_precision_ci'), level),
+                    delta_color="off",
                     help="Of all predicted Archive, how many are actually Archive?"
                 )
             else:
@@ -297,6 +303,8 @@ def display_file_analysis(analysis: dict, mode: str):
                 st.metric(
                     "Overall Accuracy",
                     f"{accuracy:.2%}",
+                    delta=interval_text(sr_analysis.get('overall_accuracy_ci'), level),
+                    delta_color="off",
                     help="Accuracy excluding Review predictions"
                 )
             else:
@@ -321,6 +329,37 @@ def display_file_analysis(analysis: dict, mode: str):
             )
             st.plotly_chart(fig, use_container_width=True)
 
+        # Confusion Matrix (Review has no ground truth: its row stays empty)
+        sr_confusion_matrix = sr_analysis.get('confusion_matrix')
+        if sr_confusion_matrix:
+            st.markdown("##### 🔀 Confusion Matrix (Ground Truth vs Predicted)")
+            display_confusion_matrix(sr_confusion_matrix, "SR Opening")
+            display_per_class_metrics(sr_analysis.get('per_class'))
+
+        # Cascade stages
+        cascade_analysis = analysis.get('cascade_analysis')
+        if cascade_analysis:
+            st.markdown("##### 🪜 Cascade Stages")
+            stages = cascade_analysis.get('stages', {})
+            col1, col2, col3 = st.columns(3)
+
+            with col1:
+                saved = cascade_analysis.get('llm_calls_saved')
+                st.metric(
+                    "LLM Calls Saved",
+                    f"{saved:.2%}" if saved is not None else "N/A",
+                    help="Share of emails labelled by the local model"
+                )
+            for column, (stage, title) in zip([col2, col3], [('local', "Local Model"), ('llm', "LLM")]):
+                with column:
+                    stage_stats = stages.get(stage, {})
+                    stage_accuracy = stage_stats.get('accuracy')
+                    st.metric(
+                        f"{title} Accuracy",
+                        f"{stage_accuracy:.2%}" if stage_accuracy is not None else "N/A",
+                        help=f"SR opening accuracy of the {stage_stats.get('count', 0)} emails labelled at this stage"
+                    )
+
     # Quickfill Analysis
     if mode in ['qf', 'both']:
         st.markdown("#### 🏷️ Quickfill Analysis")
@@ -333,7 +372,12 @@ def display_file_analysis(analysis: dict, mode: str):
             st.metric("Total Quickfills Predicted", total_qf)
         with col2:
             if qf_accuracy is not None:
-                st.metric("Quickfill Accuracy", f"{qf_accuracy:.2%}")
+                st.metric(
+                    "Quickfill Accuracy",
+                    f"{qf_accuracy:.2%}",
+                    delta=interval_text(qf_analysis.get('accuracy_ci'), level),
+                    delta_color="off"
+                )
             else:
                 st.metric("Quickfill Accuracy", "N/A")
 
@@ -378,41 +422,284 @@ def display_file_analysis(analysis: dict, mode: str):
         if confusion_matrix:
             st.markdown("##### 🔀 Confusion Matrix (Ground Truth vs Predicted)")
 
-            labels = confusion_matrix.get('labels', [])
-            matrix_data = confusion_matrix.get('matrix', {})
-
-            # Create matrix for heatmap
-            matrix_values = []
-            for true_label in labels:
-                row = []
-                for pred_label in labels:
-                    row.append(matrix_data.get(true_label, {}).get(pred_label, 0))
-                matrix_values.append(row)
-
-            # Heatmap
-            fig = go.Figure(data=go.Heatmap(
-                z=matrix_values,
-                x=[f"Pred: {l}" for l in labels],
-                y=[f"True: {l}" for l in labels],
-                colorscale='Blues',
-                text=matrix_values,
-                texttemplate='%{text}',
-                textfont={"size": 10},
-                colorbar=dict(title="Count")
-            ))
-            fig.update_layout(
-                title="Confusion Matrix",
-                xaxis_title="Predicted Quickfill",
-                yaxis_title="Ground Truth Quickfill",
-                height=max(400, len(labels) * 40),
-                xaxis_tickangle=-45
+            display_confusion_matrix(confusion_matrix, "Quickfill")
+            display_per_class_metrics(qf_analysis.get('per_class'))
+
+
+# Get test ID from session state
+test_id = st.session_state.get('selected_test_id')
+
+if not test_id:
+    st.warning("⚠️ No test selected. Please select a test from the history page.")
+    if st.button("📚 Go to Test History"):
+        st.switch_page("pages/2_📚_Test_History.py")
+    st.stop()
+
+# Load test
+test = storage.get_test(test_id)
+
+if not test:
+    st.error("❌ Test not found")
+    st.stop()
+
+# Header
+st.title("📊 Test Results")
+
+status_class = f"status-{test.status}"
+st.markdown(f'<span class="status-badge {status_class}">{test.status.upper()}</span>', unsafe_allow_html=True)
+
+# Running indicator
+if test.status in ['pending', 'running']:
+    if test.status == 'pending':
+        st.info("⏳ Test is queued and waiting for a background worker.")
+    else:
+        st.info("🔄 Test is still running. Results will appear here when complete.")
+        if test.progress_total:
+            current = test.progress_current or 0
+            st.progress(
+                min(current / test.progress_total, 1.0),
+                text=f"[{current}/{test.progress_total}] {test.progress_message or ''}"
+            )
+        if test.heartbeat_at:
+            st.caption(f"Worker: {test.worker_id} · last heartbeat {datetime.fromisoformat(test.heartbeat_at).strftime('%H:%M:%S')}")
+        if test.live_metrics:
+            display_live_kpis(test.live_metrics, test.mode)
+    if st.button("🔄 Refresh"):
+        st.rerun()
+
+# Test Information
+st.markdown('<div class="section-header">ℹ️ Test Information</div>', unsafe_allow_html=True)
+
+col1, col2, col3, col4 = st.columns(4)
+
+with col1:
+    st.metric("Test ID", test.test_id[:8] + "...")
+    st.caption(f"Mode: **{test.mode.upper()}**")
+
+with col2:
+    created = datetime.fromisoformat(test.created_at)
+    st.metric("Created", created.strftime('%Y-%m-%d'))
+    st.caption(created.strftime('%H:%M:%S'))
+
+with col3:
+    if test.started_at and test.completed_at:
+        start = datetime.fromisoformat(test.started_at)
+        end = datetime.fromisoformat(test.completed_at)
+        duration = (end - start).total_seconds()
+        st.metric("Duration", f"{duration:.1f}s")
+    else:
+        st.metric("Duration", "N/A")
+
+with col4:
+    st.metric("Total Emails", test.total_emails or 0)
+
+# Paths
+with st.expander("📁 File Paths"):
+    st.text(f"Source: {test.source_path}")
+    st.text(f"Output: {test.out_path}")
+
+# Configuration
+st.markdown('<div class="section-header">⚙️ Configuration</div>', unsafe_allow_html=True)
+
+col1, col2, col3, col4 = st.columns(4)
+with col1:
+    st.metric("Use Filter", "✓ Enabled" if test.use_filter else "✗ Disabled")
+    if test.collapse_near_duplicates:
+        st.caption("Near-duplicates collapsed")
+    if test.cascade:
+        st.caption("Local model cascade")
+    if test.sample_fraction is not None:
+        st.caption(f"Stratified sample of {test.sample_fraction:.0%} per file")
+    if test.sample_rows is not None:
+        st.caption(f"Stratified sample of {test.sample_rows:,} emails per file")
+with col2:
+    st.metric("Async Mode", "✓ Enabled" if test.async_mode else "✗ Disabled")
+    if test.streaming:
+        st.caption("Streaming mode (chunked I/O)")
+with col3:
+    st.metric("Max Concurrency", test.max_concurrency)
+    if test.adaptive_concurrency:
+        st.caption("Adaptive (starting value)")
+with col4:
+    st.metric("Emails per Request", test.batch_size or config.llm["batch_size"][test.mode])
+    if test.output_format != 'same':
+        st.caption(f"Results written as {test.output_format.upper()}")
+
+# LLM usage
+if test.prediction_stats:
+    st.markdown('<div class="section-header">🤖 LLM Usage</div>', unsafe_allow_html=True)
+
+    stats = test.prediction_stats
+    lookups = (test.cache_hits or 0) + (test.cache_misses or 0)
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("LLM Requests", stats.get('requests', 0))
+    with col2:
+        st.metric("Failed Requests", stats.get('failures', 0))
+        if stats.get('collapsed_predictions'):
+            st.caption(f"{stats['collapsed_predictions']:,} predictions copied from near-duplicates")
+    with col3:
+        st.metric(
+            "Cache Hits",
+            test.cache_hits or 0,
+            help="Predictions reused from the prediction cache"
+        )
+        if lookups:
+            st.caption(f"Hit rate: {(test.cache_hits or 0) / lookups:.1%}")
+    with col4:
+        st.metric("Tokens", stats.get('prompt_tokens', 0) + stats.get('completion_tokens', 0))
+        if stats.get('trimmed_emails'):
+            st.caption(
+                f"{stats['trimmed_emails']:,} emails truncated to the token budget "
+                f"(~{stats.get('trimmed_tokens', 0):,} tokens removed)"
             )
-            st.plotly_chart(fig, use_container_width=True)
 
-            # Show matrix as table
-            with st.expander("📋 View as Table"):
-                df_matrix = pd.DataFrame(matrix_values, index=labels, columns=labels)
-                st.dataframe(df_matrix, use_container_width=True)
+    if test.latency_percentiles:
+        col1, col2, col3, col4 = st.columns(4)
+        for column, percentile in zip([col1, col2, col3], ['p50', 'p95', 'p99']):
+            with column:
+                value = test.latency_percentiles.get(percentile)
+                st.metric(
+                    f"Latency {percentile}",
+                    f"{value:,.0f} ms" if value is not None else "N/A",
+                    help="Prediction call latency, retries and hedges included, local rate limiting "
+                         "excluded (histogram bucket bound)"
+                )
+        with col4:
+            st.metric("Retries", stats.get('retries', 0))
+            if stats.get('rate_limit_wait_ms'):
+                st.caption(f"Queued by rate limits: {stats['rate_limit_wait_ms'] / 1000:,.1f} s in total")
+            if test.hedging:
+                st.caption(f"Hedged: {stats.get('hedged_requests', 0)} (won {stats.get('hedge_wins', 0)})")
+
+    # In-flight limit chosen by the adaptive controller over time
+    if test.concurrency_history:
+        fig = go.Figure()
+        for file_name, history in test.concurrency_history.items():
+            seconds, limits = zip(*history)
+            fig.add_trace(go.Scatter(x=seconds, y=limits, mode='lines', line_shape='hv', name=file_name))
+        fig.update_layout(
+            title="Adaptive Concurrency",
+            xaxis_title="Seconds since file start",
+            yaxis_title="In-flight limit",
+            height=300,
+            margin=dict(t=50, b=0, l=0, r=0)
+        )
+        st.plotly_chart(fig, use_container_width=True)
+
+# Text normalization stages
+if test.normalization_stats:
+    st.markdown("#### 🧹 Text Normalization")
+    st.caption("Run time and estimated tokens removed by each stage, before the prompt token budget")
+    st.dataframe(
+        pd.DataFrame([
+            {'Stage': stage, 'Time (ms)': round(counts.get('ms', 0)), 'Tokens Removed': counts.get('tokens_removed', 0)}
+            for stage, counts in test.normalization_stats.items()
+        ]),
+        use_container_width=True,
+        hide_index=True
+    )
+
+# Per-File Detailed Analysis
+if test.status == 'completed' and test.file_analyses:
+    st.markdown('<div class="section-header">📈 Detailed Analysis (Per File)</div>', unsafe_allow_html=True)
+
+    # Summary stats across all files
+    total_files = len(test.file_analyses)
+    successful_analyses = sum(1 for f in test.file_analyses if f.get('status') == 'success')
+
+    st.info(f"📁 **{successful_analyses}/{total_files}** files analyzed successfully")
+
+    # Tabs for the rollups across files (merged KPI counts) and for each file
+    if successful_analyses > 0:
+        successful = [a for a in test.file_analyses if a.get('status') == 'success']
+        rollups = []
+        if successful_analyses > 1:
+            overall = analyzer.rollup(successful)
+            if overall:
+                rollups.append(("🌐 All Files", overall))
+            rollups += [(f"🗂️ {group}", rollup) for group, rollup in analyzer.rollup_groups(successful).items()]
+
+        file_tabs = st.tabs(
+            [title for title, _ in rollups] + [f"📄 {analysis['file_name']}" for analysis in successful]
+        )
+        for tab, analysis in zip(file_tabs, [rollup for _, rollup in rollups] + successful):
+            with tab:
+                if 'files' in analysis:
+                    st.caption(f"KPIs of {analysis['files']} files combined")
+                display_file_analysis(analysis, test.mode)
+
+    # Show failed analyses
+    failed_analyses = [f for f in test.file_analyses if f.get('status') == 'failed']
+    if failed_analyses:
+        with st.expander("⚠️ Failed Analyses", expanded=False):
+            for failed in failed_analyses:
+                st.error(f"**{failed['file_name']}**: {failed.get('error', 'Unknown error')}")
+
+# Analysis error (the classification completed, its result files were not analyzed)
+if test.status == 'completed' and test.analysis_error:
+    st.markdown('<div class="section-header">⚠️ Analysis Error</div>', unsafe_allow_html=True)
+    st.warning(f"The detailed analysis failed: {test.analysis_error}. Use ♻️ Re-analyze to retry.")
+
+# Error message
+if test.status == 'failed' and test.error_message:
+    st.markdown('<div class="section-header">❌ Error Details</div>', unsafe_allow_html=True)
+    st.error(test.error_message)
+
+# Actions
+st.divider()
+col1, col2, col3, col4, col5 = st.columns(5)
+
+with col1:
+    if st.button("🔙 Back to History", use_container_width=True):
+        st.switch_page("pages/2_📚_Test_History.py")
+
+with col2:
+    if st.button("🆕 New Test", use_container_width=True):
+        st.switch_page("pages/1_📝_New_Test.py")
+
+with col3:
+    if st.button(
+        "▶️ Resume Test",
+        use_container_width=True,
+        disabled=test.status != 'failed',
+        help="Finish only the rows not checkpointed by the interrupted run, then run the analysis"
+    ):
+        storage.update_test(
+            test_id,
+            status='pending',
+            resume=True,
+            error_message=None,
+            completed_at=None,
+            progress_message=None,
+        )
+        ensure_workers()
+        st.rerun()
+
+with col4:
+    if st.button(
+        "♻️ Re-analyze",
+        use_container_width=True,
+        disabled=test.status != 'completed',
+        help="Recompute the KPIs of the result files; unchanged files are served from the analysis cache"
+    ):
+        # Tests saved before file_stats was stored keep the pre-filter stats of their last analysis
+        file_stats = test.file_stats or analyzer.file_stats_from_analyses(test.file_analyses or [])
+        try:
+            with st.spinner("Analyzing result files..."):
+                file_analyses = analyzer.analyze_test_results(test.out_path, file_stats=file_stats)
+        except ValueError as e:
+            st.error(f"❌ {e}")
+        else:
+            storage.update_test(test_id, file_analyses=file_analyses, analysis_error=None)
+            st.rerun()
+
+with col5:
+    if st.button("🗑️ Delete Test", use_container_width=True, type="secondary"):
+        storage.delete_test(test_id)
+        st.success("Test deleted!")
+        st.session_state.pop('selected_test_id', None)
+        st.switch_page("pages/2_📚_Test_History.py")
 
 
 # Sidebar
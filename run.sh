@@ -20,6 +20,11 @@ echo "📥 Installing dependencies..."
 pip install -q --upgrade pip
 pip install -q -r requirements.txt
 
+# Start background job runner (executes submitted tests)
+echo "⚙️  Starting background job runner..."
+mkdir -p data
+python -m utils.jobs >> data/job_runner.log 2>&1 &
+
 # Start Streamlit app
 echo ""
 echo "✅ Setup complete! Starting the app..."
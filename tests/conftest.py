@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Run the tests from any directory: utils is imported from the project root
+sys.path.insert(0, str(Path(__file__).parent.parent))
@@ -0,0 +1,89 @@
+"""
+Confusion matrices and rollups of ResultsAnalyzer checked against
+pd.crosstab of the raw result rows.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from utils.analysis import analyzer
+from utils.config import config
+from utils.metrics import KpiCounts
+
+SR_ID = config.analysis["sr_id_column"]
+GT_QF = config.analysis["ground_truth_quickfill_column"]
+PRED_OPENING = config.analysis["predicted_opening_column"]
+PRED_QF = config.analysis["predicted_quickfill_column"]
+SR_LABELS = [config.analysis["sr_labels"][name] for name in ["creation", "archive", "review"]]
+
+
+@pytest.fixture
+def results():
+    """Result rows with missing labels and quickfills only seen on one side"""
+    rng = np.random.default_rng(0)
+    rows = 2000
+    ground_truth = np.array(["QF A", "QF B", "QF C", "Only in ground truth", None], dtype=object)
+    predicted = np.array(["QF A", "QF B", "QF C", "Only predicted", None], dtype=object)
+    return pd.DataFrame({
+        SR_ID: np.where(rng.random(rows) < 0.6, rng.integers(1, 10 ** 6, rows), np.nan),
+        GT_QF: rng.choice(ground_truth, rows),
+        PRED_OPENING: rng.choice(np.array(SR_LABELS + [None], dtype=object), rows, p=[0.5, 0.3, 0.1, 0.1]),
+        PRED_QF: rng.choice(predicted, rows),
+    })
+
+
+def crosstab_matrix(true, predicted, labels):
+    table = pd.crosstab(true, predicted).reindex(index=labels, columns=labels, fill_value=0)
+    return {label: {pred: int(count) for pred, count in row.items()} for label, row in table.iterrows()}
+
+
+def expected_sr_matrix(df):
+    gt_sr = df[SR_ID].notna() & (df[SR_ID] != 0)
+    answered = df[PRED_OPENING].notna()
+    gt_opening = pd.Series(np.where(gt_sr, SR_LABELS[0], SR_LABELS[1]), index=df.index)
+    return crosstab_matrix(gt_opening[answered], df.loc[answered, PRED_OPENING], SR_LABELS)
+
+
+def expected_quickfill_matrix(df):
+    scored = df[df[SR_ID].notna() & (df[PRED_OPENING] == SR_LABELS[0]) & df[GT_QF].notna() & df[PRED_QF].notna()]
+    labels = sorted(set(scored[GT_QF]) | set(scored[PRED_QF]))
+    return crosstab_matrix(scored[GT_QF], scored[PRED_QF], labels)
+
+
+def test_confusion_matrices_match_crosstab(results):
+    analysis = analyzer.analyze_counts("desk.csv", KpiCounts.from_frame(results))
+
+    assert analysis['sr_analysis']['confusion_matrix']['matrix'] == expected_sr_matrix(results)
+    quickfill = analysis['quickfill_analysis']
+    expected = expected_quickfill_matrix(results)
+    assert quickfill['confusion_matrix']['matrix'] == expected
+    assert "Only in ground truth" in expected and "Only predicted" in expected
+    for label, row in expected.items():
+        predicted = sum(expected_row[label] for expected_row in expected.values())
+        support = sum(row.values())
+        precision = row[label] / predicted if predicted else None
+        recall = row[label] / support if support else None
+        f1 = None
+        if precision is not None and recall is not None:
+            f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        assert quickfill['per_class'][label] == {
+            'precision': None if precision is None else round(precision, 4),
+            'recall': None if recall is None else round(recall, 4),
+            'f1': None if f1 is None else round(f1, 4),
+            'support': support,
+        }
+
+
+def test_rollup_of_files_matches_crosstab_of_all_rows(results):
+    # Each file sees only part of the labels
+    files = [results.iloc[:700], results.iloc[700:1500], results.iloc[1500:]]
+    files[0] = files[0][files[0][PRED_QF] != "Only predicted"]
+    analyses = [
+        analyzer.analyze_counts(f"desk_{idx}.csv", KpiCounts.from_frame(df)) for idx, df in enumerate(files)
+    ]
+    rows = pd.concat(files)
+
+    rollup = analyzer.rollup(analyses)
+    assert rollup['files'] == 3
+    assert rollup['basic_stats']['total_emails'] == len(rows)
+    assert rollup['sr_analysis']['confusion_matrix']['matrix'] == expected_sr_matrix(rows)
+    assert rollup['quickfill_analysis']['confusion_matrix']['matrix'] == expected_quickfill_matrix(rows)
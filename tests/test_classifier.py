@@ -0,0 +1,208 @@
+"""
+run_classifier in 'both' mode with the LLM replaced by a keyword rule:
+emails mentioning "urgent" are SR creations, all others archives.
+"""
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from utils import cascade, classifier
+from utils.checkpoint import CHECKPOINT_DIR
+from utils.config import config
+from utils.engine import PredictionEngine
+
+SR_LABEL = config.analysis["sr_labels"]["creation"]
+ARCHIVE_LABEL = config.analysis["sr_labels"]["archive"]
+QUICKFILL = "CONFIRMATION REQUEST"
+
+
+async def fake_predict(self, task, text):
+    if task == 'qf':
+        return QUICKFILL
+    return SR_LABEL if "urgent" in text else ARCHIVE_LABEL
+
+
+class FakeCascadeModel:
+    """Confident about the emails tagged "[sure-sr]" / "[sure-archive]", uncertain about the rest"""
+
+    def sr_probability(self, texts: pd.Series) -> np.ndarray:
+        return np.where(texts.str.contains(r"\[sure-sr\]"), 1.0,
+                        np.where(texts.str.contains(r"\[sure-archive\]"), 0.0, 0.5))
+
+
+@pytest.fixture(autouse=True)
+def offline(monkeypatch):
+    monkeypatch.setattr(PredictionEngine, "predict", fake_predict)
+    monkeypatch.setitem(config.prediction_cache, "enabled", False)
+    monkeypatch.setitem(config.llm, "requests_per_second", 0)
+    monkeypatch.setitem(config.llm, "tokens_per_minute", 0)
+
+
+def write_source(folder, bodies):
+    folder.mkdir()
+    pd.DataFrame({
+        config.analysis["sr_id_column"]: [idx + 1 for idx in range(len(bodies))],
+        config.SUBJECT_COLUMN: "Trade amendment",
+        config.BODY_COLUMN: bodies,
+        config.analysis["ground_truth_quickfill_column"]: QUICKFILL,
+    }).to_csv(folder / "desk.csv", index=False)
+    return folder
+
+
+def run(source, out, **options):
+    options.setdefault('use_filter', False)
+    classifier.run_classifier(str(source), str(out), mode='both', batch_size=1, workers=1, **options)
+    return pd.read_csv(out / "desk_result.csv")
+
+
+def expected_labels(df):
+    return np.where(df[config.BODY_COLUMN].str.contains("urgent"), SR_LABEL, ARCHIVE_LABEL)
+
+
+@pytest.fixture
+def local_model(monkeypatch):
+    monkeypatch.setattr(cascade, "load_model", lambda: FakeCascadeModel())
+    monkeypatch.setattr(classifier, "ensure_model", lambda: None)
+
+
+def test_cascade_sends_uncertain_emails_to_the_llm(tmp_path, local_model):
+    bodies = [
+        "urgent [sure-sr] please book", "archive me [sure-archive]",
+        "urgent: amend the trade", "fyi only", "urgent cancel", "thanks, noted",
+    ]
+    df = run(write_source(tmp_path / "source", bodies), tmp_path / "out", cascade=True)
+
+    stage = config.analysis["label_stage_column"]
+    assert list(df[stage]) == ['local', 'local', 'llm', 'llm', 'llm', 'llm']
+    assert list(df[config.analysis["predicted_opening_column"]]) == list(expected_labels(df))
+    is_sr = df[config.analysis["predicted_opening_column"]] == SR_LABEL
+    assert (df.loc[is_sr, config.analysis["predicted_quickfill_column"]] == QUICKFILL).all()
+    assert df.loc[~is_sr, config.analysis["predicted_quickfill_column"]].isna().all()
+
+
+@pytest.mark.parametrize("cascade_mode", [False, True])
+def test_near_duplicates_share_both_labels(tmp_path, request, cascade_mode):
+    if cascade_mode:
+        # Every email is uncertain to the local model, so all of them go through the clusters
+        request.getfixturevalue("local_model")
+    template = ("urgent: please amend trade 42 booked yesterday against the wrong counterparty, the settlement "
+                "date should move to monday and the new account details are attached to this email, kind {}")
+    bodies = [template.format("regards"), template.format("thanks"), "fyi only, nothing to do here at all", template.format("cheers")]
+    df = run(write_source(tmp_path / "source", bodies), tmp_path / "out",
+             collapse_near_duplicates=True, cascade=cascade_mode)
+
+    assert df[classifier.CLUSTER_ID_COLUMN].tolist() == [0, 0, 2, 0]
+    assert list(df[config.analysis["predicted_opening_column"]]) == list(expected_labels(df))
+    is_sr = df[config.analysis["predicted_opening_column"]] == SR_LABEL
+    assert (df.loc[is_sr, config.analysis["predicted_quickfill_column"]] == QUICKFILL).all()
+
+
+def test_resume_reclassifies_a_changed_source_file(tmp_path):
+    source = write_source(tmp_path / "source", ["urgent cancel", "fyi only"])
+    run(source, tmp_path / "out", resume=True)
+
+    pd.DataFrame({
+        config.analysis["sr_id_column"]: [1, 2, 3],
+        config.SUBJECT_COLUMN: "Trade amendment",
+        config.BODY_COLUMN: ["urgent cancel", "fyi only", "urgent: amend the trade"],
+        config.analysis["ground_truth_quickfill_column"]: QUICKFILL,
+    }).to_csv(source / "desk.csv", index=False)
+    df = run(source, tmp_path / "out", resume=True)
+
+    assert len(df) == 3
+    assert list(df[config.analysis["predicted_opening_column"]]) == list(expected_labels(df))
+
+
+def write_filtered_source(folder):
+    """1,000 emails: 400 auto-replies (filtered out), then 200 SR and 400 archive emails, interleaved"""
+    folder.mkdir()
+    is_sr = np.arange(1000) % 5 == 1
+    pd.DataFrame({
+        config.analysis["sr_id_column"]: np.where(is_sr, np.arange(1000) + 1, 0),
+        config.SUBJECT_COLUMN: np.where(np.arange(1000) % 5 >= 3, "Automatic reply: away", "Trade amendment"),
+        config.BODY_COLUMN: np.where(is_sr, "urgent: amend", "fyi only"),
+        config.analysis["ground_truth_quickfill_column"]: QUICKFILL,
+    }).to_csv(folder / "desk.csv", index=False)
+    return folder
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_sample_rows_are_drawn_from_the_filtered_rows_of_each_class(tmp_path, streaming):
+    source = write_filtered_source(tmp_path / "source")
+    df = run(source, tmp_path / "out", use_filter=True, streaming=streaming, chunk_size=100, sample_rows=60)
+
+    assert len(df) == 60
+    assert (df[config.analysis["sr_id_column"]] != 0).sum() == 20
+
+
+def test_sample_fraction_of_one_keeps_every_filtered_row(tmp_path):
+    source = write_filtered_source(tmp_path / "source")
+    df = run(source, tmp_path / "out", use_filter=True, sample_fraction=1.0)
+    assert len(df) == 600
+
+
+def test_sample_fraction_and_rows_are_exclusive(tmp_path):
+    with pytest.raises(ValueError):
+        run(write_filtered_source(tmp_path / "source"), tmp_path / "out", sample_fraction=0.5, sample_rows=10)
+
+
+
+
+def file_stat(out):
+    manifest = next((out / CHECKPOINT_DIR).rglob("manifest.json"))
+    return json.loads(manifest.read_text())['result']['file_stat']
+
+
+def write_dedup_source(folder):
+    """Three chunks of two emails; sr_id 7 comes back in the last chunk"""
+    folder.mkdir()
+    pd.DataFrame({
+        config.analysis["sr_id_column"]: [7, 8, 9, 10, 7, 11],
+        config.SUBJECT_COLUMN: "Trade amendment",
+        config.BODY_COLUMN: ["urgent amend", "urgent book", "fyi", "urgent cancel", "urgent amend again", "last"],
+        config.analysis["ground_truth_quickfill_column"]: QUICKFILL,
+    }).to_csv(folder / "desk.csv", index=False)
+    return folder
+
+
+def test_resume_restores_results_and_dedup_state_of_checkpointed_chunks(tmp_path, monkeypatch):
+    source = write_dedup_source(tmp_path / "source")
+    # Sampling leaves part of the rows kept by the dedup filter unclassified
+    options = dict(use_filter=True, streaming=True, chunk_size=2, sample_fraction=0.5, resume=True)
+    expected = run(source, tmp_path / "uninterrupted", **options)
+
+    classified = []
+    interrupted = [True]
+
+    async def predict(self, task, text):
+        classified.append(text)
+        if interrupted[0] and "last" in text:
+            raise RuntimeError("interrupted")
+        return await fake_predict(self, task, text)
+
+    monkeypatch.setattr(PredictionEngine, "predict", predict)
+    with pytest.raises(RuntimeError):
+        run(source, tmp_path / "out", **options)
+    # Chunks are appended to the result as they are checkpointed
+    assert len(pd.read_csv(tmp_path / "out" / "desk_result.csv")) == len(expected) - 1
+    # and the checkpoint keeps their predictions, not the emails
+    part = pd.read_pickle(next((tmp_path / "out").rglob("chunk_000000.pkl")))
+    assert config.BODY_COLUMN not in part['predictions'].columns
+
+    interrupted[0] = False
+    classified.clear()
+    pd.testing.assert_frame_equal(run(source, tmp_path / "out", **options), expected)
+    assert file_stat(tmp_path / "out") == file_stat(tmp_path / "uninterrupted")
+    assert classified and all("last" in text for text in classified)
+
+
+def test_serial_run_reports_progress_and_live_metrics_of_each_file(tmp_path):
+    source = write_source(tmp_path / "source", ["urgent amend", "fyi"])
+    pd.read_csv(source / "desk.csv").to_csv(source / "desk_2.csv", index=False)
+    progress, metrics = [], []
+    classifier.run_classifier(str(source), str(tmp_path / "out"), mode='both', use_filter=False, batch_size=1,
+                              workers=1, progress_callback=lambda **update: progress.append(update),
+                              metrics_callback=metrics.append)
+
+    assert [(update['current'], update['total']) for update in progress] == [(1, 2), (2, 2)]
+    assert list(metrics[-1]) == ["desk.csv", "desk_2.csv"]
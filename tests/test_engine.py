@@ -0,0 +1,65 @@
+import asyncio
+from utils.config import config
+from utils.engine import PredictionEngine, RateLimiter, latency_percentiles
+
+SR_LABEL = config.analysis["sr_labels"]["creation"]
+ARCHIVE_LABEL = config.analysis["sr_labels"]["archive"]
+
+
+def test_quickfills_start_before_a_full_batch_is_queued(monkeypatch):
+    calls = []
+
+    async def fake_predict_batch(self, task, texts):
+        calls.append(('start', task, list(texts)))
+        await asyncio.sleep(0.01)
+        calls.append(('end', task, list(texts)))
+        if task == 'qf':
+            return ["CONFIRMATION REQUEST"] * len(texts)
+        return [SR_LABEL if text.startswith("sr") else ARCHIVE_LABEL for text in texts]
+
+    monkeypatch.setattr(PredictionEngine, "predict_batch", fake_predict_batch)
+    engine = PredictionEngine(max_concurrency=1, cache=None)
+    # One SR email among many: its quickfill batch can never be filled
+    texts = ["sr 0"] + [f"archive {idx}" for idx in range(1, 8)]
+
+    sr_labels, qf_labels = asyncio.run(engine.predict_pipeline(texts, batch_size=4))
+
+    assert sr_labels == [SR_LABEL] + [ARCHIVE_LABEL] * 7
+    assert qf_labels == ["CONFIRMATION REQUEST"] + [None] * 7
+    # The lone quickfill goes out while the SR stage is still running
+    assert calls.index(('start', 'qf', ["sr 0"])) < calls.index(('end', 'sr', texts[4:]))
+
+
+class FakeResponse:
+    async def __aenter__(self):
+        await asyncio.sleep(0.02)
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    async def json(self):
+        return {"choices": [{"message": {"content": ARCHIVE_LABEL}}], "usage": {}}
+
+
+class FakeSession:
+    def post(self, *args, **kwargs):
+        return FakeResponse()
+
+
+def test_latency_excludes_time_queued_by_the_rate_limiter():
+    async def run():
+        engine = PredictionEngine(max_concurrency=10, cache=None, requests_per_second=10, tokens_per_minute=0)
+        engine.session = FakeSession()
+        engine.rate_limiter = RateLimiter(engine.requests_per_second, engine.tokens_per_minute)
+        # 20 calls at 10 requests/s (bursts of 10): the last one waits ~1s for the rate limiter
+        await asyncio.gather(*(engine._complete([{"role": "user", "content": "fyi"}]) for _ in range(20)))
+        return engine.stats
+
+    stats = asyncio.run(run())
+
+    assert latency_percentiles(stats)['p99'] < 200
+    assert stats['rate_limit_wait_ms'] > 2000
@@ -0,0 +1,49 @@
+import re
+import zipfile
+import pandas as pd
+from openpyxl import Workbook
+from utils.config import config
+from utils.fileio import ChunkedResultWriter, iter_frame_chunks
+from utils.metrics import KpiCounts
+
+
+def test_xlsx_chunks_keep_rows_with_trailing_empty_cells(tmp_path, monkeypatch):
+    # Read the workbook itself rather than its Parquet copy
+    monkeypatch.setitem(config.conversion_cache, "enabled", False)
+    workbook = Workbook()
+    sheet = workbook.active
+    for row in [["sr_id", "subject", "body"], [1, "Trade", "amend"], [2, "fyi", None], [3, None, None]]:
+        sheet.append(row)
+    workbook.save(tmp_path / "saved.xlsx")
+    # Without a <dimension> element (as written by many exporters) read_only rows are not padded
+    with zipfile.ZipFile(tmp_path / "saved.xlsx") as saved, zipfile.ZipFile(tmp_path / "desk.xlsx", "w") as desk:
+        for item in saved.infolist():
+            data = saved.read(item)
+            if item.filename == "xl/worksheets/sheet1.xml":
+                data = re.sub(rb"<dimension [^>]*/>", b"", data)
+            desk.writestr(item, data)
+
+    chunks = list(iter_frame_chunks(tmp_path / "desk.xlsx", chunk_size=2))
+
+    assert [len(chunk) for chunk in chunks] == [2, 1]
+    assert chunks[1].columns.tolist() == ["sr_id", "subject", "body"]
+    assert chunks[1].iloc[0].tolist() == [3, None, None]
+
+
+def test_parquet_schema_comes_from_the_first_chunk_with_rows(tmp_path):
+    chunk = pd.DataFrame({"sr_id": [0, 7, 0], "subject": ["fyi", "amend", "thanks"]})
+    with ChunkedResultWriter(tmp_path / "desk_result.parquet") as writer:
+        # e.g. a first chunk the filters removed entirely
+        writer.write(chunk.iloc[:0])
+        writer.write(chunk)
+
+    df = pd.read_parquet(tmp_path / "desk_result.parquet")
+    assert df["sr_id"].tolist() == [0, 7, 0]
+    assert KpiCounts.from_frame(df.assign(predicted_opening="SR")).gt_sr == 1
+
+
+def test_parquet_file_of_empty_chunks_keeps_the_column_types(tmp_path):
+    with ChunkedResultWriter(tmp_path / "desk_result.parquet") as writer:
+        writer.write(pd.DataFrame({"sr_id": pd.Series([], dtype="int64")}))
+
+    assert str(pd.read_parquet(tmp_path / "desk_result.parquet")["sr_id"].dtype) == "int64"
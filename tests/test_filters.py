@@ -0,0 +1,13 @@
+import pytest
+from utils.filters import RULE_TYPES, FilterPipeline, FilterRule
+
+
+class IncompleteRule(FilterRule):
+    """A rule type that forgot to implement mask()"""
+
+
+def test_rule_without_mask_fails_when_the_pipeline_is_built(monkeypatch):
+    monkeypatch.setitem(RULE_TYPES, 'incomplete', IncompleteRule)
+    with pytest.raises(TypeError):
+        FilterPipeline.from_config([{'name': 'broken', 'type': 'incomplete'}])
+
@@ -0,0 +1,42 @@
+from datetime import datetime
+import pytest
+from utils import analysis, classifier, jobs, models, storage
+
+
+@pytest.fixture
+def history(tmp_path, monkeypatch):
+    # Imported as modules: pytest would try to collect the Test* classes
+    test_storage = storage.TestStorage(str(tmp_path / "test_history.json"))
+    monkeypatch.setattr(jobs, "storage", test_storage)
+    monkeypatch.setattr(classifier, "run_classifier", lambda **options: {'total_emails': 2, 'processed_emails': 2})
+    return test_storage
+
+
+def submit(history, tmp_path) -> models.TestResult:
+    test = models.TestResult(test_id="t1", status='running', source_path=str(tmp_path),
+                             out_path=str(tmp_path / "out"), mode='both', use_filter=False, async_mode=True,
+                             max_concurrency=1, created_at=datetime.now().isoformat())
+    history.save_test(test)
+    return test
+
+
+def test_failed_analysis_is_recorded_on_the_completed_test(history, tmp_path, monkeypatch):
+    def fail(*args, **kwargs):
+        raise OSError("result file is locked")
+
+    monkeypatch.setattr(analysis.analyzer, "analyze_test_results", fail)
+    jobs.execute_test(submit(history, tmp_path), "worker-1")
+
+    test = history.get_test("t1")
+    assert test.status == 'completed'
+    assert test.file_analyses is None
+    assert test.analysis_error == "result file is locked"
+
+
+def test_successful_analysis_records_no_error(history, tmp_path, monkeypatch):
+    monkeypatch.setattr(analysis.analyzer, "analyze_test_results", lambda *args, **kwargs: [])
+    jobs.execute_test(submit(history, tmp_path), "worker-1")
+
+    test = history.get_test("t1")
+    assert test.status == 'completed'
+    assert test.analysis_error is None
@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+from utils.near_dup import _bucket_pairs, near_duplicate_clusters
+
+WORDS = [f"word{idx}" for idx in range(60)]
+
+
+def variant(*changed):
+    return " ".join("changed" if idx in changed else word for idx, word in enumerate(WORDS))
+
+
+def test_every_bucket_member_is_paired_with_the_others():
+    keys = np.array([b"a", b"b", b"a", b"a", b"c"], dtype=object)
+    pairs = {tuple(sorted(pair)) for pair in _bucket_pairs(keys, window=10).tolist()}
+    assert pairs == {(0, 2), (0, 3), (2, 3)}
+
+
+def test_large_buckets_are_compared_within_the_window():
+    keys = np.zeros(100, dtype=np.int64)
+    assert len(_bucket_pairs(keys, window=3)) == 99 + 98 + 97
+
+
+def test_clusters_chain_near_duplicates_and_exact_duplicates():
+    texts = pd.Series(
+        ["fyi only", variant(10), variant(), "fyi only", variant(11), variant(5, 15, 25, 35, 45)],
+        index=[10, 11, 12, 13, 14, 15]
+    )
+    assert near_duplicate_clusters(texts).tolist() == [10, 11, 11, 10, 11, 15]
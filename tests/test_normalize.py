@@ -0,0 +1,62 @@
+import pandas as pd
+import pytest
+from utils.normalize import normalize_texts
+
+
+def normalize(body):
+    texts, _ = normalize_texts(pd.Series([f"Subject: Trade 42\n\n{body}"]))
+    return texts[0].split("\n\n", 1)[1] if "\n\n" in texts[0] else ""
+
+
+@pytest.mark.parametrize("header", [
+    "-----Original Message-----\nFrom: Desk",
+    "On Monday, John Doe <john.doe@bank.com> wrote:",
+    "From: John Doe\nSent: Monday",
+])
+def test_quoted_thread_after_new_content_is_dropped(header):
+    assert normalize(f"Please confirm the amendment.\n\n{header}\nold thread text") == "Please confirm the amendment."
+
+
+def test_wrote_inside_a_sentence_is_not_a_quote_header():
+    body = "On Monday the client wrote: please confirm the new settlement date."
+    assert normalize(body) == body
+
+
+def test_forwarded_message_keeps_its_content():
+    body = ("---------- Forwarded message ---------\nFrom: Client\nDate: Monday\n"
+            "Subject: Amendment\n\nPlease amend trade 42.")
+    assert "Please amend trade 42." in normalize(body)
+
+
+def test_quoted_lines_are_dropped():
+    assert normalize("Done, thanks.\n> can you amend it?\n> thanks") == "Done, thanks."
+
+
+def test_signature_after_content_is_dropped():
+    assert normalize("Please amend trade 42.\n\nKind regards,\nJohn") == "Please amend trade 42."
+
+
+def test_body_starting_with_a_signature_line_is_kept():
+    assert normalize("Regards,\nplease amend trade 42.") == "Regards,\nplease amend trade 42."
+
+
+@pytest.mark.parametrize("disclaimer", [
+    "Disclaimer: internal use only.",
+    "This email is confidential and intended for the addressee only.",
+])
+def test_disclaimer_after_content_is_dropped(disclaimer):
+    assert normalize(f"Please amend trade 42.\n\n{disclaimer}") == "Please amend trade 42."
+
+
+def test_email_made_only_of_a_disclaimer_is_kept():
+    assert normalize("Disclaimer: internal use only.") == "Disclaimer: internal use only."
+
+
+def test_html_is_converted_to_text():
+    body = "<html><body><p>Please amend&nbsp;trade 42.</p><br/><div>Thanks</div></body></html>"
+    assert normalize(body) == "Please amend trade 42.\n\nThanks"
+
+
+def test_email_addresses_in_angle_brackets_are_not_html():
+    body = "Please copy <john.doe@bank.com> on the amendment."
+    assert normalize(body) == body
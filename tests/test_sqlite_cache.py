@@ -0,0 +1,34 @@
+import sqlite3
+from utils.analysis_cache import AnalysisCache
+from utils.metrics import KpiCounts
+from utils.prediction_cache import PredictionCache
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = PredictionCache(str(tmp_path / "cache.sqlite"), max_entries=10)
+    cache.put_many({f"k{idx}": "SR" for idx in range(10)})
+    # A hit makes k0 the most recently used entry
+    assert cache.get_many(["k0", "missing"]) == {"k0": "SR"}
+    cache.put_many({"k10": "Archive"})
+
+    kept = cache.get_many(f"k{idx}" for idx in range(11))
+    assert len(kept) == 9
+    assert {"k0", "k10"} <= set(kept)
+    cache.close()
+
+
+def test_caches_keep_reading_their_existing_tables(tmp_path):
+    path = tmp_path / "analysis.sqlite"
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE kpi_counts (key TEXT PRIMARY KEY, counts TEXT NOT NULL, last_used REAL NOT NULL)")
+    conn.commit()
+    conn.close()
+
+    result_file = tmp_path / "desk_result.csv"
+    result_file.write_text("sr_id\n1\n")
+    cache = AnalysisCache(str(path))
+    assert cache.get(result_file) is None
+    counts = KpiCounts()
+    cache.put(result_file, counts)
+    assert cache.get(result_file).to_dict() == counts.to_dict()
+    cache.close()
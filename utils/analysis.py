@@ -1,11 +1,30 @@
 """
 Analysis module for calculating KPIs from prediction results
 """
-import pandas as pd
+import math
+import os
+from fnmatch import fnmatch
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from statistics import NormalDist
 from typing import Dict, List, Optional, Tuple
+from .analysis_cache import AnalysisCache
 from .config import config
+from .fileio import find_result_files, load_frame
+from .metrics import KpiCounts, PairCounts
+
+
+def wilson_interval(successes: int, trials: int, confidence: float) -> Optional[List[float]]:
+    """Wilson score confidence interval [low, high] of a proportion (None without trials)"""
+    if trials == 0:
+        return None
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    proportion = successes / trials
+    denominator = 1 + z ** 2 / trials
+    centre = (proportion + z ** 2 / (2 * trials)) / denominator
+    margin = z * math.sqrt(proportion * (1 - proportion) / trials + z ** 2 / (4 * trials ** 2)) / denominator
+    return [round(max(0.0, centre - margin), 4), round(min(1.0, centre + margin), 4)]
 
 
 class ResultsAnalyzer:
@@ -16,12 +35,26 @@ class ResultsAnalyzer:
         self.gt_qf_col = config.analysis["ground_truth_quickfill_column"]
         self.pred_opening_col = config.analysis["predicted_opening_column"]
         self.pred_qf_col = config.analysis["predicted_quickfill_column"]
+        self.label_stage_col = config.analysis["label_stage_column"]
         self.sr_creation_label = config.analysis["sr_labels"]["creation"]
         self.archive_label = config.analysis["sr_labels"]["archive"]
         self.review_label = config.analysis["sr_labels"]["review"]
         self.special_qfs = config.analysis["special_quickfills"]
-
-    def analyze_test_results(self, out_path: str, file_stats: Optional[List[Dict]] = None) -> List[Dict]:
+        # Group name -> result file name patterns, for grouped rollups
+        self.desk_groups = config.analysis["desk_groups"]
+        # Precision / accuracy intervals, mostly useful for sampled runs
+        self.confidence_level = config.sampling["confidence_level"]
+        # Only these columns are needed for the KPIs
+        self.analysis_columns = [
+            self.sr_id_col, self.gt_qf_col, self.pred_opening_col, self.pred_qf_col, self.label_stage_col
+        ]
+        # Label columns are read as categories, so KpiCounts counts integer codes
+        # instead of strings; sr_id keeps its inferred (numeric) dtype
+        label_columns = [self.pred_opening_col, self.pred_qf_col, self.gt_qf_col, self.label_stage_col]
+        self.column_dtypes = {column: 'category' for column in label_columns}
+
+    def analyze_test_results(self, out_path: str, file_stats: Optional[List[Dict]] = None,
+                             workers: Optional[int] = None, file_metrics: Optional[Dict[str, Dict]] = None) -> List[Dict]:
         """
         Analyze all result files in the output path.
         Merges with pre-filter stats if provided.
@@ -34,11 +67,19 @@ class ResultsAnalyzer:
                     'original_total': 1000,
                     'original_sr_count': 200,
                     'original_archive_count': 800,
-                    'filtered_total': 400
+                    'filtered_total': 400,
+                    'sampled_total': 100  # None unless the run was sampled
                 }
+            workers: Files analyzed in parallel processes (None = "workers" in the
+                "analysis" section of config.json, 0 = CPU count)
+            file_metrics: Optional {result file name: KpiCounts dict} kept by
+                run_classifier; these files are analyzed without reading them.
+                Other files are read only if their counts are not in the
+                analysis cache (see utils/analysis_cache.py)
 
         Returns:
-            List of per-file analyses with both original and filtered stats
+            List of per-file analyses with both original and filtered stats,
+            in result file order
         """
         out_dir = Path(out_path)
 
@@ -50,7 +91,7 @@ class ResultsAnalyzer:
         if out_dir.is_file():
             result_files = [out_dir]
         else:
-            result_files = list(out_dir.glob("*_result.csv")) + list(out_dir.glob("*_result.xlsx"))
+            result_files = find_result_files(out_dir)
 
         if not result_files:
             raise ValueError(f"No result files found in {out_path}")
@@ -59,198 +100,346 @@ class ResultsAnalyzer:
         prefilter_lookup = {}
         if file_stats:
             for stat in file_stats:
-                source_name = stat.get('source_file', '')
-                # Map source file to result file (e.g., desk_A.csv -> desk_A_result.csv)
-                prefilter_lookup[source_name] = stat
+                # Keyed by stem: the result format may differ from the source format
+                # (e.g., desk_A.csv -> desk_A_result.parquet)
+                prefilter_lookup[Path(stat.get('source_file', '')).stem] = stat
+
+        # Counts of each file: kept by the run, cached from an earlier analysis, or read from disk
+        file_metrics = file_metrics or {}
+        file_counts = {}
+        cache = AnalysisCache() if config.analysis_cache["enabled"] else None
+        try:
+            for file_path in result_files:
+                counts = None
+                if file_path.name in file_metrics:
+                    counts = KpiCounts.from_dict(file_metrics[file_path.name])
+                    if cache is not None:
+                        cache.put(file_path, counts)
+                elif cache is not None:
+                    counts = cache.get(file_path)
+                if counts is not None:
+                    file_counts[file_path] = counts
+
+            unread_files = [file_path for file_path in result_files if file_path not in file_counts]
+            if workers is None:
+                workers = config.analysis["workers"]
+            workers = min(workers or os.cpu_count() or 1, len(unread_files))
+
+            # map keeps the result file order
+            if workers > 1:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    read_counts = list(pool.map(self._count_file, unread_files))
+            else:
+                read_counts = [self._count_file(file_path) for file_path in unread_files]
+
+            for file_path, (counts, error) in zip(unread_files, read_counts):
+                file_counts[file_path] = counts if counts is not None else error
+                if counts is not None and cache is not None:
+                    cache.put(file_path, counts)
+        finally:
+            if cache is not None:
+                cache.close()
 
-        # Analyze each file
         analyses = []
         for file_path in result_files:
-            try:
-                analysis = self.analyze_single_file(file_path)
+            counts = file_counts[file_path]
+            if isinstance(counts, KpiCounts):
+                analysis = self.analyze_counts(file_path.name, counts)
+            else:
+                # Include failed analysis with error message
+                analysis = {
+                    'file_name': file_path.name,
+                    'error': counts,
+                    'status': 'failed'
+                }
 
+            if analysis.get('status') != 'failed':
                 # Try to match with pre-filter stats
-                # Result file: desk_A_result.csv -> source: desk_A.csv
-                result_name = file_path.name
-                source_name = result_name.replace('_result', '')
+                # Result file: desk_A_result.csv -> source: desk_A.*
+                source_stem = file_path.stem.replace('_result', '')
 
-                if source_name in prefilter_lookup:
+                if source_stem in prefilter_lookup:
                     # Merge pre-filter stats
-                    prefilter = prefilter_lookup[source_name]
+                    prefilter = prefilter_lookup[source_stem]
                     analysis['original_stats'] = {
                         'total_emails': prefilter.get('original_total'),
                         'sr_count': prefilter.get('original_sr_count'),
                         'archive_count': prefilter.get('original_archive_count'),
                     }
                     analysis['filtered_total'] = prefilter.get('filtered_total')
+                    analysis['sampled_total'] = prefilter.get('sampled_total')
+                    analysis['filter_stats'] = prefilter.get('filter_stats')
 
-                analyses.append(analysis)
-            except Exception as e:
-                # Include failed analysis with error message
-                analyses.append({
-                    'file_name': file_path.name,
-                    'error': str(e),
-                    'status': 'failed'
-                })
+            analyses.append(analysis)
 
         return analyses
 
+    def file_stats_from_analyses(self, analyses: List[Dict]) -> List[Dict]:
+        """The pre-filter stats merged into earlier analyses, in the file_stats format"""
+        file_stats = []
+        for analysis in analyses:
+            original_stats = analysis.get('original_stats')
+            if not original_stats:
+                continue
+            file_stats.append({
+                'source_file': Path(analysis['file_name']).stem.replace('_result', ''),
+                'original_total': original_stats.get('total_emails'),
+                'original_sr_count': original_stats.get('sr_count'),
+                'original_archive_count': original_stats.get('archive_count'),
+                'filtered_total': analysis.get('filtered_total'),
+                'sampled_total': analysis.get('sampled_total'),
+                'filter_stats': analysis.get('filter_stats'),
+            })
+        return file_stats
+
+    def _count_file(self, file_path: Path) -> Tuple[Optional[KpiCounts], Optional[str]]:
+        """(count_file, None), or (None, error message) if it fails (runs in worker processes)"""
+        try:
+            return self.count_file(file_path), None
+        except Exception as e:
+            return None, str(e)
+
+    def count_file(self, file_path: Path) -> KpiCounts:
+        """KPI counts of a single result file (after filtering)"""
+        # Load data (analysis columns only, the email text is never needed)
+        df = load_frame(file_path, columns=self.analysis_columns, dtype=self.column_dtypes)
+        return KpiCounts.from_frame(df)
+
     def analyze_single_file(self, file_path: Path) -> Dict:
         """Analyze a single result file (after filtering)"""
-        # Load data
-        if file_path.suffix == '.csv':
-            df = pd.read_csv(file_path)
-        elif file_path.suffix == '.xlsx':
-            df = pd.read_excel(file_path)
-        else:
-            raise ValueError(f"Unsupported file type: {file_path.suffix}")
-
-        # Basic file stats (AFTER FILTERING)
-        total_emails = len(df)
-
-        # Determine ground truth SR creation/archive (from filtered data)
-        gt_sr_creation = df[self.sr_id_col].notna() & (df[self.sr_id_col] != 0)
-        gt_sr_archive = ~gt_sr_creation
-
-        # Count ground truth (in filtered data)
-        gt_sr_creation_count = gt_sr_creation.sum()
-        gt_sr_archive_count = gt_sr_archive.sum()
-
-        # SR Analysis
-        sr_analysis = self._analyze_sr_predictions(df, gt_sr_creation, gt_sr_archive)
-
-        # Quickfill Analysis
-        qf_analysis = self._analyze_quickfill_predictions(df, gt_sr_creation)
+        return self.analyze_counts(file_path.name, self.count_file(file_path))
 
+    def analyze_counts(self, file_name: str, counts: KpiCounts) -> Dict:
+        """
+        KPIs of a result file from its counts (see utils/metrics.py), e.g.
+        the counts kept by the classifier while it wrote the file.
+        """
         return {
-            'file_name': file_path.name,
+            'file_name': file_name,
             'status': 'success',
+            'confidence_level': self.confidence_level,
             'basic_stats': {
-                'total_emails': int(total_emails),
-                'gt_sr_creation_count': int(gt_sr_creation_count),
-                'gt_sr_archive_count': int(gt_sr_archive_count),
+                'total_emails': counts.rows,
+                'gt_sr_creation_count': counts.gt_sr,
+                'gt_sr_archive_count': counts.rows - counts.gt_sr,
             },
-            'sr_analysis': sr_analysis,
-            'quickfill_analysis': qf_analysis,
+            'sr_analysis': self._analyze_sr_predictions(counts),
+            'quickfill_analysis': self._analyze_quickfill_predictions(counts),
+            # Only for runs with the local first stage
+            'cascade_analysis': self._analyze_cascade(counts) if counts.stages is not None else None,
+            # Sufficient statistics, merged across files by rollup()
+            'kpi_counts': counts.to_dict(),
         }
 
-    def _analyze_sr_predictions(self, df: pd.DataFrame, gt_sr_creation: pd.Series, gt_sr_archive: pd.Series) -> Dict:
-        """Analyze SR opening predictions"""
-        pred_opening = df[self.pred_opening_col]
+    def rollup(self, analyses: List[Dict], name: str = "All files") -> Optional[Dict]:
+        """
+        Merge per-file analyses into one from their KPI counts and pre-filter
+        stats, without reading the result files: the cost depends on the
+        number of files and labels, not on the number of emails.
 
-        # Count predictions
-        pred_sr_count = (pred_opening == self.sr_creation_label).sum()
-        pred_archive_count = (pred_opening == self.archive_label).sum()
-        pred_review_count = (pred_opening == self.review_label).sum()
+        Returns:
+            An analysis in the per-file format (file_name = name, plus 'files':
+            the number of files merged), or None if no analysis has KPI counts
+        """
+        merged = [
+            analysis for analysis in analyses
+            if analysis.get('status') == 'success' and analysis.get('kpi_counts')
+        ]
+        if not merged:
+            return None
+
+        counts = KpiCounts()
+        for analysis in merged:
+            counts.merge(KpiCounts.from_dict(analysis['kpi_counts']))
+        rollup = self.analyze_counts(name, counts)
+        rollup['files'] = len(merged)
+
+        # Pre-filter stats only when every file has them, so totals stay comparable
+        if all(analysis.get('original_stats') for analysis in merged):
+            rollup['original_stats'] = {
+                key: sum(analysis['original_stats'].get(key) or 0 for analysis in merged)
+                for key in ['total_emails', 'sr_count', 'archive_count']
+            }
+            rollup['filtered_total'] = sum(analysis.get('filtered_total') or 0 for analysis in merged)
+            sampled = [analysis.get('sampled_total') for analysis in merged]
+            rollup['sampled_total'] = sum(sampled) if None not in sampled else None
+            filter_stats = {}
+            for analysis in merged:
+                for rule, removed in (analysis.get('filter_stats') or {}).items():
+                    filter_stats[rule] = filter_stats.get(rule, 0) + removed
+            rollup['filter_stats'] = filter_stats
+        return rollup
+
+    def rollup_groups(self, analyses: List[Dict]) -> Dict[str, Dict]:
+        """Rollup of each desk group ("desk_groups" in config.json) with at least one analyzed file"""
+        groups = {}
+        for analysis in analyses:
+            group = self.desk_group(analysis['file_name'])
+            if group is not None:
+                groups.setdefault(group, []).append(analysis)
+
+        rollups = {group: self.rollup(members, name=group) for group, members in groups.items()}
+        return {group: rollup for group, rollup in rollups.items() if rollup is not None}
+
+    def desk_group(self, file_name: str) -> Optional[str]:
+        """First desk group with a pattern matching the result file name"""
+        for group, patterns in self.desk_groups.items():
+            if any(fnmatch(file_name, pattern) for pattern in patterns):
+                return group
+        return None
+
+    def _analyze_sr_predictions(self, counts: KpiCounts) -> Dict:
+        """Analyze SR opening predictions"""
+        sr_labels = [self.sr_creation_label, self.archive_label, self.review_label]
+        # Ground truth SR / Archive vs predicted SR / Archive / Review (Review has no ground truth)
+        confusion_counts = self._dense_counts(counts.sr_outcomes, sr_labels)
+        predicted = confusion_counts.sum(axis=0)
+        pred_sr_count, pred_archive_count, pred_review_count = (int(count) for count in predicted)
 
         # Calculate precision for SR Creation and Archive
         # SR Creation Precision: Of all predicted as SR, how many are actually SR?
         sr_precision = None
+        correct_sr = int(confusion_counts[0, 0])
         if pred_sr_count > 0:
-            predicted_as_sr = pred_opening == self.sr_creation_label
-            correct_sr = (predicted_as_sr & gt_sr_creation).sum()
-            sr_precision = float(correct_sr / pred_sr_count)
+            sr_precision = correct_sr / pred_sr_count
 
         # Archive Precision: Of all predicted as Archive, how many are actually Archive?
         archive_precision = None
+        correct_archive = int(confusion_counts[1, 1])
         if pred_archive_count > 0:
-            predicted_as_archive = pred_opening == self.archive_label
-            correct_archive = (predicted_as_archive & gt_sr_archive).sum()
-            archive_precision = float(correct_archive / pred_archive_count)
-
-        # Overall accuracy (excluding Review since no ground truth for it)
-        non_review_mask = pred_opening != self.review_label
-        if non_review_mask.sum() > 0:
-            # Create ground truth labels
-            gt_labels = np.where(gt_sr_creation, self.sr_creation_label, self.archive_label)
-            pred_labels = pred_opening[non_review_mask]
-            gt_labels_filtered = gt_labels[non_review_mask]
-            accuracy = float((pred_labels == gt_labels_filtered).sum() / len(pred_labels))
-        else:
-            accuracy = None
+            archive_precision = correct_archive / pred_archive_count
+
+        # Overall accuracy (excluding Review since no ground truth for it; unanswered emails count as wrong)
+        non_review_count = counts.rows - pred_review_count
+        correct = correct_sr + correct_archive
+        accuracy = None
+        if non_review_count > 0:
+            accuracy = correct / non_review_count
 
         return {
-            'predicted_sr_count': int(pred_sr_count),
-            'predicted_archive_count': int(pred_archive_count),
-            'predicted_review_count': int(pred_review_count),
+            'predicted_sr_count': pred_sr_count,
+            'predicted_archive_count': pred_archive_count,
+            'predicted_review_count': pred_review_count,
             'sr_creation_precision': round(sr_precision, 4) if sr_precision is not None else None,
             'archive_precision': round(archive_precision, 4) if archive_precision is not None else None,
             'overall_accuracy': round(accuracy, 4) if accuracy is not None else None,
+            'sr_creation_precision_ci': wilson_interval(correct_sr, pred_sr_count, self.confidence_level),
+            'archive_precision_ci': wilson_interval(correct_archive, pred_archive_count, self.confidence_level),
+            'overall_accuracy_ci': wilson_interval(correct, non_review_count, self.confidence_level),
+            'confusion_matrix': self._format_confusion_matrix(sr_labels, confusion_counts),
+            'per_class': self._per_class_metrics(sr_labels, confusion_counts),
+        }
+
+    def _analyze_cascade(self, counts: KpiCounts) -> Dict:
+        """SR opening accuracy per cascade stage and share of LLM calls saved"""
+        stage_stats = {}
+        for stage, stage_counts in sorted(counts.stages.items()):
+            # Accuracy excluding Review, as for the overall accuracy
+            accuracy = None
+            if stage_counts['scored'] > 0:
+                accuracy = stage_counts['correct'] / stage_counts['scored']
+            stage_stats[stage] = {
+                'count': stage_counts['count'],
+                'accuracy': round(accuracy, 4) if accuracy is not None else None,
+            }
+
+        local_count = stage_stats.get('local', {}).get('count', 0)
+        return {
+            'stages': stage_stats,
+            'llm_calls_saved': round(local_count / counts.rows, 4) if counts.rows else None,
         }
 
-    def _analyze_quickfill_predictions(self, df: pd.DataFrame, gt_sr_creation: pd.Series) -> Dict:
-        """Analyze quickfill predictions"""
-        # Only analyze rows where SR creation is predicted
-        pred_opening = df[self.pred_opening_col]
-        sr_predicted_mask = pred_opening == self.sr_creation_label
+    def _analyze_quickfill_predictions(self, counts: KpiCounts) -> Dict:
+        """Analyze quickfill predictions (of the emails predicted as SR creation)"""
+        pred_sr_count = sum(row.get(self.sr_creation_label, 0) for row in counts.sr_outcomes.values())
 
-        if sr_predicted_mask.sum() == 0:
+        if pred_sr_count == 0:
             return {
                 'total_quickfills_predicted': 0,
                 'distribution': {},
                 'special_quickfill_counts': {},
                 'confusion_matrix': None,
+                'per_class': None,
                 'accuracy': None,
+                'accuracy_ci': None,
             }
 
-        # Get predicted quickfills (only for SR predictions)
-        pred_qf = df.loc[sr_predicted_mask, self.pred_qf_col]
-
-        # Distribution of predicted quickfills
-        distribution = pred_qf.value_counts().to_dict()
+        # Distribution of predicted quickfills, most frequent first
+        distribution = dict(sorted(counts.quickfill_predicted.items(), key=lambda item: (-item[1], item[0])))
 
         # Special quickfill counts
-        special_qf_counts = {}
-        for qf in self.special_qfs:
-            special_qf_counts[qf] = int((pred_qf == qf).sum())
+        special_qf_counts = {qf: distribution.get(qf, 0) for qf in self.special_qfs}
 
-        # Confusion matrix and accuracy (only for ground truth SR creation cases)
+        # Confusion matrix and accuracy (only for ground truth SR creation cases with both quickfills)
         confusion_matrix = None
+        per_class = None
         accuracy = None
+        accuracy_ci = None
 
-        # Filter to only ground truth SR creation cases (where we have ground truth quickfills)
-        gt_sr_mask = gt_sr_creation & sr_predicted_mask
-
-        if gt_sr_mask.sum() > 0:
-            gt_qf = df.loc[gt_sr_mask, self.gt_qf_col]
-            pred_qf_filtered = df.loc[gt_sr_mask, self.pred_qf_col]
+        if counts.quickfill_confusion:
+            # Labels seen as ground truth or prediction
+            labels = sorted(set(counts.quickfill_confusion).union(*counts.quickfill_confusion.values()))
+            confusion_counts = self._dense_counts(counts.quickfill_confusion, labels)
+            confusion_matrix = self._format_confusion_matrix(labels, confusion_counts)
+            per_class = self._per_class_metrics(labels, confusion_counts)
 
-            # Remove NaN values
-            valid_mask = gt_qf.notna() & pred_qf_filtered.notna()
-            if valid_mask.sum() > 0:
-                gt_qf_clean = gt_qf[valid_mask]
-                pred_qf_clean = pred_qf_filtered[valid_mask]
-
-                # Create confusion matrix
-                confusion_matrix = self._create_confusion_matrix(gt_qf_clean, pred_qf_clean)
-
-                # Calculate accuracy
-                accuracy = float((gt_qf_clean == pred_qf_clean).sum() / len(gt_qf_clean))
+            # Calculate accuracy
+            correct = int(np.trace(confusion_counts))
+            total = int(confusion_counts.sum())
+            accuracy = correct / total
+            accuracy_ci = wilson_interval(correct, total, self.confidence_level)
 
         return {
-            'total_quickfills_predicted': int(pred_qf.notna().sum()),
-            'distribution': {str(k): int(v) for k, v in distribution.items()},
+            'total_quickfills_predicted': sum(distribution.values()),
+            'distribution': distribution,
             'special_quickfill_counts': special_qf_counts,
             'confusion_matrix': confusion_matrix,
+            'per_class': per_class,
             'accuracy': round(accuracy, 4) if accuracy is not None else None,
+            'accuracy_ci': accuracy_ci,
         }
 
-    def _create_confusion_matrix(self, y_true: pd.Series, y_pred: pd.Series) -> Dict:
+    def _dense_counts(self, pairs: PairCounts, labels: List[str]) -> np.ndarray:
+        """Confusion matrix of `labels` (rows: true, columns: predicted) from non-zero pair counts"""
+        counts = np.zeros((len(labels), len(labels)), dtype=np.int64)
+        for i, true_label in enumerate(labels):
+            row = pairs.get(true_label, {})
+            for j, pred_label in enumerate(labels):
+                counts[i, j] = row.get(pred_label, 0)
+        return counts
+
+    def _format_confusion_matrix(self, labels: List[str], counts: np.ndarray) -> Dict:
         """Create a confusion matrix as a dictionary"""
-        # Get all unique labels
-        all_labels = sorted(set(y_true.unique()) | set(y_pred.unique()))
+        return {
+            'labels': labels,
+            'matrix': {
+                true_label: {pred_label: int(count) for pred_label, count in zip(labels, row)}
+                for true_label, row in zip(labels, counts)
+            }
+        }
 
-        # Create confusion matrix
-        matrix = {}
-        for true_label in all_labels:
-            matrix[str(true_label)] = {}
-            for pred_label in all_labels:
-                count = ((y_true == true_label) & (y_pred == pred_label)).sum()
-                matrix[str(true_label)][str(pred_label)] = int(count)
+    def _per_class_metrics(self, labels: List[str], counts: np.ndarray) -> Dict:
+        """Precision / recall / F1 / support of each label, from the confusion matrix"""
+        true_positives = np.diag(counts).astype(float)
+        predicted = counts.sum(axis=0)
+        support = counts.sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            precision = true_positives / predicted
+            recall = true_positives / support
+            f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+
+        def value(metric: float) -> Optional[float]:
+            # Undefined (no prediction / no ground truth of the label) -> None
+            return None if np.isnan(metric) else round(float(metric), 4)
 
         return {
-            'labels': [str(l) for l in all_labels],
-            'matrix': matrix
+            label: {
+                'precision': value(precision[i]),
+                'recall': value(recall[i]),
+                'f1': value(f1[i]) if predicted[i] and support[i] else None,
+                'support': int(support[i]),
+            }
+            for i, label in enumerate(labels)
         }
 
 
@@ -0,0 +1,58 @@
+"""
+Analysis cache - persistent SQLite store of the KPI counts of result files
+
+Keys are sha256(result file path, size, modification time, analysis
+settings), so a result file is counted again only when it changed or the
+columns / labels the counts depend on were reconfigured. KPIs are derived
+from the cached counts (see utils/metrics.py), so settings that only affect
+the derivation (special quickfills, confidence level) need no new entry.
+The LRU store itself is utils/sqlite_cache.py.
+"""
+import hashlib
+import json
+from pathlib import Path
+from typing import Optional
+from .config import config
+from .fileio import file_fingerprint
+from .metrics import KpiCounts
+from .sqlite_cache import SQLiteLRUCache
+
+# config.analysis settings the counts of a file depend on
+COUNTED_SETTINGS = [
+    "sr_id_column", "ground_truth_quickfill_column", "predicted_opening_column",
+    "predicted_quickfill_column", "label_stage_column", "sr_labels",
+]
+
+
+def settings_version() -> str:
+    """Short fingerprint of the analysis settings the counts depend on"""
+    settings = {name: config.analysis[name] for name in COUNTED_SETTINGS}
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def make_key(file: Path) -> str:
+    payload = f"{file_fingerprint(file)}\x1f{settings_version()}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AnalysisCache(SQLiteLRUCache):
+    """Size-bounded LRU cache of per-file KPI counts backed by SQLite"""
+
+    TABLE = "kpi_counts"
+    VALUE_COLUMN = "counts"
+
+    def __init__(self, path: str = config.analysis_cache["path"],
+                 max_entries: int = config.analysis_cache["max_entries"]):
+        super().__init__(path, max_entries)
+
+    def get(self, file: Path) -> Optional[KpiCounts]:
+        """Cached counts of the file as it is now, or None"""
+        key = make_key(file)
+        found = self.get_many([key])
+        if key not in found:
+            return None
+        return KpiCounts.from_dict(json.loads(found[key]))
+
+    def put(self, file: Path, counts: KpiCounts):
+        """Store the counts of the file and evict the least recently used entries if over capacity"""
+        self.put_many({make_key(file): json.dumps(counts.to_dict())})
@@ -0,0 +1,168 @@
+"""
+Cascade module - cheap local first stage for SR / Archive classification
+
+A TF-IDF + logistic regression model is trained on past *_result files,
+with the sr_id column as ground truth. It labels the emails it is confident
+about on CPU. Only emails whose SR probability falls in the uncertain band
+(between archive_threshold and sr_threshold) are sent to the LLM.
+
+Train or retrain the model with:
+    python -m utils.cascade [result folders...]
+(without folders, the output folders of all completed tests are used)
+"""
+import argparse
+import logging
+import os
+import pickle
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+from .config import config
+from .fileio import find_result_files, load_frame
+
+logger = logging.getLogger(__name__)
+
+LOCAL_STAGE = "local"
+LLM_STAGE = "llm"
+
+
+class CascadeModel:
+    """TF-IDF + logistic regression estimate of P(SR creation | email text)"""
+
+    def __init__(self, pipeline: Pipeline, trained_rows: int):
+        self.pipeline = pipeline
+        self.trained_rows = trained_rows
+
+    @classmethod
+    def train(cls, texts: pd.Series, is_sr: pd.Series) -> 'CascadeModel':
+        pipeline = Pipeline([
+            ('tfidf', TfidfVectorizer(
+                max_features=config.cascade["max_features"],
+                ngram_range=(1, 2),
+                sublinear_tf=True,
+                min_df=2
+            )),
+            ('classifier', LogisticRegression(max_iter=1000, class_weight='balanced')),
+        ])
+        pipeline.fit(texts.tolist(), is_sr.astype(int).to_numpy())
+        return cls(pipeline, len(texts))
+
+    def sr_probability(self, texts: pd.Series) -> np.ndarray:
+        return self.pipeline.predict_proba(texts.tolist())[:, 1]
+
+    def save(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        # Plain dict: pickling the class itself breaks when trained via `python -m`
+        with open(tmp_path, "wb") as f:
+            pickle.dump({'pipeline': self.pipeline, 'trained_rows': self.trained_rows}, f)
+        os.replace(tmp_path, path)
+
+
+def training_folders() -> List[Path]:
+    """Output folders of all completed tests"""
+    from .storage import storage
+
+    folders = {test.out_path for test in storage.get_all_tests() if test.status == 'completed'}
+    return sorted(Path(folder) for folder in folders if Path(folder).is_dir())
+
+
+def load_training_data(folders: List[Path]) -> Tuple[pd.Series, pd.Series]:
+    """Email texts and ground truth SR flags of every *_result file in the folders"""
+    # Imported lazily: the classifier module imports this one
+    from .classifier import build_email_text, ground_truth_sr_mask
+
+    columns = [config.analysis["sr_id_column"], config.SUBJECT_COLUMN, config.BODY_COLUMN]
+    texts, labels = [], []
+    for folder in folders:
+        for file in find_result_files(folder):
+            df = load_frame(file, columns=columns)
+            if config.analysis["sr_id_column"] not in df.columns:
+                continue
+            texts.append(build_email_text(df))
+            labels.append(ground_truth_sr_mask(df))
+
+    if not texts:
+        return pd.Series(dtype=str), pd.Series(dtype=bool)
+    return pd.concat(texts, ignore_index=True), pd.concat(labels, ignore_index=True)
+
+
+def train_model(folders: Optional[List[Path]] = None) -> Optional[CascadeModel]:
+    """
+    Train the cascade model and save it to the configured model_path.
+
+    Returns:
+        The model, or None if there is not enough labelled history
+    """
+    texts, is_sr = load_training_data(training_folders() if folders is None else folders)
+
+    max_rows = config.cascade["max_training_rows"]
+    if len(texts) > max_rows:
+        sample = texts.sample(n=max_rows, random_state=0).index
+        texts, is_sr = texts[sample], is_sr[sample]
+
+    if len(texts) < config.cascade["min_training_rows"] or is_sr.nunique() < 2:
+        logger.warning("Not enough labelled history to train the cascade model (%d rows)", len(texts))
+        return None
+
+    model = CascadeModel.train(texts, is_sr)
+    model.save(Path(config.cascade["model_path"]))
+    logger.info("Trained cascade model on %d emails", len(texts))
+    return model
+
+
+@lru_cache(maxsize=4)
+def _load_model(path: str, mtime: float) -> CascadeModel:
+    with open(path, "rb") as f:
+        return CascadeModel(**pickle.load(f))
+
+
+def load_model() -> Optional[CascadeModel]:
+    """Load the trained model (cached per process until the file changes)"""
+    path = Path(config.cascade["model_path"])
+    if not path.exists():
+        return None
+    return _load_model(str(path), path.stat().st_mtime)
+
+
+def ensure_model() -> Optional[CascadeModel]:
+    """Load the model, training it from the test history on first use"""
+    return load_model() or train_model()
+
+
+def local_labels(texts: pd.Series) -> pd.Series:
+    """
+    First-stage SR / Archive labels.
+
+    Returns:
+        Series aligned with `texts`: the SR creation or archive label where the
+        local model is confident, None where the email must go to the LLM
+    """
+    labels = pd.Series(None, index=texts.index, dtype=object)
+    model = load_model()
+    if model is None or texts.empty:
+        return labels
+
+    sr_probability = model.sr_probability(texts)
+    labels[sr_probability >= config.cascade["sr_threshold"]] = config.analysis["sr_labels"]["creation"]
+    labels[sr_probability <= config.cascade["archive_threshold"]] = config.analysis["sr_labels"]["archive"]
+    return labels
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the local first-stage SR / Archive model")
+    parser.add_argument("folders", nargs="*", type=Path, help="Folders with *_result files (default: test history)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if train_model(args.folders or None) is None:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
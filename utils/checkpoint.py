@@ -0,0 +1,89 @@
+"""
+Checkpoint module - per-chunk progress of a classification run
+
+For every source file, what a resumed run needs of each completed chunk
+is stored under <out_path>/.checkpoints/<source file name>/: the predicted
+columns of the classified rows and the filter (dedup) state the chunk
+added, together with a manifest recording which chunks are done and their
+stats. The *_result file itself is written chunk by chunk as the run goes;
+a resumed run rewrites it, rebuilding completed chunks from the source rows
+and their checkpointed predictions, so no LLM call is paid twice.
+"""
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, Optional
+import pandas as pd
+
+CHECKPOINT_DIR = ".checkpoints"
+# Layout of the chunk parts; checkpoints of another layout are discarded
+FORMAT_VERSION = 2
+
+
+class FileCheckpoint:
+    """Checkpoint state of one source file"""
+
+    def __init__(self, out_dir: Path, source_file: Path, fingerprint: Dict):
+        self.dir = out_dir / CHECKPOINT_DIR / source_file.name
+        self.manifest_path = self.dir / "manifest.json"
+        # Source file identity and settings that change the results; a mismatch invalidates the checkpoint
+        self.fingerprint = fingerprint
+        self.manifest = self._new_manifest()
+
+    def _new_manifest(self) -> Dict:
+        return {'version': FORMAT_VERSION, 'fingerprint': self.fingerprint, 'chunks': {}, 'result': None}
+
+    def load(self) -> bool:
+        """Load an existing compatible checkpoint; returns False if there is none"""
+        try:
+            manifest = json.loads(self.manifest_path.read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            return False
+        if manifest.get('version') != FORMAT_VERSION or manifest.get('fingerprint') != self.fingerprint:
+            return False
+        self.manifest = manifest
+        return True
+
+    def reset(self):
+        """Discard any previous checkpoint of this file"""
+        shutil.rmtree(self.dir, ignore_errors=True)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.manifest = self._new_manifest()
+        self._write_manifest()
+
+    def _write_manifest(self):
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self.manifest, indent=2))
+        os.replace(tmp_path, self.manifest_path)
+
+    def _part_path(self, chunk_idx: int) -> Path:
+        return self.dir / f"chunk_{chunk_idx:06d}.pkl"
+
+    @property
+    def finished_result(self) -> Optional[Dict]:
+        """Per-file result recorded once the whole file was written"""
+        return self.manifest.get('result')
+
+    def chunk_record(self, chunk_idx: int) -> Optional[Dict]:
+        return self.manifest['chunks'].get(str(chunk_idx))
+
+    def save_chunk(self, chunk_idx: int, part: Dict, record: Dict):
+        """Persist what resuming a classified chunk needs, then mark it done in the manifest"""
+        part_path = self._part_path(chunk_idx)
+        tmp_path = part_path.with_suffix(".tmp")
+        pd.to_pickle(part, tmp_path)
+        os.replace(tmp_path, part_path)
+
+        self.manifest['chunks'][str(chunk_idx)] = record
+        self._write_manifest()
+
+    def load_chunk(self, chunk_idx: int) -> Dict:
+        return pd.read_pickle(self._part_path(chunk_idx))
+
+    def mark_finished(self, result: Dict):
+        """Record the file result and drop the chunk parts (the *_result file is complete)"""
+        self.manifest['result'] = result
+        self._write_manifest()
+        for part_path in self.dir.glob("chunk_*.pkl"):
+            part_path.unlink()
@@ -1,10 +1,510 @@
 """
-Classifier module - integrate your run_classifier function here
+Classifier module - runs SR opening and quickfill predictions over desk files
 """
-import time
+import multiprocessing
+import os
+import queue
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+from functools import partial
 from pathlib import Path
-from typing import Literal
+from typing import Dict, Iterator, List, Literal, Optional, Tuple
+import numpy as np
 import pandas as pd
+from .cascade import LLM_STAGE, LOCAL_STAGE, ensure_model, local_labels
+from .config import config
+from .engine import AdaptiveConcurrency, latency_percentiles, run_pipeline, run_predictions
+from .checkpoint import FileCheckpoint
+from .fileio import ChunkedResultWriter, iter_frame_chunks, load_frame
+from .filters import FilterPipeline
+from .metrics import KpiCounts
+from .near_dup import near_duplicate_clusters
+from .normalize import normalize_texts
+from .prompts import fit_emails
+
+SR_ID_COLUMN = config.analysis["sr_id_column"]
+CLUSTER_ID_COLUMN = "cluster_id"
+EMAIL_TOKENS_COLUMN = "email_tokens"
+PRED_OPENING_COLUMN = config.analysis["predicted_opening_column"]
+PRED_QF_COLUMN = config.analysis["predicted_quickfill_column"]
+LABEL_STAGE_COLUMN = config.analysis["label_stage_column"]
+# Columns classify_frame adds to a chunk: all a checkpoint keeps of its rows
+PREDICTION_COLUMNS = [EMAIL_TOKENS_COLUMN, CLUSTER_ID_COLUMN, LABEL_STAGE_COLUMN, PRED_OPENING_COLUMN, PRED_QF_COLUMN]
+SR_LABEL = config.analysis["sr_labels"]["creation"]
+ARCHIVE_LABEL = config.analysis["sr_labels"]["archive"]
+
+
+@dataclass
+class RunOptions:
+    """Per-test settings shared by every file of a run"""
+    mode: Literal['sr', 'qf', 'both']
+    use_filter: bool
+    async_mode: bool
+    max_concurrency: int
+    batch_size: int
+    # Rows per chunk in streaming mode (None = load each file at once)
+    chunk_size: Optional[int] = None
+    # Skip chunks / files checkpointed by a previous interrupted run
+    resume: bool = False
+    # Fraction of the configured rate limits available to one worker process
+    rate_share: float = 1.0
+    # Send one representative per near-duplicate cluster to the LLM
+    collapse_near_duplicates: bool = False
+    # Let the local model label confident SR / Archive cases before the LLM
+    cascade: bool = False
+    # Tune the in-flight limit at runtime, starting from max_concurrency
+    adaptive_concurrency: bool = False
+    # Duplicate requests slower than the observed p95 latency
+    hedging: bool = False
+    # Suffix of the *_result files (None = same format as the source file)
+    output_suffix: Optional[str] = None
+    # Classify only a stratified sample of each file: a fraction of its filtered
+    # rows or a number of rows (at most one of the two is set)
+    sample_fraction: Optional[float] = None
+    sample_rows: Optional[int] = None
+
+
+def list_source_files(source_path: str) -> List[Path]:
+    """Return the source file itself or all supported files in the folder"""
+    source = Path(source_path)
+    if not source.exists():
+        raise ValueError(f"Source path does not exist: {source_path}")
+
+    if source.is_file():
+        return [source]
+    return sorted(
+        file for file in source.iterdir()
+        if file.suffix in config.ALLOWED_FILE_TYPES and '_result' not in file.stem
+    )
+
+
+def ground_truth_sr_mask(df: pd.DataFrame) -> pd.Series:
+    """Ground truth SR creation: sr_id present and non-zero"""
+    return df[SR_ID_COLUMN].notna() & (df[SR_ID_COLUMN] != 0)
+
+
+def stratified_sample(df: pd.DataFrame, fraction: float) -> pd.DataFrame:
+    """
+    Sample `fraction` of the rows of each ground truth class (SR / Archive),
+    keeping at least one row of every class present. Rows stay in file order.
+    """
+    if fraction >= 1:
+        return df
+    strata = ground_truth_sr_mask(df)
+    sampled = [
+        rows.sample(n=max(1, round(len(rows) * fraction)), random_state=config.sampling["random_seed"])
+        for _, rows in df.groupby(strata)
+    ]
+    return pd.concat(sampled).sort_index() if sampled else df
+
+
+class StratifiedQuota:
+    """
+    Stratified sample of a fixed number of rows of a file, drawn chunk by chunk.
+
+    The quota of each ground truth class (SR / Archive) is proportional to
+    its share of the filtered rows (at least one row of every class
+    present), and every chunk contributes in proportion to its rows of the
+    class, so the sample has exactly the quota sizes once all chunks are seen.
+    """
+
+    def __init__(self, class_totals: Dict[bool, int], rows: int):
+        filtered_total = sum(class_totals.values())
+        fraction = min(1.0, rows / max(filtered_total, 1))
+        self.totals = class_totals
+        self.quotas = {is_sr: max(1, round(total * fraction)) if total else 0
+                       for is_sr, total in class_totals.items()}
+        self.seen = {is_sr: 0 for is_sr in class_totals}
+
+    def _advance(self, is_sr: bool, rows: int) -> int:
+        """Rows to take out of the next `rows` rows of a class"""
+        total, quota, seen = self.totals.get(is_sr, 0), self.quotas.get(is_sr, 0), self.seen.get(is_sr, 0)
+        self.seen[is_sr] = seen + rows
+        if not total:
+            return 0
+        return min(rows, round(min(seen + rows, total) * quota / total) - round(min(seen, total) * quota / total))
+
+    def skip(self, sr_rows: int, archive_rows: int):
+        """Account for a chunk sampled before (resumed from its checkpoint)"""
+        self._advance(True, sr_rows)
+        self._advance(False, archive_rows)
+
+    def take(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Sample the filtered rows of the next chunk. Rows stay in file order."""
+        strata = ground_truth_sr_mask(df)
+        sampled = [
+            rows.sample(n=self._advance(is_sr, len(rows)), random_state=config.sampling["random_seed"])
+            for is_sr, rows in df.groupby(strata)
+        ]
+        return pd.concat(sampled).sort_index() if sampled else df
+
+
+def filtered_class_totals(file: Path, options: RunOptions) -> Dict[bool, int]:
+    """Ground truth SR (True) / Archive (False) rows of a file after filtering, read chunk by chunk"""
+    totals = {True: 0, False: 0}
+    filters = FilterPipeline.from_config() if options.use_filter else None
+    for df in iter_frame_chunks(file, options.chunk_size):
+        if filters is not None:
+            df, _ = filters.apply(df)
+        is_sr = int(ground_truth_sr_mask(df).sum())
+        totals[True] += is_sr
+        totals[False] += len(df) - is_sr
+    return totals
+
+
+def build_email_text(df: pd.DataFrame) -> pd.Series:
+    """Text sent to the LLM for each email: subject followed by body"""
+    subject = df[config.SUBJECT_COLUMN].fillna('').astype(str) if config.SUBJECT_COLUMN in df.columns else ''
+    body = df[config.BODY_COLUMN].fillna('').astype(str) if config.BODY_COLUMN in df.columns else ''
+    return "Subject: " + subject + "\n\n" + body
+
+
+def classify_frame(df: pd.DataFrame, options: RunOptions, stats: Optional[dict] = None,
+                   shared_slots=None, concurrency: Optional[AdaptiveConcurrency] = None,
+                   normalization_stats: Optional[dict] = None) -> pd.DataFrame:
+    """
+    Add predicted_opening / predicted_quickfill columns to a filtered frame.
+
+    Engine counters are added to `stats`, and per-stage normalization
+    timings / removed tokens to `normalization_stats`.
+    """
+    df = df.copy()
+    full_texts = build_email_text(df)
+    # The LLM gets the normalized email, fitted to the token budget
+    texts, stage_stats = normalize_texts(full_texts)
+    texts, df[EMAIL_TOKENS_COLUMN], trim_counts = fit_emails(texts)
+    if stats is not None:
+        merge_counts(stats, trim_counts)
+    if normalization_stats is not None:
+        merge_stage_stats(normalization_stats, stage_stats)
+
+    clusters = None
+    if options.collapse_near_duplicates:
+        # Cluster id = row number (in the source file) of the cluster's first email
+        clusters = near_duplicate_clusters(texts)
+        df[CLUSTER_ID_COLUMN] = clusters
+
+    engine_options = dict(
+        async_mode=options.async_mode,
+        max_concurrency=options.max_concurrency,
+        batch_size=options.batch_size,
+        stats=stats,
+        shared_slots=shared_slots,
+        rate_share=options.rate_share,
+        concurrency=concurrency,
+        hedging=options.hedging
+    )
+
+    def run(task: str, task_texts: pd.Series) -> list:
+        return run_predictions(task, task_texts.tolist(), **engine_options)
+
+    def predict(task: str, task_texts: pd.Series) -> list:
+        if clusters is None:
+            return run(task, task_texts)
+
+        # Classify the first email of each cluster and copy its label to the others
+        task_clusters = clusters[task_texts.index]
+        representatives = ~task_clusters.duplicated()
+        labels = pd.Series(run(task, task_texts[representatives]), index=task_clusters[representatives].values,
+                           dtype=object)
+        if stats is not None:
+            merge_counts(stats, {'collapsed_predictions': int((~representatives).sum())})
+        return task_clusters.map(labels).tolist()
+
+    def predict_pipelined(known: pd.Series) -> Tuple[list, list]:
+        # Rows the local model left uncertain hold NaN: hand them to the engine as None
+        known = known.astype(object).where(known.notna(), None)
+        if clusters is None:
+            return run_pipeline(texts.tolist(), known.tolist(), **engine_options)
+
+        # Rows of a cluster share both labels, unless the local model labelled them differently
+        groups = pd.DataFrame({'cluster': clusters, 'known': known.fillna('')}).groupby(
+            ['cluster', 'known'], sort=False
+        ).ngroup()
+        representatives = ~groups.duplicated()
+        sr_labels, qf_labels = run_pipeline(
+            texts[representatives].tolist(), known[representatives].tolist(), **engine_options
+        )
+        index = groups[representatives].values
+        sr_labels = groups.map(pd.Series(sr_labels, index=index, dtype=object))
+        qf_labels = groups.map(pd.Series(qf_labels, index=index, dtype=object))
+        if stats is not None:
+            collapsed = ~representatives & (known.isna() | (sr_labels == SR_LABEL))
+            merge_counts(stats, {'collapsed_predictions': int(collapsed.sum())})
+        return sr_labels.tolist(), qf_labels.tolist()
+
+    if options.mode in ['sr', 'both']:
+        df[PRED_OPENING_COLUMN] = None
+        uncertain = pd.Series(True, index=df.index)
+        if options.cascade:
+            # The local model is trained on full texts
+            df[PRED_OPENING_COLUMN] = local_labels(full_texts)
+            uncertain = df[PRED_OPENING_COLUMN].isna()
+            df[LABEL_STAGE_COLUMN] = np.where(uncertain, LLM_STAGE, LOCAL_STAGE)
+            if stats is not None:
+                merge_counts(stats, {'cascade_local': int((~uncertain).sum())})
+
+        if options.mode == 'sr':
+            # Only the uncertain band goes to the LLM
+            df.loc[uncertain, PRED_OPENING_COLUMN] = predict('sr', texts[uncertain])
+        else:
+            # Quickfills (for SR predictions only) start as soon as each SR label is known
+            df[PRED_OPENING_COLUMN], df[PRED_QF_COLUMN] = predict_pipelined(df[PRED_OPENING_COLUMN])
+    else:
+        # QF only: evaluate quickfills on the ground truth SR creations
+        df[PRED_OPENING_COLUMN] = ground_truth_sr_mask(df).map({True: SR_LABEL, False: ARCHIVE_LABEL})
+        # Only predict quickfill for SR predictions
+        sr_mask = df[PRED_OPENING_COLUMN] == SR_LABEL
+        df[PRED_QF_COLUMN] = None
+        df.loc[sr_mask, PRED_QF_COLUMN] = predict('qf', texts[sr_mask])
+
+    return df
+
+
+def _iter_source_chunks(file: Path, options: RunOptions) -> Iterator[pd.DataFrame]:
+    if options.chunk_size:
+        yield from iter_frame_chunks(file, options.chunk_size)
+    else:
+        yield load_frame(file)
+
+
+def _queue_report(progress_queue, event: str, message: str):
+    progress_queue.put((event, message))
+
+
+def _serial_report(progress_callback, metrics_callback, current: int, total: int, event: str, message):
+    """process_file report callback of the current-th of total files in a single-process run"""
+    if event == 'metrics':
+        if metrics_callback:
+            metrics_callback(*message)
+    elif event != 'finished' and progress_callback:
+        progress_callback(current=current, total=total, message=message)
+
+
+def merge_counts(target: dict, counts: dict):
+    """Add the integer counters of `counts` into `target`"""
+    for name, value in counts.items():
+        target[name] = target.get(name, 0) + value
+
+
+def merge_stage_stats(target: dict, stage_stats: dict):
+    """Add per-stage counters ({stage: {name: value}}) into `target`"""
+    for stage, counts in stage_stats.items():
+        merge_counts(target.setdefault(stage, {}), counts)
+
+
+def process_file(file: Path, out_dir: Path, options: RunOptions, shared_slots=None, report: callable = None) -> dict:
+    """
+    Load, filter, classify and write one desk file.
+
+    In streaming mode the file is read and classified chunk by chunk, so
+    memory stays bounded by the chunk size. Every classified chunk (the whole
+    file when not streaming) is appended to the result file and its
+    predictions are checkpointed under out_dir; with options.resume, finished
+    files are skipped and checkpointed chunks are rebuilt from their source
+    rows without being classified again.
+    `report(event, message)` receives 'started' / 'chunk' / 'finished'
+    progress events (forwarded to the parent process in parallel runs), and
+    after every chunk a 'metrics' event whose message is (source file name,
+    KpiCounts of the file so far as a dict).
+    """
+    output_file = out_dir / f"{file.stem}_result{options.output_suffix or file.suffix}"
+    source_stat = file.stat()
+    checkpoint = FileCheckpoint(out_dir, file, {
+        # A changed source file or output format invalidates the checkpoint too
+        'source_size': source_stat.st_size,
+        'source_mtime_ns': source_stat.st_mtime_ns,
+        'output_suffix': output_file.suffix,
+        'mode': options.mode,
+        'use_filter': options.use_filter,
+        'collapse_near_duplicates': options.collapse_near_duplicates,
+        'cascade': options.cascade,
+        'chunk_size': options.chunk_size,
+        'sample_fraction': options.sample_fraction,
+        'sample_rows': options.sample_rows,
+    })
+    if not (options.resume and checkpoint.load()):
+        checkpoint.reset()
+    elif checkpoint.finished_result is not None:
+        if report:
+            report('finished', f"Already completed {file.name}")
+        return checkpoint.finished_result
+
+    if report:
+        report('started', f"Processing {file.name}...")
+
+    totals = {
+        'original_total': 0, 'original_sr': 0, 'sr_count': 0, 'archive_count': 0,
+        'filtered_total': 0, 'sampled_total': 0
+    }
+    prediction_stats = {}
+    filter_stats = {}
+    normalization_stats = {}
+    kpi_counts = KpiCounts()
+    # Stateful across chunks (sr_id dedup), so one pipeline per file
+    filters = FilterPipeline.from_config() if options.use_filter else None
+    # One controller per file so the tuned limit carries over between chunks
+    concurrency = None
+    if options.adaptive_concurrency and options.async_mode:
+        concurrency = AdaptiveConcurrency(initial=options.max_concurrency)
+    quota = None
+    if options.sample_rows is not None and options.chunk_size:
+        # Streaming: a first pass counts the filtered rows of each class, so the
+        # sample size holds after filtering
+        quota = StratifiedQuota(filtered_class_totals(file, options), options.sample_rows)
+
+    row_offset = 0
+    # Classified chunks are appended to out_path (_result suffix) as they are done
+    with ChunkedResultWriter(output_file) as writer:
+        for chunk_idx, df_original in enumerate(_iter_source_chunks(file, options)):
+            # Label rows by their position in the source file (used as cluster ids)
+            df_original.index = pd.RangeIndex(row_offset, row_offset + len(df_original))
+            row_offset += len(df_original)
+            record = checkpoint.chunk_record(chunk_idx)
+
+            if record is not None:
+                # Done before the interruption: rebuild its rows and restore its sample quota and dedup state
+                part = checkpoint.load_chunk(chunk_idx)
+                predictions = part['predictions']
+                df_result = df_original.loc[predictions.index].assign(**{
+                    column: predictions[column] for column in predictions.columns
+                })[part['columns']]
+                if filters is not None:
+                    filters.restore_state(part['filter_state'])
+                if quota is not None:
+                    quota.skip(record['filtered_sr'], record['filtered_total'] - record['filtered_sr'])
+            else:
+                # 1. Calculate PRE-FILTER stats
+                original_sr = int(ground_truth_sr_mask(df_original).sum())
+
+                # 2. Apply filters
+                chunk_filter_stats = {}
+                df_filtered = df_original
+                if filters is not None:
+                    df_filtered, chunk_filter_stats = filters.apply(df_original)
+
+                # 3. Keep only the stratified sample
+                filtered_total = len(df_filtered)
+                filtered_sr = int(ground_truth_sr_mask(df_filtered).sum())
+                filter_state = filters.kept_state(df_filtered) if filters is not None else {}
+                if options.sample_fraction is not None:
+                    df_filtered = stratified_sample(df_filtered, options.sample_fraction)
+                elif options.sample_rows is not None:
+                    chunk_quota = quota or StratifiedQuota(
+                        {True: filtered_sr, False: filtered_total - filtered_sr}, options.sample_rows
+                    )
+                    df_filtered = chunk_quota.take(df_filtered)
+
+                # 4. Run predictions on filtered data
+                chunk_prediction_stats = {}
+                chunk_normalization_stats = {}
+                df_result = classify_frame(df_filtered, options, chunk_prediction_stats, shared_slots, concurrency,
+                                           chunk_normalization_stats)
+
+                record = {
+                    'original_total': len(df_original),
+                    'original_sr': original_sr,
+                    'sr_count': int((df_result[PRED_OPENING_COLUMN] == SR_LABEL).sum()),
+                    'archive_count': int((df_result[PRED_OPENING_COLUMN] == ARCHIVE_LABEL).sum()),
+                    'filtered_total': filtered_total,
+                    'filtered_sr': filtered_sr,
+                    'sampled_total': len(df_result),
+                    'prediction_stats': chunk_prediction_stats,
+                    'filter_stats': chunk_filter_stats,
+                    'normalization_stats': chunk_normalization_stats,
+                    'kpi_counts': KpiCounts.from_frame(df_result).to_dict(),
+                }
+                checkpoint.save_chunk(chunk_idx, {
+                    'columns': list(df_result.columns),
+                    'predictions': df_result[[column for column in df_result.columns if column in PREDICTION_COLUMNS]],
+                    'filter_state': filter_state,
+                }, record)
+
+            writer.write(df_result)
+            merge_counts(totals, {name: record[name] for name in totals})
+            merge_counts(prediction_stats, record['prediction_stats'])
+            merge_counts(filter_stats, record['filter_stats'])
+            merge_stage_stats(normalization_stats, record.get('normalization_stats', {}))
+            kpi_counts.merge(KpiCounts.from_dict(record['kpi_counts']))
+
+            if report:
+                report('metrics', (file.name, kpi_counts.to_dict()))
+            if report and options.chunk_size:
+                report('chunk', f"{file.name}: chunk {chunk_idx + 1} done ({totals['original_total']:,} rows read)")
+
+    sampled = options.sample_fraction is not None or options.sample_rows is not None
+    result = {
+        'file_stat': {
+            'source_file': file.name,
+            'original_total': int(totals['original_total']),
+            'original_sr_count': int(totals['original_sr']),
+            'original_archive_count': int(totals['original_total'] - totals['original_sr']),
+            'filtered_total': int(totals['filtered_total']),
+            'sampled_total': int(totals['sampled_total']) if sampled else None,
+            'filter_stats': filter_stats,
+        },
+        'prediction_stats': prediction_stats,
+        'normalization_stats': normalization_stats,
+        'result_file': output_file.name,
+        'kpi_counts': kpi_counts.to_dict(),
+        'concurrency_history': concurrency.history if concurrency is not None else None,
+        'sr_count': totals['sr_count'],
+        'archive_count': totals['archive_count'],
+    }
+    checkpoint.mark_finished(result)
+
+    if report:
+        report('finished', f"Finished {file.name}")
+    return result
+
+
+def _process_files_parallel(files: List[Path], out_dir: Path, options: RunOptions, workers: int,
+                            progress_callback: callable = None, metrics_callback: callable = None) -> List[dict]:
+    """Fan files out to a process pool sharing one LLM concurrency budget"""
+    total_files = len(files)
+    # Each process runs its own rate limiter, so split the configured rates
+    options = replace(options, rate_share=1.0 / workers)
+    with multiprocessing.Manager() as manager:
+        if not options.async_mode:
+            run_slots = 1
+        elif options.adaptive_concurrency:
+            # Each process tunes its own limit; the run-wide cap is the configured maximum
+            run_slots = config.MAX_CONCURRENCY_LIMIT
+        else:
+            run_slots = options.max_concurrency
+        shared_slots = manager.BoundedSemaphore(run_slots)
+        progress_queue = manager.Queue()
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            report = partial(_queue_report, progress_queue)
+            futures = [
+                pool.submit(process_file, file, out_dir, options, shared_slots, report)
+                for file in files
+            ]
+
+            # Merge worker progress events into the (current, total, message) contract
+            finished = 0
+            while finished < total_files:
+                try:
+                    event, message = progress_queue.get(timeout=1)
+                except queue.Empty:
+                    # Surface worker crashes instead of waiting forever
+                    failed = next((f for f in futures if f.done() and f.exception()), None)
+                    if failed is not None:
+                        raise failed.exception()
+                    continue
+
+                if event == 'metrics':
+                    if metrics_callback:
+                        metrics_callback(*message)
+                    continue
+                if event == 'finished':
+                    finished += 1
+                if progress_callback:
+                    progress_callback(current=finished, total=total_files, message=message)
+
+            # Results in source file order
+            return [future.result() for future in futures]
 
 
 def run_classifier(
@@ -12,30 +512,73 @@ def run_classifier(
     out_path: str,
     mode: Literal['sr', 'qf', 'both'] = 'both',
     use_filter: bool = True,
+    collapse_near_duplicates: bool = False,
+    cascade: bool = False,
     async_mode: bool = True,
     max_concurrency: int = 20,
-    progress_callback: callable = None
+    adaptive_concurrency: bool = False,
+    hedging: bool = False,
+    output_format: Literal['same', 'csv', 'xlsx', 'parquet'] = 'same',
+    sample_fraction: Optional[float] = None,
+    sample_rows: Optional[int] = None,
+    progress_callback: callable = None,
+    metrics_callback: callable = None,
+    batch_size: Optional[int] = None,
+    workers: Optional[int] = None,
+    streaming: bool = False,
+    chunk_size: Optional[int] = None,
+    resume: bool = False
 ) -> dict:
     """
-    TODO: Replace this function with your actual classifier implementation
+    Classify every email of the source file(s) and write *_result files.
 
-    IMPORTANT: Your function must return file_stats with pre-filter statistics!
+    Predictions are sent to the LLM endpoint configured in the "llm" section
+    of config.json (see utils/engine.py). Point it at your model, or start
+    the local mock server with `python -m utils.mock_llm` for offline runs.
 
     Args:
         source_path: Path to source file/folder containing emails
         out_path: Output path for results
         mode: Classification mode ('sr', 'qf', or 'both')
         use_filter: Whether to use aggressive filters
+        collapse_near_duplicates: Classify one email per near-duplicate cluster (MinHash/LSH,
+            within each file or streaming chunk) and copy its labels; adds a cluster_id column
+        cascade: Label confident SR / Archive cases with the local model (utils/cascade.py) and send
+            only the uncertain ones to the LLM; adds a label_stage column ('local' / 'llm')
         async_mode: Whether to run parallel predictions
-        max_concurrency: Max concurrent predictions
+        max_concurrency: Max concurrent predictions (shared by all files of the run)
+        adaptive_concurrency: Tune the in-flight limit of each file at runtime (AIMD), starting
+            from max_concurrency and capped at max_concurrency_limit in config.json
+        hedging: Send a duplicate of any request slower than the observed p95 latency
+            and keep the first answer
+        output_format: Format of the *_result files ('same' = format of each source file)
+        sample_fraction: Classify only this fraction (0 < f <= 1) of the filtered rows of each
+            file, stratified by ground truth SR / Archive. None = every row
+        sample_rows: Classify only this many of the filtered rows of each file, stratified
+            likewise (exact in streaming mode too). Exclusive with sample_fraction
         progress_callback: Optional callback function(current, total, message) for progress updates
+        metrics_callback: Optional callback function(file_metrics) called after every chunk with
+            {source file: KpiCounts dict of the file so far} (see utils/metrics.py)
+        batch_size: Emails packed into one LLM request (None = "batch_size" of the mode in config.json)
+        workers: Files processed in parallel processes (None = "file_workers" in config.json, 0 = CPU count)
+        streaming: Read, classify and write each file in chunks to bound memory usage
+        chunk_size: Rows per chunk in streaming mode (None = "chunk_size" in config.json)
+        resume: Continue an interrupted run from its checkpoints in out_path
 
     Returns:
         dict with keys:
             - total_emails: int (total ORIGINAL emails across all files)
-            - processed_emails: int (total FILTERED emails across all files)
+            - processed_emails: int (total FILTERED, or sampled, emails across all files)
             - sr_positive: int (optional, aggregated)
             - sr_negative: int (optional, aggregated)
+            - cache_hits / cache_misses: int (prediction cache lookups)
+            - prediction_stats: dict (engine counters: requests, failures, tokens...)
+            - latency_percentiles: dict (p50 / p95 / p99 prediction call latency in ms)
+            - normalization_stats: dict (stage -> {'ms': run time, 'tokens_removed': int})
+            - file_metrics: dict (result file name -> KpiCounts dict, for
+                analyzer.analyze_test_results without re-reading the result files)
+            - concurrency_history: dict (source file -> [[seconds, in-flight limit], ...],
+                only with adaptive_concurrency)
             - file_stats: list[dict] (REQUIRED for per-file original stats)
                 Each dict must have:
                     - source_file: str (e.g., 'desk_A.csv')
@@ -43,139 +586,106 @@ def run_classifier(
                     - original_sr_count: int (SR creations before filtering)
                     - original_archive_count: int (archives before filtering)
                     - filtered_total: int (emails after filtering)
+                    - sampled_total: int (emails classified, None unless sampling)
+                    - filter_stats: dict (rows removed by each filter rule)
+    """
+    if sample_fraction is not None and sample_rows is not None:
+        raise ValueError("Use either sample_fraction or sample_rows, not both")
+    if sample_fraction is not None and not 0 < sample_fraction <= 1:
+        raise ValueError(f"sample_fraction must be in (0, 1], got {sample_fraction}")
+    if sample_rows is not None and sample_rows < 1:
+        raise ValueError(f"sample_rows must be at least 1, got {sample_rows}")
 
-    Example Implementation:
-
-    from pathlib import Path
-    import pandas as pd
-
-    def run_classifier(source_path, out_path, mode='both', use_filter=True,
-                       async_mode=True, max_concurrency=20):
-        source = Path(source_path)
-        out_dir = Path(out_path)
-        out_dir.mkdir(parents=True, exist_ok=True)
-
-        # Get files to process
-        if source.is_file():
-            files = [source]
-        else:
-            files = list(source.glob("*.csv")) + list(source.glob("*.xlsx"))
+    out_dir = Path(out_path)
+    out_dir.mkdir(parents=True, exist_ok=True)
 
-        file_stats = []
-        total_original = 0
-        total_filtered = 0
-        total_sr = 0
-        total_archive = 0
-        total_files = len(files)
+    options = RunOptions(
+        mode=mode,
+        use_filter=use_filter,
+        async_mode=async_mode,
+        max_concurrency=max_concurrency,
+        batch_size=batch_size or config.llm["batch_size"][mode],
+        chunk_size=(chunk_size or config.CHUNK_SIZE) if streaming else None,
+        resume=resume,
+        collapse_near_duplicates=collapse_near_duplicates,
+        cascade=cascade and mode in ['sr', 'both'],
+        adaptive_concurrency=adaptive_concurrency,
+        hedging=hedging,
+        output_suffix=None if output_format == 'same' else f".{output_format}",
+        sample_fraction=sample_fraction,
+        sample_rows=sample_rows,
+    )
 
-        for idx, file in enumerate(files):
-            # Report progress
-            if progress_callback:
-                progress_callback(
-                    current=idx + 1,
-                    total=total_files,
-                    message=f"Processing {file.name}..."
-                )
-            # 1. Load ORIGINAL file
-            if file.suffix == '.csv':
-                df_original = pd.read_csv(file)
-            else:
-                df_original = pd.read_excel(file)
-
-            # 2. Calculate PRE-FILTER stats
-            original_total = len(df_original)
-            original_sr = (df_original['sr_id'].notna() & (df_original['sr_id'] != 0)).sum()
-            original_archive = original_total - original_sr
-
-            # 3. Apply YOUR filters
-            if use_filter:
-                # Example filters (replace with yours):
-                df_filtered = df_original[
-                    ~df_original['sender_email'].isin(your_blocked_senders)
-                ].drop_duplicates(subset=['sr_id'], keep='first')
-            else:
-                df_filtered = df_original
+    files = list_source_files(source_path)
+    if not files:
+        raise ValueError(f"No source files found in {source_path}")
 
-            # 4. Run YOUR classifier on filtered data
-            df_filtered['predicted_opening'] = your_sr_classifier(df_filtered, mode, async_mode, max_concurrency)
+    if options.cascade:
+        # Train once here rather than in every worker process; without enough
+        # labelled history every email goes to the LLM (label_stage 'llm')
+        ensure_model()
+    total_files = len(files)
 
-            if mode in ['qf', 'both']:
-                # Only predict quickfill for SR predictions
-                sr_mask = df_filtered['predicted_opening'] == 'SR'
-                df_filtered.loc[sr_mask, 'predicted_quickfill'] = your_qf_classifier(
-                    df_filtered[sr_mask], async_mode, max_concurrency
-                )
+    if workers is None:
+        workers = config.FILE_WORKERS
+    workers = min(workers or os.cpu_count() or 1, total_files)
 
-            # 5. Save to out_path with _result suffix
-            output_file = out_dir / f"{file.stem}_result{file.suffix}"
-            if file.suffix == '.csv':
-                df_filtered.to_csv(output_file, index=False)
-            else:
-                df_filtered.to_excel(output_file, index=False)
-
-            # 6. Track stats
-            filtered_total = len(df_filtered)
-
-            file_stats.append({
-                'source_file': file.name,
-                'original_total': int(original_total),
-                'original_sr_count': int(original_sr),
-                'original_archive_count': int(original_archive),
-                'filtered_total': int(filtered_total),
-            })
-
-            total_original += original_total
-            total_filtered += filtered_total
-            if mode in ['sr', 'both']:
-                total_sr += (df_filtered['predicted_opening'] == 'SR').sum()
-                total_archive += (df_filtered['predicted_opening'] == 'Archive').sum()
-
-        # 7. Return with file_stats
-        return {
-            'total_emails': int(total_original),
-            'processed_emails': int(total_filtered),
-            'sr_positive': int(total_sr) if mode in ['sr', 'both'] else None,
-            'sr_negative': int(total_archive) if mode in ['sr', 'both'] else None,
-            'file_stats': file_stats,  # REQUIRED!
-        }
-    """
+    live_metrics = {}
 
-    # TODO: Remove this simulation code and replace with your implementation
-    # This is just a placeholder that simulates progress
+    def collect_metrics(source_file: str, kpi_counts: dict):
+        live_metrics[source_file] = kpi_counts
+        metrics_callback(dict(live_metrics))
 
-    # Simulate multiple files with progress
-    file_stats = []
-    simulated_files = [
-        {'name': 'desk_A.csv', 'original_total': 1000, 'original_sr_count': 200, 'original_archive_count': 800, 'filtered_total': 400},
-        {'name': 'desk_B.csv', 'original_total': 1500, 'original_sr_count': 300, 'original_archive_count': 1200, 'filtered_total': 600},
-    ]
+    file_metrics_callback = collect_metrics if metrics_callback else None
 
-    total_files = len(simulated_files)
-
-    for idx, sim_file in enumerate(simulated_files):
-        # Report progress
-        if progress_callback:
-            progress_callback(
-                current=idx + 1,
-                total=total_files,
-                message=f"Processing {sim_file['name']}..."
-            )
+    if workers > 1:
+        file_results = _process_files_parallel(files, out_dir, options, workers, progress_callback,
+                                               file_metrics_callback)
+    else:
+        file_results = []
+        for idx, file in enumerate(files):
+            report = None
+            if progress_callback or metrics_callback:
+                # Report progress
+                report = partial(_serial_report, progress_callback, file_metrics_callback, idx + 1, total_files)
+            file_results.append(process_file(file, out_dir, options, report=report))
 
-        # Simulate processing time per file
-        time.sleep(1)
+    # Aggregate per-file results
+    file_stats = [result['file_stat'] for result in file_results]
+    prediction_stats = {}
+    normalization_stats = {}
+    for result in file_results:
+        merge_counts(prediction_stats, result['prediction_stats'])
+        merge_stage_stats(normalization_stats, result.get('normalization_stats', {}))
 
-        file_stats.append({
-            'source_file': sim_file['name'],
-            'original_total': sim_file['original_total'],
-            'original_sr_count': sim_file['original_sr_count'],
-            'original_archive_count': sim_file['original_archive_count'],
-            'filtered_total': sim_file['filtered_total'],
-        })
+    total_original = sum(stat['original_total'] for stat in file_stats)
+    total_filtered = sum(
+        stat['filtered_total'] if stat.get('sampled_total') is None else stat['sampled_total']
+        for stat in file_stats
+    )
+    total_sr = sum(result['sr_count'] for result in file_results)
+    total_archive = sum(result['archive_count'] for result in file_results)
 
     return {
-        'total_emails': 2500,  # Original total
-        'processed_emails': 1000,  # After filtering
-        'sr_positive': 350,
-        'sr_negative': 650,
+        'total_emails': int(total_original),
+        'processed_emails': int(total_filtered),
+        'sr_positive': int(total_sr) if mode in ['sr', 'both'] else None,
+        'sr_negative': int(total_archive) if mode in ['sr', 'both'] else None,
+        'cache_hits': prediction_stats.get('cache_hits', 0),
+        'cache_misses': prediction_stats.get('cache_misses', 0),
+        'prediction_stats': prediction_stats,
+        'latency_percentiles': latency_percentiles(prediction_stats),
+        'normalization_stats': normalization_stats or None,
+        'concurrency_history': {
+            stat['source_file']: result['concurrency_history']
+            for stat, result in zip(file_stats, file_results)
+            if result.get('concurrency_history')
+        } or None,
+        'file_metrics': {
+            result['result_file']: result['kpi_counts']
+            for result in file_results
+            # Files finished by a run from before KPI counts were recorded
+            if 'kpi_counts' in result
+        },
         'file_stats': file_stats,  # REQUIRED!
     }
@@ -2,11 +2,28 @@ import json
 from pathlib import Path
 from typing import List
 
+PROJECT_ROOT = Path(__file__).parent.parent
+
 # Load config.json
-config_path = Path(__file__).parent.parent / "config.json"
+config_path = PROJECT_ROOT / "config.json"
 with open(config_path, "r") as f:
     config_data = json.load(f)
 
+# Relative paths are relative to the project root, not to the working
+# directory of each process (Streamlit, job runner, workers...)
+PATH_SETTINGS = [
+    ("classifier", "output_directory"),
+    ("cascade", "model_path"),
+    ("conversion_cache", "directory"),
+    ("prediction_cache", "path"),
+    ("analysis_cache", "path"),
+    ("jobs", "pid_file"),
+    ("jobs", "log_file"),
+    ("storage", "test_history_file"),
+]
+for section, key in PATH_SETTINGS:
+    config_data[section][key] = str(PROJECT_ROOT / config_data[section][key])
+
 
 class Config:
     # App settings
@@ -21,10 +38,41 @@ class Config:
     MAX_CONCURRENCY_LIMIT = config_data["classifier"]["max_concurrency_limit"]
     ALLOWED_FILE_TYPES = config_data["classifier"]["allowed_file_types"]
     OUTPUT_DIRECTORY = config_data["classifier"]["output_directory"]
+    FILE_WORKERS = config_data["classifier"]["file_workers"]
+    CHUNK_SIZE = config_data["classifier"]["chunk_size"]
+    SUBJECT_COLUMN = config_data["classifier"]["subject_column"]
+    BODY_COLUMN = config_data["classifier"]["body_column"]
+
+    # Filter settings
+    FILTER_RULES = config_data["filters"]["rules"]
+
+    # LLM endpoint settings
+    llm = config_data["llm"]
+    mock_llm = config_data["mock_llm"]
+
+    # Prediction cache settings
+    prediction_cache = config_data["prediction_cache"]
+    conversion_cache = config_data["conversion_cache"]
+    analysis_cache = config_data["analysis_cache"]
+    near_duplicates = config_data["near_duplicates"]
+    cascade = config_data["cascade"]
+    sampling = config_data["sampling"]
+    estimator = config_data["estimator"]
+    normalization = config_data["normalization"]
+    prompt_budget = config_data["prompt_budget"]
 
     # Analysis settings
     analysis = config_data["analysis"]
 
+    # Job runner settings
+    JOB_WORKERS = config_data["jobs"]["num_workers"]
+    JOB_POLL_INTERVAL = config_data["jobs"]["poll_interval_seconds"]
+    JOB_HEARTBEAT_INTERVAL = config_data["jobs"]["heartbeat_interval_seconds"]
+    JOB_STALE_AFTER = config_data["jobs"]["stale_after_seconds"]
+    JOB_METRICS_INTERVAL = config_data["jobs"]["metrics_interval_seconds"]
+    JOB_PID_FILE = config_data["jobs"]["pid_file"]
+    JOB_LOG_FILE = config_data["jobs"]["log_file"]
+
     # Storage settings
     TEST_HISTORY_FILE = config_data["storage"]["test_history_file"]
     MAX_HISTORY_ITEMS = config_data["storage"]["max_history_items"]
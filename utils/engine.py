@@ -0,0 +1,744 @@
+"""
+Prediction engine - bounded-concurrency asyncio dispatcher for LLM calls
+
+Requests go to an OpenAI-compatible chat completions endpoint (see the
+"llm" section of config.json). Throughput is controlled by:
+    - a limit on the number of in-flight requests: fixed (max_concurrency)
+      or tuned at runtime by an AdaptiveConcurrency (AIMD) controller
+    - a pooled aiohttp session reusing keep-alive connections
+    - a token-bucket rate limiter (requests/s and tokens/min)
+
+Tail latency is bounded by retrying transient failures with jittered
+exponential backoff within a per-call deadline, and optionally by hedging:
+a request still unanswered after the observed p95 latency is sent a second
+time and the first answer wins.
+
+With batch_size > 1 several emails are packed into one request and the
+per-email labels are parsed back out of the numbered answer lines. When a
+PredictionCache is attached, only emails without a cached label are sent.
+
+In 'both' mode predict_pipeline streams SR and quickfill predictions: an
+email predicted SR is queued for its quickfill straight away, so the two
+stages overlap within the same in-flight limit instead of running one after
+the other.
+
+Run `python -m utils.mock_llm` to get a local endpoint for offline tests.
+"""
+import asyncio
+import bisect
+import logging
+import os
+import random
+import re
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, List, Literal, Optional, Tuple
+import aiohttp
+from .config import config
+from .prediction_cache import PredictionCache, make_key, prompt_version
+from .prompts import system_prompt
+
+logger = logging.getLogger(__name__)
+
+PredictionTask = Literal['sr', 'qf']
+
+# Answer line of a batched request, e.g. "3: Archive"
+BATCH_ANSWER_RE = re.compile(r'^\s*(\d+)\s*[:.)\]-]\s*(.+?)\s*$', re.MULTILINE)
+
+
+# Upper bounds (ms) of the latency histogram buckets, 25% apart from 10 ms to ~2 min
+LATENCY_BUCKETS_MS = [round(10 * 1.25 ** i) for i in range(43)]
+LATENCY_STAT_PREFIX = "latency_ms_le_"
+
+# Statuses worth retrying: throttling, timeouts and server errors
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) used for rate limiting"""
+    return max(1, len(text) // 4)
+
+
+def latency_stat_key(seconds: float) -> str:
+    """Histogram counter a call latency falls into (plain int counters merge across runs)"""
+    index = bisect.bisect_left(LATENCY_BUCKETS_MS, seconds * 1000)
+    bound = LATENCY_BUCKETS_MS[index] if index < len(LATENCY_BUCKETS_MS) else "inf"
+    return f"{LATENCY_STAT_PREFIX}{bound}"
+
+
+def latency_percentiles(stats: Dict[str, int], percentiles=(50, 95, 99)) -> Optional[Dict[str, float]]:
+    """
+    Approximate call latency percentiles (ms) from the histogram counters in
+    engine stats; each value is the upper bound of the bucket it falls in.
+    """
+    buckets = []
+    for name, count in stats.items():
+        if name.startswith(LATENCY_STAT_PREFIX) and count:
+            bound = name[len(LATENCY_STAT_PREFIX):]
+            buckets.append((float(bound), count))
+    if not buckets:
+        return None
+
+    buckets.sort()
+    total = sum(count for _, count in buckets)
+    result = {}
+    for percentile in percentiles:
+        rank = total * percentile / 100
+        seen = 0
+        for bound, count in buckets:
+            seen += count
+            if seen >= rank:
+                result[f"p{percentile}"] = bound
+                break
+    return result
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at `rate` tokens per second"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1.0):
+        """Wait until `amount` tokens are available, then consume them"""
+        # A single request larger than the bucket would otherwise wait forever
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            self._refill()
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= amount
+
+
+class RateLimiter:
+    """Combined requests/s and tokens/min limiter; a limit of 0 disables it"""
+
+    def __init__(self, requests_per_second: float, tokens_per_minute: float):
+        self.request_bucket = None
+        self.token_bucket = None
+        if requests_per_second:
+            self.request_bucket = TokenBucket(rate=requests_per_second, capacity=max(1.0, requests_per_second))
+        if tokens_per_minute:
+            self.token_bucket = TokenBucket(rate=tokens_per_minute / 60.0, capacity=tokens_per_minute)
+
+    async def acquire(self, tokens: int):
+        if self.request_bucket:
+            await self.request_bucket.acquire(1)
+        if self.token_bucket:
+            await self.token_bucket.acquire(tokens)
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD controller for the number of in-flight requests.
+
+    The limit grows by one after a full window (`limit` responses) of
+    healthy latency, and is cut by `decrease_factor` on throttling (HTTP
+    429 / 503) or timeouts, within [min_concurrency, MAX_CONCURRENCY_LIMIT].
+    It holds plain state only, so one controller can follow a whole file
+    across the event loops of successive run_predictions() calls.
+    """
+
+    THROTTLE_STATUSES = {429, 503}
+    # History points kept per file; older points are thinned out beyond this
+    MAX_HISTORY = 2000
+
+    def __init__(self, initial: int, minimum: Optional[int] = None, maximum: Optional[int] = None):
+        settings = config.llm["adaptive_concurrency"]
+        self.minimum = minimum or settings["min_concurrency"]
+        self.maximum = maximum or config.MAX_CONCURRENCY_LIMIT
+        self.decrease_factor = settings["decrease_factor"]
+        self.latency_tolerance = settings["latency_tolerance"]
+        self.limit = max(self.minimum, min(initial, self.maximum))
+
+        self.baseline_latency: Optional[float] = None
+        self._healthy = 0
+        self._last_decrease = float('-inf')
+        self._started = time.monotonic()
+        # [seconds since start, limit] at every change
+        self.history: List[List[float]] = [[0.0, self.limit]]
+
+    def _set_limit(self, limit: int):
+        if limit != self.limit:
+            self.limit = limit
+            self.history.append([round(time.monotonic() - self._started, 2), limit])
+            if len(self.history) > self.MAX_HISTORY:
+                self.history = self.history[:-1:2] + self.history[-1:]
+
+    def on_success(self, latency: float):
+        # Baseline = lowest latency seen, slowly forgotten so it can follow the server
+        if self.baseline_latency is None:
+            self.baseline_latency = latency
+        else:
+            self.baseline_latency = min(latency, self.baseline_latency * 1.01)
+
+        if latency > self.baseline_latency * self.latency_tolerance:
+            # Requests are queueing at the server: stop growing
+            self._healthy = 0
+            return
+
+        self._healthy += 1
+        if self._healthy >= self.limit and self.limit < self.maximum:
+            self._healthy = 0
+            self._set_limit(self.limit + 1)
+
+    def on_throttle(self):
+        now = time.monotonic()
+        # Requests in flight when the server pushed back fail together; cut once per round trip
+        if now - self._last_decrease < (self.baseline_latency or 1.0):
+            return
+        self._last_decrease = now
+        self._healthy = 0
+        self._set_limit(max(self.minimum, int(self.limit * self.decrease_factor)))
+
+
+class PredictionEngine:
+    """
+    Async client dispatching SR and quickfill predictions to the LLM.
+
+    Use as an async context manager so the connection pool is opened and
+    closed around a batch of predictions:
+
+        async with PredictionEngine(max_concurrency=20) as engine:
+            labels = await engine.predict_many('sr', texts)
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = config.DEFAULT_MAX_CONCURRENCY,
+        requests_per_second: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        cache: Optional[PredictionCache] = None,
+        shared_slots=None,
+        rate_share: float = 1.0,
+        concurrency: Optional[AdaptiveConcurrency] = None,
+        hedging: bool = False,
+    ):
+        llm = config.llm
+        self.max_concurrency = max(1, min(max_concurrency, config.MAX_CONCURRENCY_LIMIT))
+        # Optional AIMD controller replacing the fixed max_concurrency limit
+        self.concurrency = concurrency
+        self.endpoint = llm["endpoint"]
+        self.model = llm["model"]
+        self.prompts = llm["prompts"]
+        self.max_output_tokens = llm["max_output_tokens"]
+        self.request_timeout = llm["request_timeout_seconds"]
+        self.call_deadline = llm["call_deadline_seconds"]
+        self.retry = llm["retry"]
+        self.hedging = hedging
+        # Recent request latencies, for the hedging threshold
+        self.recent_latencies = deque(maxlen=1000)
+        self.requests_per_second = llm["requests_per_second"] if requests_per_second is None else requests_per_second
+        self.tokens_per_minute = llm["tokens_per_minute"] if tokens_per_minute is None else tokens_per_minute
+        self.requests_per_second *= rate_share
+        self.tokens_per_minute *= rate_share
+
+        self.sr_labels = config.analysis["sr_labels"]
+        self.cache = cache
+        # Cross-process semaphore (multiprocessing.Manager) shared by all
+        # file workers of a run so they stay within one concurrency budget
+        self.shared_slots = shared_slots
+        self.prompt_versions = {
+            task: prompt_version(self.model, prompt) for task, prompt in self.prompts.items()
+        }
+        self.stats: Dict[str, int] = {
+            'requests': 0,
+            'cache_hits': 0,
+            'cache_misses': 0,
+            'failures': 0,
+            'batch_resplits': 0,
+            'prompt_tokens': 0,
+            'completion_tokens': 0,
+            'retries': 0,
+            'hedged_requests': 0,
+            'hedge_wins': 0,
+            'rate_limit_wait_ms': 0,  # Time requests spent queued in the local rate limiter
+        }
+
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.in_flight = 0
+        self._slot_freed: Optional[asyncio.Condition] = None
+        self.rate_limiter: Optional[RateLimiter] = None
+
+    @property
+    def concurrency_limit(self) -> int:
+        """Current in-flight request limit"""
+        return self.concurrency.limit if self.concurrency is not None else self.max_concurrency
+
+    @property
+    def concurrency_cap(self) -> int:
+        """Highest in-flight request limit the engine may reach"""
+        return self.concurrency.maximum if self.concurrency is not None else self.max_concurrency
+
+    async def __aenter__(self):
+        llm = config.llm
+        headers = {}
+        api_key = os.environ.get(llm["api_key_env"])
+        if api_key:
+            headers["Authorization"] = f"Bearer {api_key}"
+
+        connector = aiohttp.TCPConnector(
+            limit=max(llm["max_connections"], self.concurrency_cap),
+            keepalive_timeout=60
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            headers=headers,
+            timeout=aiohttp.ClientTimeout(total=self.request_timeout)
+        )
+        self._slot_freed = asyncio.Condition()
+        self.rate_limiter = RateLimiter(self.requests_per_second, self.tokens_per_minute)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.session.close()
+
+    @asynccontextmanager
+    async def _slot(self):
+        """Hold one in-flight request slot (local and, if set, run-wide)"""
+        # A condition rather than a semaphore: the limit may change while waiting
+        async with self._slot_freed:
+            await self._slot_freed.wait_for(lambda: self.in_flight < self.concurrency_limit)
+            self.in_flight += 1
+        try:
+            if self.shared_slots is None:
+                yield
+                return
+            await asyncio.to_thread(self.shared_slots.acquire)
+            try:
+                yield
+            finally:
+                self.shared_slots.release()
+        finally:
+            async with self._slot_freed:
+                self.in_flight -= 1
+                self._slot_freed.notify_all()
+
+    def _build_messages(self, task: PredictionTask, text: str) -> List[Dict]:
+        return [
+            {"role": "system", "content": system_prompt(task, batched=False)},
+            {"role": "user", "content": text},
+        ]
+
+    def _build_batch_messages(self, task: PredictionTask, texts: List[str]) -> List[Dict]:
+        emails = "\n\n".join(f"### Email {n}\n{text}" for n, text in enumerate(texts, start=1))
+        return [
+            {"role": "system", "content": system_prompt(task, batched=True)},
+            {"role": "user", "content": emails},
+        ]
+
+    async def _request(self, payload: Dict, prompt_tokens: int, timeout: float,
+                       queued: Optional[List[float]] = None) -> str:
+        """
+        Send one chat completion request and return the response text.
+
+        The time spent waiting for the rate limiter is added to the
+        rate_limit_wait_ms counter and appended to `queued` if given.
+        """
+        waiting = time.monotonic()
+        await self.rate_limiter.acquire(prompt_tokens + payload["max_tokens"])
+        wait = time.monotonic() - waiting
+        self.stats['rate_limit_wait_ms'] += int(wait * 1000)
+        if queued is not None:
+            queued.append(wait)
+
+        self.stats['requests'] += 1
+        started = time.monotonic()
+        try:
+            async with self.session.post(
+                self.endpoint, json=payload, timeout=aiohttp.ClientTimeout(total=min(timeout, self.request_timeout))
+            ) as response:
+                response.raise_for_status()
+                body = await response.json()
+        except aiohttp.ClientResponseError as e:
+            if self.concurrency is not None and e.status in AdaptiveConcurrency.THROTTLE_STATUSES:
+                self.concurrency.on_throttle()
+            raise
+        except asyncio.TimeoutError:
+            if self.concurrency is not None:
+                self.concurrency.on_throttle()
+            raise
+
+        latency = time.monotonic() - started
+        self.recent_latencies.append(latency)
+        if self.concurrency is not None:
+            self.concurrency.on_success(latency)
+
+        usage = body.get("usage") or {}
+        self.stats['prompt_tokens'] += usage.get("prompt_tokens", prompt_tokens)
+        self.stats['completion_tokens'] += usage.get("completion_tokens", 0)
+        return body["choices"][0]["message"]["content"]
+
+    def _hedge_delay(self) -> Optional[float]:
+        """Latency after which a duplicate request is sent (None = no hedging yet)"""
+        settings = config.llm["hedging"]
+        if not self.hedging or len(self.recent_latencies) < settings["min_samples"]:
+            return None
+        ordered = sorted(self.recent_latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * settings["percentile"] / 100))]
+
+    async def _hedged_request(self, payload: Dict, prompt_tokens: int, timeout: float,
+                              queued: Optional[List[float]] = None) -> str:
+        """
+        Send a request, duplicating it if it is slower than the hedging threshold.
+        Only the rate limiter wait of the primary request is appended to `queued`.
+        """
+        hedge_delay = self._hedge_delay()
+        if hedge_delay is None or hedge_delay >= timeout:
+            return await self._request(payload, prompt_tokens, timeout, queued)
+
+        primary = asyncio.create_task(self._request(payload, prompt_tokens, timeout, queued))
+        done, _ = await asyncio.wait({primary}, timeout=hedge_delay)
+        if done:
+            return primary.result()
+
+        # Hedges share the primary's slot: they are rare by construction (~5% of calls)
+        self.stats['hedged_requests'] += 1
+        hedge = asyncio.create_task(self._request(payload, prompt_tokens, timeout - hedge_delay))
+        pending = {primary, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.stats['hedge_wins'] += 1
+                        return task.result()
+            # Both failed: surface the primary's error
+            raise primary.exception()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _backoff_delay(self, attempt: int, error: Exception) -> float:
+        """Full-jitter exponential backoff, or the server's Retry-After if given"""
+        if isinstance(error, aiohttp.ClientResponseError) and error.headers:
+            retry_after = error.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return float(retry_after)
+        ceiling = min(self.retry["max_delay_seconds"], self.retry["base_delay_seconds"] * 2 ** (attempt - 1))
+        return random.uniform(0, ceiling)
+
+    async def _complete(self, messages: List[Dict], max_tokens: Optional[int] = None) -> str:
+        """
+        Get a chat completion, retrying transient failures with backoff until
+        max_attempts or the per-call deadline is reached.
+        """
+        max_tokens = max_tokens or self.max_output_tokens
+        prompt_tokens = sum(estimate_tokens(m["content"]) for m in messages)
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": 0,
+            "max_tokens": max_tokens,
+        }
+
+        started = time.monotonic()
+        deadline = started + self.call_deadline
+        # Rate limiter waits of the call, kept out of its latency
+        queued: List[float] = []
+        attempt = 1
+        while True:
+            try:
+                content = await self._hedged_request(payload, prompt_tokens, deadline - time.monotonic(), queued)
+                break
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                retryable = not isinstance(e, aiohttp.ClientResponseError) or e.status in RETRY_STATUSES
+                delay = self._backoff_delay(attempt, e)
+                if not retryable or attempt >= self.retry["max_attempts"] \
+                        or time.monotonic() + delay >= deadline:
+                    raise
+                self.stats['retries'] += 1
+                attempt += 1
+                await asyncio.sleep(delay)
+
+        # End-to-end latency of the call (retries and hedges included, local rate limiting excluded)
+        key = latency_stat_key(time.monotonic() - started - sum(queued))
+        self.stats[key] = self.stats.get(key, 0) + 1
+        return content
+
+    def _parse_label(self, task: PredictionTask, raw: str) -> str:
+        label = raw.strip().strip('."\'')
+        if task == 'qf':
+            return label
+
+        # Map free-text SR answers onto the configured labels, unsure -> Review
+        lowered = label.lower()
+        for key in ['creation', 'archive', 'review']:
+            if lowered == self.sr_labels[key].lower():
+                return self.sr_labels[key]
+        return self.sr_labels['review']
+
+    def _parse_batch(self, task: PredictionTask, raw: str, size: int) -> List[Optional[str]]:
+        """Extract per-email labels from a batched answer; unanswered emails stay None"""
+        labels: List[Optional[str]] = [None] * size
+        for match in BATCH_ANSWER_RE.finditer(raw):
+            position = int(match.group(1)) - 1
+            if 0 <= position < size and labels[position] is None:
+                labels[position] = self._parse_label(task, match.group(2))
+        return labels
+
+    async def predict(self, task: PredictionTask, text: str) -> Optional[str]:
+        """Predict a single label; returns None if the request failed"""
+        async with self._slot():
+            try:
+                raw = await self._complete(self._build_messages(task, text))
+            except (aiohttp.ClientError, asyncio.TimeoutError, KeyError, ValueError) as e:
+                self.stats['failures'] += 1
+                logger.warning("%s prediction failed: %s", task.upper(), e)
+                return None
+        return self._parse_label(task, raw)
+
+    async def predict_batch(self, task: PredictionTask, texts: List[str]) -> List[Optional[str]]:
+        """
+        Predict labels for several emails with a single request.
+
+        Emails missing from the answer are retried in a smaller batch; a batch
+        that fails entirely is split in two. Single emails fall back to
+        predict(), so only emails that fail on their own come back as None.
+        """
+        if len(texts) == 1:
+            return [await self.predict(task, texts[0])]
+
+        async with self._slot():
+            try:
+                raw = await self._complete(
+                    self._build_batch_messages(task, texts),
+                    max_tokens=(self.max_output_tokens + 4) * len(texts)
+                )
+                labels = self._parse_batch(task, raw, len(texts))
+            except (aiohttp.ClientError, asyncio.TimeoutError, KeyError, ValueError) as e:
+                self.stats['failures'] += 1
+                logger.warning("%s batch of %d failed: %s", task.upper(), len(texts), e)
+                labels = [None] * len(texts)
+
+        missing = [idx for idx, label in enumerate(labels) if label is None]
+        if not missing:
+            return labels
+
+        self.stats['batch_resplits'] += 1
+        if len(missing) < len(texts):
+            retried = await self.predict_batch(task, [texts[idx] for idx in missing])
+        else:
+            half = len(texts) // 2
+            left, right = await asyncio.gather(
+                self.predict_batch(task, texts[:half]),
+                self.predict_batch(task, texts[half:])
+            )
+            retried = left + right
+
+        for idx, label in zip(missing, retried):
+            labels[idx] = label
+        return labels
+
+    async def predict_many(self, task: PredictionTask, texts: List[str], batch_size: int = 1,
+                           on_result: Optional[Callable[[int, Optional[str]], None]] = None) -> List[Optional[str]]:
+        """
+        Predict labels for many texts, keeping at most max_concurrency requests in flight.
+
+        `on_result(position, label)` is called as soon as each label is known
+        (cached labels first, then batch by batch).
+        """
+        batch_size = max(1, batch_size)
+        results: List[Optional[str]] = [None] * len(texts)
+        todo = list(range(len(texts)))
+
+        keys = []
+        if self.cache is not None:
+            keys = [make_key(task, self.prompt_versions[task], text) for text in texts]
+            cached = self.cache.get_many(keys)
+            todo = [idx for idx in todo if keys[idx] not in cached]
+            for idx, key in enumerate(keys):
+                results[idx] = cached.get(key)
+                if on_result is not None and key in cached:
+                    on_result(idx, results[idx])
+            self.stats['cache_hits'] += len(texts) - len(todo)
+            self.stats['cache_misses'] += len(todo)
+
+        batches = [todo[start:start + batch_size] for start in range(0, len(todo), batch_size)]
+        pending = iter(batches)
+
+        # A fixed set of workers pulling batches keeps the number of live
+        # coroutines bounded even for files with hundreds of thousands of rows
+        async def worker():
+            for batch in pending:
+                labels = await self.predict_batch(task, [texts[idx] for idx in batch])
+                for idx, label in zip(batch, labels):
+                    results[idx] = label
+                    if on_result is not None:
+                        on_result(idx, label)
+
+        await asyncio.gather(*(worker() for _ in range(min(self.concurrency_cap, len(batches)))))
+
+        if self.cache is not None:
+            # Failed predictions are not cached so they are retried next run
+            self.cache.put_many({keys[idx]: results[idx] for idx in todo if results[idx] is not None})
+        return results
+
+    async def predict_pipeline(self, texts: List[str], known_labels: Optional[List[Optional[str]]] = None,
+                               batch_size: int = 1) -> Tuple[List[Optional[str]], List[Optional[str]]]:
+        """
+        SR opening predictions, then quickfill predictions for the texts labelled SR.
+
+        Each text labelled SR is queued for its quickfill as soon as its SR
+        label is known, and both stages draw on the same in-flight slots, so
+        the quickfill stage never waits for the whole SR stage to finish. A
+        single dispatcher sends whatever quickfills are queued (up to
+        batch_size) whenever fewer than concurrency_cap of its batches are in
+        flight, so batches fill up under load but never wait to be full.
+
+        Args:
+            texts: Email texts
+            known_labels: Optional SR labels known in advance (e.g. from the
+                local cascade model); entries that are not a label (None / NaN)
+                are predicted
+            batch_size: Emails per request for both stages
+
+        Returns:
+            (sr_labels, qf_labels); qf_labels is None for texts not labelled SR
+        """
+        batch_size = max(1, batch_size)
+        sr_label = self.sr_labels["creation"]
+        sr_labels = list(known_labels) if known_labels is not None else [None] * len(texts)
+        qf_labels: List[Optional[str]] = [None] * len(texts)
+        # Missing labels may come from pandas as NaN rather than None
+        todo = [idx for idx, label in enumerate(sr_labels) if not isinstance(label, str)]
+
+        # Text positions awaiting a quickfill; None marks the end of the SR stage
+        qf_queue: asyncio.Queue = asyncio.Queue()
+        for idx, label in enumerate(sr_labels):
+            if label == sr_label:
+                qf_queue.put_nowait(idx)
+
+        def on_sr_label(position: int, label: Optional[str]):
+            idx = todo[position]
+            sr_labels[idx] = label
+            if label == sr_label:
+                qf_queue.put_nowait(idx)
+
+        async def sr_stage():
+            try:
+                await self.predict_many('sr', [texts[idx] for idx in todo], batch_size, on_result=on_sr_label)
+            finally:
+                qf_queue.put_nowait(None)
+
+        async def predict_quickfills(batch: List[int]):
+            try:
+                labels = await self.predict_many('qf', [texts[idx] for idx in batch], batch_size)
+                for idx, label in zip(batch, labels):
+                    qf_labels[idx] = label
+            finally:
+                in_flight.release()
+
+        async def qf_dispatcher():
+            tasks = []
+            finished = False
+            while not finished:
+                # Collect while all batches are in flight, so batches fill up under load
+                await in_flight.acquire()
+                idx = await qf_queue.get()
+                if idx is None:
+                    in_flight.release()
+                    break
+                # Send what is queued now rather than wait for a full batch
+                batch = [idx]
+                while len(batch) < batch_size and not qf_queue.empty():
+                    idx = qf_queue.get_nowait()
+                    if idx is None:
+                        finished = True
+                        break
+                    batch.append(idx)
+                tasks.append(asyncio.create_task(predict_quickfills(batch)))
+            await asyncio.gather(*tasks)
+
+        in_flight = asyncio.Semaphore(self.concurrency_cap)
+        await asyncio.gather(sr_stage(), qf_dispatcher())
+        return sr_labels, qf_labels
+
+
+def _run_engine(predict: Callable, async_mode: bool, max_concurrency: int, stats: Optional[Dict[str, int]],
+                shared_slots, rate_share: float, concurrency: Optional[AdaptiveConcurrency], hedging: bool):
+    """Run `predict(engine)` on a fresh event loop and add the engine counters to `stats`"""
+    async def _run():
+        cache = PredictionCache() if config.prediction_cache["enabled"] else None
+        try:
+            async with PredictionEngine(
+                max_concurrency=max_concurrency if async_mode else 1,
+                cache=cache,
+                shared_slots=shared_slots,
+                rate_share=rate_share,
+                concurrency=concurrency if async_mode else None,
+                hedging=hedging
+            ) as engine:
+                result = await predict(engine)
+        finally:
+            if cache is not None:
+                cache.close()
+
+        if stats is not None:
+            for name, value in engine.stats.items():
+                stats[name] = stats.get(name, 0) + value
+        return result
+
+    return asyncio.run(_run())
+
+
+def run_predictions(task: PredictionTask, texts: List[str], async_mode: bool = True,
+                    max_concurrency: int = config.DEFAULT_MAX_CONCURRENCY,
+                    batch_size: int = 1, stats: Optional[Dict[str, int]] = None,
+                    shared_slots=None, rate_share: float = 1.0,
+                    concurrency: Optional[AdaptiveConcurrency] = None,
+                    hedging: bool = False) -> List[Optional[str]]:
+    """
+    Synchronous entry point: predict labels for `texts` on a fresh event loop.
+
+    Engine counters (requests, cache hits/misses, tokens...) are added to
+    `stats` when a dict is given, so callers can total them over a run.
+    `shared_slots` is an optional cross-process semaphore capping in-flight
+    requests across all processes of a run, and `rate_share` the fraction
+    of the configured rate limits this process may use. `concurrency` is an
+    optional AdaptiveConcurrency controller that replaces max_concurrency
+    and keeps its state (and history) across calls. With `hedging`, slow
+    requests are duplicated once they pass the observed p95 latency.
+    """
+    if not texts:
+        return []
+
+    return _run_engine(
+        lambda engine: engine.predict_many(task, texts, batch_size=batch_size),
+        async_mode, max_concurrency, stats, shared_slots, rate_share, concurrency, hedging
+    )
+
+
+def run_pipeline(texts: List[str], known_labels: Optional[List[Optional[str]]] = None, async_mode: bool = True,
+                 max_concurrency: int = config.DEFAULT_MAX_CONCURRENCY,
+                 batch_size: int = 1, stats: Optional[Dict[str, int]] = None,
+                 shared_slots=None, rate_share: float = 1.0,
+                 concurrency: Optional[AdaptiveConcurrency] = None,
+                 hedging: bool = False) -> Tuple[List[Optional[str]], List[Optional[str]]]:
+    """
+    Synchronous entry point for 'both' mode: pipelined SR and quickfill
+    predictions (see PredictionEngine.predict_pipeline). Other arguments as
+    for run_predictions.
+
+    Returns:
+        (sr_labels, qf_labels)
+    """
+    if not texts:
+        return [], []
+
+    return _run_engine(
+        lambda engine: engine.predict_pipeline(texts, known_labels, batch_size=batch_size),
+        async_mode, max_concurrency, stats, shared_slots, rate_share, concurrency, hedging
+    )
@@ -0,0 +1,216 @@
+"""
+Estimator module - pre-flight projection of LLM calls, tokens, cost and duration
+
+A dry run over the source path: every file is streamed chunk by chunk,
+the configured filters are applied and the tokens of each remaining email
+are counted as it would be sent, i.e. normalized and fitted to the prompt
+budget (files are scanned in parallel processes). The counts are
+turned into LLM calls and tokens for the chosen mode and batch size, priced
+with the "estimator" section of config.json, and converted to wall-clock
+time with the call latency observed by past tests in TestStorage.
+
+No prediction cache hits, cascade or near-duplicate savings are assumed,
+so the projection is an upper bound.
+
+    python -m utils.estimator /data/desks --mode both --max-concurrency 20
+"""
+import argparse
+import json
+import os
+import statistics
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Dict, List, Literal, Optional
+from .classifier import build_email_text, ground_truth_sr_mask, list_source_files
+from .config import config
+from .engine import estimate_tokens
+from .fileio import iter_frame_chunks
+from .filters import FilterPipeline
+from .normalize import normalize_texts
+from .prompts import fit_emails, system_prompt
+from .storage import storage
+
+
+def scan_file(file: Path, use_filter: bool) -> Dict:
+    """Row, ground truth SR and token counts of one file, before and after filtering"""
+    counts = {'source_file': file.name, 'original_total': 0, 'filtered_total': 0, 'filtered_sr': 0,
+              'email_tokens': 0, 'sr_email_tokens': 0}
+    filters = FilterPipeline.from_config() if use_filter else None
+    for df in iter_frame_chunks(file, config.CHUNK_SIZE):
+        counts['original_total'] += len(df)
+        if filters is not None:
+            df, _ = filters.apply(df)
+        # Tokens of the emails as sent: normalized and fitted to the per-email budget
+        texts, _ = normalize_texts(build_email_text(df))
+        _, tokens, _ = fit_emails(texts)
+        is_sr = ground_truth_sr_mask(df)
+        counts['filtered_total'] += len(df)
+        counts['filtered_sr'] += int(is_sr.sum())
+        counts['email_tokens'] += int(tokens.sum())
+        counts['sr_email_tokens'] += int(tokens[is_sr].sum())
+    return counts
+
+
+def _scan_files(files: List[Path], use_filter: bool, workers: int) -> List[Dict]:
+    if workers <= 1:
+        return [scan_file(file, use_filter) for file in files]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(partial(scan_file, use_filter=use_filter), files))
+
+
+def historical_latency(max_tests: Optional[int] = None) -> Optional[Dict]:
+    """Median p50 / p95 call latency (ms) over the most recent completed tests"""
+    max_tests = max_tests or config.estimator["history_tests"]
+    tests = [
+        test for test in storage.get_all_tests()
+        if test.status == 'completed' and test.latency_percentiles
+    ]
+    tests.sort(key=lambda test: test.completed_at or '', reverse=True)
+    tests = tests[:max_tests]
+    if not tests:
+        return None
+    return {
+        'p50': statistics.median(test.latency_percentiles['p50'] for test in tests),
+        'p95': statistics.median(test.latency_percentiles['p95'] for test in tests),
+        'tests': len(tests),
+    }
+
+
+def _stage_calls(emails: float, email_tokens: float, task: str, batch_size: int) -> Dict:
+    """LLM calls and tokens to predict one task for `emails` emails"""
+    calls = -(-int(round(emails)) // batch_size)
+    # System prompt once per call, "### Email <n>" header once per email in batches
+    header_tokens = estimate_tokens("### Email 10\n") if batch_size > 1 else 0
+    prompt_tokens = estimate_tokens(system_prompt(task, batched=batch_size > 1))
+    return {
+        'calls': calls,
+        'prompt_tokens': int(calls * prompt_tokens + email_tokens + emails * header_tokens),
+        # Upper bound: the engine reserves this much per email for the answer
+        'completion_tokens': int(emails * (config.llm["max_output_tokens"] + (4 if batch_size > 1 else 0))),
+    }
+
+
+def estimate_run(
+    source_path: str,
+    mode: Literal['sr', 'qf', 'both'] = 'both',
+    use_filter: bool = True,
+    max_concurrency: int = config.DEFAULT_MAX_CONCURRENCY,
+    batch_size: Optional[int] = None,
+    sample_fraction: Optional[float] = None,
+    sample_rows: Optional[int] = None,
+    workers: Optional[int] = None
+) -> Dict:
+    """
+    Project the LLM usage of a test without running it.
+
+    Args:
+        source_path: Path to source file/folder containing emails
+        mode, use_filter, max_concurrency, batch_size, sample_fraction, sample_rows: As for
+            run_classifier
+        workers: Files scanned in parallel processes (None = "file_workers" in config.json,
+            0 = CPU count)
+
+    Returns:
+        dict with keys:
+            - files: list[dict] (per-file rows and tokens before / after filtering)
+            - original_total / filtered_total / classified_total: int (emails)
+            - llm_calls: dict (calls per task: 'sr', 'qf')
+            - prompt_tokens / completion_tokens: int
+            - cost: float (in config "estimator" currency)
+            - latency_ms: float (typical call latency used for the projection)
+            - latency_source: str ('history' or 'default')
+            - duration_seconds: float
+            - bottleneck: str ('concurrency', 'requests_per_second' or 'tokens_per_minute')
+    """
+    files = list_source_files(source_path)
+    if not files:
+        raise ValueError(f"No source files found in {source_path}")
+
+    if workers is None:
+        workers = config.FILE_WORKERS
+    workers = min(workers or os.cpu_count() or 1, len(files))
+    scans = _scan_files(files, use_filter, workers)
+
+    batch_size = max(1, batch_size or config.llm["batch_size"][mode])
+    llm_calls, prompt_tokens, completion_tokens, classified_total = {}, 0, 0, 0
+    for scan in scans:
+        filtered = scan['filtered_total']
+        # Stratified sampling keeps the class mix, so every count scales alike
+        share = 1.0
+        if sample_fraction is not None:
+            share = sample_fraction
+        elif sample_rows is not None and filtered:
+            share = min(1.0, sample_rows / filtered)
+        classified_total += round(filtered * share)
+
+        stages = []
+        if mode in ['sr', 'both']:
+            stages.append(('sr', filtered * share, scan['email_tokens'] * share))
+        if mode in ['qf', 'both']:
+            # Quickfills are predicted for SR emails: ground truth SR as a proxy in both mode
+            stages.append(('qf', scan['filtered_sr'] * share, scan['sr_email_tokens'] * share))
+
+        for task, emails, email_tokens in stages:
+            usage = _stage_calls(emails, email_tokens, task, batch_size)
+            llm_calls[task] = llm_calls.get(task, 0) + usage['calls']
+            prompt_tokens += usage['prompt_tokens']
+            completion_tokens += usage['completion_tokens']
+
+    settings = config.estimator
+    cost = (prompt_tokens * settings["prompt_cost_per_million"]
+            + completion_tokens * settings["completion_cost_per_million"]) / 1_000_000
+
+    history = historical_latency()
+    latency_ms = history['p50'] if history else settings["default_latency_ms"]
+    total_calls = sum(llm_calls.values())
+
+    # Calls per second allowed by each limit; the smallest one sets the pace
+    throughput = {'concurrency': max(1, min(max_concurrency, config.MAX_CONCURRENCY_LIMIT)) / (latency_ms / 1000)}
+    if config.llm["requests_per_second"]:
+        throughput['requests_per_second'] = config.llm["requests_per_second"]
+    if config.llm["tokens_per_minute"] and total_calls:
+        tokens_per_call = (prompt_tokens + completion_tokens) / total_calls
+        throughput['tokens_per_minute'] = config.llm["tokens_per_minute"] / 60 / tokens_per_call
+    bottleneck = min(throughput, key=throughput.get)
+
+    return {
+        'files': scans,
+        'original_total': sum(scan['original_total'] for scan in scans),
+        'filtered_total': sum(scan['filtered_total'] for scan in scans),
+        'classified_total': int(classified_total),
+        'batch_size': batch_size,
+        'llm_calls': llm_calls,
+        'prompt_tokens': int(prompt_tokens),
+        'completion_tokens': int(completion_tokens),
+        'cost': round(cost, 2),
+        'currency': settings["currency"],
+        'latency_ms': latency_ms,
+        'latency_source': f"history ({history['tests']} tests)" if history else 'default',
+        'duration_seconds': round(total_calls / throughput[bottleneck], 1),
+        'bottleneck': bottleneck,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Project the LLM calls, tokens, cost and duration of a test")
+    parser.add_argument("source_path", help="Source file or folder")
+    parser.add_argument("--mode", choices=['sr', 'qf', 'both'], default=config.DEFAULT_MODE)
+    parser.add_argument("--no-filter", action="store_true", help="Do not apply the configured filters")
+    parser.add_argument("--max-concurrency", type=int, default=config.DEFAULT_MAX_CONCURRENCY)
+    parser.add_argument("--batch-size", type=int, default=None)
+    sample = parser.add_mutually_exclusive_group()
+    sample.add_argument("--sample-fraction", type=float, default=None, help="Fraction of each file to classify")
+    sample.add_argument("--sample-rows", type=int, default=None, help="Emails of each file to classify")
+    args = parser.parse_args()
+
+    estimate = estimate_run(
+        args.source_path, mode=args.mode, use_filter=not args.no_filter,
+        max_concurrency=args.max_concurrency, batch_size=args.batch_size,
+        sample_fraction=args.sample_fraction, sample_rows=args.sample_rows
+    )
+    print(json.dumps(estimate, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""
+File I/O helpers - loading, chunked streaming and writing of desk files
+
+CSV, XLSX and Parquet are supported. Parquet is columnar, so loading a
+subset of columns only reads those columns from disk.
+
+Parsing XLSX is slow, so each workbook is converted to Parquet once and the
+copy is reused while the workbook's path, size and mtime are unchanged
+(see the "conversion_cache" section of config.json).
+"""
+import hashlib
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import Workbook, load_workbook
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+RESULT_SUFFIXES = ['.csv', '.xlsx', '.parquet']
+
+
+def find_result_files(folder: Path) -> List[Path]:
+    """All *_result files of an output folder"""
+    return sorted(
+        file for suffix in RESULT_SUFFIXES for file in folder.glob(f"*_result{suffix}")
+    )
+
+
+def load_frame(file: Path, columns: Optional[List[str]] = None, dtype: Optional[Dict] = None) -> pd.DataFrame:
+    """
+    Load a whole CSV/XLSX/Parquet file.
+
+    Args:
+        file: File to load
+        columns: Optional subset of columns to read (missing ones are skipped)
+        dtype: Optional {column: dtype} applied while reading (missing ones are skipped)
+    """
+    file = columnar_copy(file)
+    if file.suffix == '.parquet':
+        if columns is not None:
+            available = set(pq.read_schema(file).names)
+            columns = [column for column in columns if column in available]
+        df = pd.read_parquet(file, columns=columns)
+        if dtype:
+            df = df.astype({column: kind for column, kind in dtype.items() if column in df.columns})
+        return df
+
+    usecols = (lambda column: column in columns) if columns is not None else None
+    if file.suffix == '.csv':
+        return pd.read_csv(file, usecols=usecols, dtype=dtype)
+    if file.suffix == '.xlsx':
+        return pd.read_excel(file, usecols=usecols, dtype=dtype)
+    raise ValueError(f"Unsupported file type: {file.suffix}")
+
+
+def count_rows(file: Path) -> int:
+    """Number of data rows of a CSV/XLSX/Parquet file"""
+    file = columnar_copy(file)
+    if file.suffix == '.parquet':
+        return pq.ParquetFile(file).metadata.num_rows
+    if file.suffix == '.csv':
+        # Parse one column rather than counting lines: quoted bodies may span several lines
+        with pd.read_csv(file, usecols=[0], chunksize=100_000) as reader:
+            return sum(len(chunk) for chunk in reader)
+    if file.suffix == '.xlsx':
+        return len(pd.read_excel(file, usecols=[0]))
+    raise ValueError(f"Unsupported file type: {file.suffix}")
+
+
+def save_frame(df: pd.DataFrame, output_file: Path):
+    if output_file.suffix == '.csv':
+        df.to_csv(output_file, index=False)
+    elif output_file.suffix == '.parquet':
+        df.to_parquet(output_file, index=False)
+    else:
+        df.to_excel(output_file, index=False)
+
+
+def iter_frame_chunks(file: Path, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """Yield the rows of a CSV/XLSX/Parquet file as DataFrames of at most chunk_size rows"""
+    file = columnar_copy(file)
+    if file.suffix == '.csv':
+        with pd.read_csv(file, chunksize=chunk_size) as reader:
+            yield from reader
+        return
+
+    if file.suffix == '.parquet':
+        for batch in pq.ParquetFile(file).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+        return
+
+    yield from _iter_xlsx_chunks(file, chunk_size)
+
+
+def _iter_xlsx_chunks(file: Path, chunk_size: int) -> Iterator[pd.DataFrame]:
+    if file.suffix != '.xlsx':
+        raise ValueError(f"Unsupported file type: {file.suffix}")
+
+    # read_only mode streams rows from the sheet XML instead of building the workbook
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        sheet = workbook.active
+        header = next(sheet.iter_rows(max_row=1, values_only=True), None)
+        if header is None:
+            return
+
+        # read_only rows stop at their last non-empty cell: max_col pads them to the header width
+        rows = sheet.iter_rows(min_row=2, max_col=len(header), values_only=True)
+        buffer = []
+        for row in rows:
+            buffer.append(row)
+            if len(buffer) == chunk_size:
+                yield pd.DataFrame(buffer, columns=header)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=header)
+    finally:
+        workbook.close()
+
+
+class ChunkedResultWriter:
+    """Append result chunks to a CSV/XLSX/Parquet file without holding the whole file in memory"""
+
+    def __init__(self, output_file: Path):
+        self.output_file = output_file
+        self.rows_written = 0
+        self._header_written = False
+        self._workbook = None
+        self._sheet = None
+        self._parquet_writer = None
+        # Empty chunk seen before any row: its columns make the schema of an empty file
+        self._empty_parquet_chunk = None
+
+        if output_file.suffix == '.parquet':
+            output_file.unlink(missing_ok=True)
+        elif output_file.suffix == '.xlsx':
+            # write_only workbooks stream rows to a temporary file
+            self._workbook = Workbook(write_only=True)
+            self._sheet = self._workbook.create_sheet()
+        elif output_file.suffix == '.csv':
+            output_file.unlink(missing_ok=True)
+        else:
+            raise ValueError(f"Unsupported file type: {output_file.suffix}")
+
+    @staticmethod
+    def _parquet_schema(table: pa.Table) -> pa.Schema:
+        # A column without values (e.g. no quickfill yet) is typed as string
+        return pa.schema([
+            field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+            for field in table.schema
+        ]).remove_metadata()
+
+    def _write_parquet(self, df: pd.DataFrame):
+        if df.empty:
+            # An empty (e.g. fully filtered) chunk says nothing about the column types:
+            # the schema comes from the first chunk with rows
+            if self._parquet_writer is None:
+                self._empty_parquet_chunk = df
+            return
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        # Columns empty in this chunk carry no type (pandas makes them float64 or object)
+        for idx, column in enumerate(df.columns):
+            if df[column].isna().all():
+                table = table.set_column(idx, table.field(idx).name, pa.nulls(len(df)))
+
+        if self._parquet_writer is None:
+            self._parquet_writer = pq.ParquetWriter(self.output_file, self._parquet_schema(table))
+        # Each chunk becomes a row group; later chunks must match the first one's schema
+        self._parquet_writer.write_table(table.cast(self._parquet_writer.schema))
+
+    def write(self, df: pd.DataFrame):
+        if self.output_file.suffix == '.parquet':
+            self._write_parquet(df)
+        elif self._workbook is not None:
+            if not self._header_written:
+                self._sheet.append([str(column) for column in df.columns])
+            values = df.astype(object).where(df.notna(), None)
+            for row in values.itertuples(index=False, name=None):
+                self._sheet.append(list(row))
+        else:
+            df.to_csv(self.output_file, mode='a', header=not self._header_written, index=False)
+
+        self._header_written = True
+        self.rows_written += len(df)
+
+    def close(self):
+        if self._parquet_writer is None and self._empty_parquet_chunk is not None:
+            # Only empty chunks: an empty file typed from their dtypes
+            table = pa.Table.from_pandas(self._empty_parquet_chunk, preserve_index=False)
+            pq.write_table(table.cast(self._parquet_schema(table)), self.output_file)
+            self._empty_parquet_chunk = None
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+        if self._workbook is not None:
+            self._workbook.save(self.output_file)
+            self._workbook = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def file_fingerprint(file: Path) -> str:
+    """Identity of the current content of a file: path, size and modification time"""
+    stat = file.stat()
+    identity = f"{file.resolve()}\x1f{stat.st_size}\x1f{stat.st_mtime_ns}"
+    return hashlib.sha256(identity.encode("utf-8")).hexdigest()[:32]
+
+
+def _evict_conversions(cache_dir: Path, max_bytes: int, keep: Path):
+    """Delete least recently used conversions (except `keep`) until the cache fits in max_bytes"""
+    entries = []
+    for path in cache_dir.glob("*.parquet"):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            # Evicted or renamed by another worker meanwhile
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        # In-progress conversions of other workers are left alone
+        if path == keep or ".tmp." in path.name:
+            continue
+        path.unlink(missing_ok=True)
+        total -= size
+
+
+def columnar_copy(file: Path) -> Path:
+    """
+    Return a cached Parquet copy of an XLSX file, converting it on first use.
+
+    Other files are returned unchanged, as is the workbook itself if the cache
+    is disabled or the conversion fails (e.g. mixed-type columns).
+    """
+    settings = config.conversion_cache
+    if file.suffix != '.xlsx' or not settings["enabled"]:
+        return file
+
+    cache_dir = Path(settings["directory"])
+    cached = cache_dir / f"{file_fingerprint(file)}.parquet"
+    if cached.exists():
+        # Refresh recency for LRU eviction
+        os.utime(cached)
+        return cached
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    # Unique temporary name: several workers may convert the same workbook at once
+    tmp_path = cache_dir / f"{cached.stem}.{os.getpid()}.tmp.parquet"
+    try:
+        with ChunkedResultWriter(tmp_path) as writer:
+            for chunk in _iter_xlsx_chunks(file, config.CHUNK_SIZE):
+                writer.write(chunk)
+        if writer.rows_written == 0:
+            # Nothing to gain for an empty sheet (and no Parquet file was created)
+            tmp_path.unlink(missing_ok=True)
+            return file
+        os.replace(tmp_path, cached)
+    except (pa.ArrowException, TypeError, ValueError) as e:
+        logger.warning("Could not convert %s to Parquet, reading the workbook: %s", file, e)
+        tmp_path.unlink(missing_ok=True)
+        return file
+
+    _evict_conversions(cache_dir, settings["max_size_mb"] * 1024 * 1024, keep=cached)
+    return cached
@@ -0,0 +1,167 @@
+"""
+Filter module - declarative pre-classification filter pipeline
+
+Rules are configured in the "filters" section of config.json and applied
+in order as vectorized boolean masks over a whole frame (or streaming
+chunk). Each rule counts the rows it removed that no earlier rule removed.
+
+Rule types:
+    - sender_blocklist: drop senders (or "@domain" entries) listed in
+      "values" and/or a text file with one entry per line ("file")
+    - regex: drop rows where any of "columns" matches any of "patterns"
+    - dedup: keep only the first row of each value of "column"
+      (empty / 0 values are never treated as duplicates)
+"""
+import re
+import warnings
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import pandas as pd
+from .config import config
+
+
+class FilterRule(ABC):
+    """Base class: mask() returns True for the rows the rule removes"""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    @abstractmethod
+    def mask(self, df: pd.DataFrame, alive: pd.Series) -> pd.Series:
+        """Rows to remove among `alive` (the rows no earlier rule removed)"""
+
+    def kept_state(self, df: pd.DataFrame) -> Optional[list]:
+        """State a resumed run needs from the rows the pipeline kept in a chunk (None = stateless)"""
+        return None
+
+    def restore_state(self, state: list):
+        """Replay the kept_state() of a chunk processed before an interruption"""
+
+
+class SenderBlocklistRule(FilterRule):
+    def __init__(self, name: str, column: str, values: List[str], file: Optional[str] = None):
+        super().__init__(name)
+        self.column = column
+
+        entries = [value.strip().lower() for value in values]
+        if file:
+            entries += [line.strip().lower() for line in Path(file).read_text().splitlines()]
+        entries = [entry for entry in entries if entry]
+
+        # Hash sets make each lookup O(1) whatever the blocklist size
+        self.addresses = {entry for entry in entries if not entry.startswith('@')}
+        self.domains = {entry[1:] for entry in entries if entry.startswith('@')}
+
+    def mask(self, df: pd.DataFrame, alive: pd.Series) -> pd.Series:
+        if self.column not in df.columns or not (self.addresses or self.domains):
+            return pd.Series(False, index=df.index)
+
+        senders = df[self.column].astype('string').str.strip().str.lower()
+        blocked = senders.isin(self.addresses)
+        if self.domains:
+            blocked |= senders.str.rsplit('@', n=1).str[-1].isin(self.domains)
+        return blocked.fillna(False).astype(bool)
+
+
+class PatternRule(FilterRule):
+    def __init__(self, name: str, columns: List[str], patterns: List[str], ignore_case: bool = True):
+        super().__init__(name)
+        self.columns = columns
+        # One compiled alternation scans each cell once for all patterns
+        self.regex = None
+        if patterns:
+            flags = re.IGNORECASE if ignore_case else 0
+            self.regex = re.compile("|".join(f"(?:{pattern})" for pattern in patterns), flags)
+
+    def mask(self, df: pd.DataFrame, alive: pd.Series) -> pd.Series:
+        matched = pd.Series(False, index=df.index)
+        if self.regex is None:
+            return matched
+        for column in self.columns:
+            if column in df.columns:
+                with warnings.catch_warnings():
+                    # Only a match is needed; pandas warns when patterns contain groups
+                    warnings.simplefilter("ignore", UserWarning)
+                    found = df[column].astype('string').str.contains(self.regex)
+                matched |= found.fillna(False).astype(bool)
+        return matched
+
+
+class DedupRule(FilterRule):
+    def __init__(self, name: str, column: str):
+        super().__init__(name)
+        self.column = column
+        # Values kept so far, so duplicates are also caught across chunks
+        self.seen = set()
+
+    def _has_value(self, values: pd.Series) -> pd.Series:
+        return values.notna() & (values != 0) & (values != '')
+
+    def mask(self, df: pd.DataFrame, alive: pd.Series) -> pd.Series:
+        if self.column not in df.columns:
+            return pd.Series(False, index=df.index)
+
+        values = df[self.column]
+        candidates = alive & self._has_value(values)
+        # Duplicates are judged among the rows earlier rules kept
+        kept_values = values[candidates]
+        duplicated = kept_values.duplicated(keep='first') | kept_values.isin(self.seen)
+        self.seen.update(kept_values[~duplicated])
+        return duplicated.reindex(df.index, fill_value=False).astype(bool)
+
+    def kept_state(self, df: pd.DataFrame) -> Optional[list]:
+        # The values this chunk added to `seen`
+        if self.column not in df.columns:
+            return []
+        values = df[self.column]
+        return values[self._has_value(values)].tolist()
+
+    def restore_state(self, state: list):
+        self.seen.update(state)
+
+
+RULE_TYPES = {
+    'sender_blocklist': SenderBlocklistRule,
+    'regex': PatternRule,
+    'dedup': DedupRule,
+}
+
+
+class FilterPipeline:
+    """Ordered filter rules with per-rule removal counts"""
+
+    def __init__(self, rules: List[FilterRule]):
+        self.rules = rules
+
+    @classmethod
+    def from_config(cls, rule_configs: Optional[List[Dict]] = None) -> 'FilterPipeline':
+        rules = []
+        for rule_config in (config.FILTER_RULES if rule_configs is None else rule_configs):
+            params = dict(rule_config)
+            rule_type = params.pop('type')
+            if rule_type not in RULE_TYPES:
+                raise ValueError(f"Unknown filter rule type: {rule_type}")
+            rules.append(RULE_TYPES[rule_type](**params))
+        return cls(rules)
+
+    def apply(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, int]]:
+        """Return the rows that pass every rule and the number of rows each rule removed"""
+        alive = pd.Series(True, index=df.index)
+        removed_counts = {}
+        for rule in self.rules:
+            removed = rule.mask(df, alive) & alive
+            removed_counts[rule.name] = int(removed.sum())
+            alive &= ~removed
+        return df[alive], removed_counts
+
+    def kept_state(self, df: pd.DataFrame) -> Dict[str, list]:
+        """State of the stateful rules (dedup) added by a chunk, given the rows apply() kept"""
+        states = {rule.name: rule.kept_state(df) for rule in self.rules}
+        return {name: state for name, state in states.items() if state is not None}
+
+    def restore_state(self, states: Dict[str, list]):
+        """Replay the kept_state() of a chunk checkpointed by an interrupted run"""
+        for rule in self.rules:
+            if rule.name in states:
+                rule.restore_state(states[rule.name])
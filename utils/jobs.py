@@ -0,0 +1,295 @@
+"""
+Job runner module - executes tests in background worker processes
+
+Tests are submitted by saving a 'pending' TestResult. A pool of worker
+processes claims pending tests from TestStorage (the persistent queue), runs
+classification and analysis, and writes status and progress back to storage
+so the Streamlit pages only have to poll.
+
+Start the pool with:
+    python -m utils.jobs --workers 4
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Optional
+from .config import PROJECT_ROOT, config
+from .models import TestResult
+from .storage import storage
+
+logger = logging.getLogger(__name__)
+
+
+def execute_test(test: TestResult, worker_id: str):
+    """Run classification + analysis for a claimed test and persist the outcome"""
+    # Imported lazily so the supervisor process stays light
+    from .analysis import analyzer
+    from .classifier import run_classifier
+
+    stop_heartbeat = threading.Event()
+
+    def heartbeat():
+        while not stop_heartbeat.wait(config.JOB_HEARTBEAT_INTERVAL):
+            storage.update_test(test.test_id, heartbeat_at=datetime.now().isoformat())
+
+    last_metrics_update = 0.0
+
+    def update_metrics(file_metrics: dict):
+        # Every chunk reports; persist at most once per interval
+        nonlocal last_metrics_update
+        if time.monotonic() - last_metrics_update >= config.JOB_METRICS_INTERVAL:
+            last_metrics_update = time.monotonic()
+            storage.update_test(test.test_id, live_metrics=file_metrics)
+
+    def update_progress(current: int, total: int, message: str):
+        storage.update_test(
+            test.test_id,
+            progress_current=current,
+            progress_total=total,
+            progress_message=message,
+            heartbeat_at=datetime.now().isoformat(),
+        )
+
+    heartbeat_thread = threading.Thread(target=heartbeat, daemon=True)
+    heartbeat_thread.start()
+
+    try:
+        results = run_classifier(
+            source_path=test.source_path,
+            out_path=test.out_path,
+            mode=test.mode,
+            use_filter=test.use_filter,
+            collapse_near_duplicates=test.collapse_near_duplicates,
+            cascade=test.cascade,
+            async_mode=test.async_mode,
+            max_concurrency=test.max_concurrency,
+            adaptive_concurrency=test.adaptive_concurrency,
+            hedging=test.hedging,
+            output_format=test.output_format,
+            sample_fraction=test.sample_fraction,
+            sample_rows=test.sample_rows,
+            progress_callback=update_progress,
+            metrics_callback=update_metrics,
+            batch_size=test.batch_size,
+            streaming=test.streaming,
+            resume=test.resume
+        )
+
+        updates = {
+            'total_emails': results.get('total_emails', 0),
+            'processed_emails': results.get('processed_emails', 0),
+            'sr_positive': results.get('sr_positive'),
+            'sr_negative': results.get('sr_negative'),
+            'category_breakdown': results.get('category_breakdown'),
+            'cache_hits': results.get('cache_hits'),
+            'cache_misses': results.get('cache_misses'),
+            'prediction_stats': results.get('prediction_stats'),
+            'concurrency_history': results.get('concurrency_history'),
+            'latency_percentiles': results.get('latency_percentiles'),
+            'normalization_stats': results.get('normalization_stats'),
+            'file_stats': results.get('file_stats'),
+            'live_metrics': None,
+            'progress_message': "Running detailed analysis...",
+        }
+        storage.update_test(test.test_id, **updates)
+
+        # Run detailed analysis on output files; the classification stands if it fails
+        analysis_error = None
+        try:
+            file_analyses = analyzer.analyze_test_results(
+                test.out_path, file_stats=results.get('file_stats'), file_metrics=results.get('file_metrics')
+            )
+        except Exception as error:
+            logger.warning("Analysis of test %s failed: %s", test.test_id, error)
+            file_analyses = None
+            analysis_error = str(error)
+
+        storage.update_test(
+            test.test_id,
+            status='completed',
+            completed_at=datetime.now().isoformat(),
+            file_analyses=file_analyses,
+            analysis_error=analysis_error,
+            progress_message=None,
+        )
+        logger.info("[%s] Test %s completed", worker_id, test.test_id)
+
+    except Exception as e:
+        logger.exception("[%s] Test %s failed", worker_id, test.test_id)
+        storage.update_test(
+            test.test_id,
+            status='failed',
+            completed_at=datetime.now().isoformat(),
+            error_message=str(e),
+        )
+    finally:
+        stop_heartbeat.set()
+        heartbeat_thread.join()
+
+
+def _worker_loop(worker_id: str, poll_interval: float):
+    """Claim and execute pending tests until the process is terminated"""
+    # Forked workers inherit the supervisor's handlers; restore the default
+    # so terminate() actually stops them
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _setup_logging()
+    logger.info("[%s] Worker started (pid %d)", worker_id, os.getpid())
+
+    while True:
+        test = storage.claim_next_pending(worker_id, datetime.now().isoformat())
+        if test is None:
+            time.sleep(poll_interval)
+            continue
+
+        logger.info("[%s] Claimed test %s (%s)", worker_id, test.test_id, test.source_path)
+        execute_test(test, worker_id)
+
+
+class JobRunner:
+    """Supervises a pool of worker processes draining the pending queue"""
+
+    def __init__(self, num_workers: int = config.JOB_WORKERS, poll_interval: float = config.JOB_POLL_INTERVAL):
+        self.num_workers = num_workers
+        self.poll_interval = poll_interval
+        self.workers: Dict[str, multiprocessing.Process] = {}
+        self._stopping = False
+
+    def _start_worker(self, worker_id: str):
+        process = multiprocessing.Process(
+            target=_worker_loop,
+            args=(worker_id, self.poll_interval),
+            name=worker_id,
+            # Not daemonic: workers start their own process pools for
+            # parallel file processing; run_forever() terminates them on exit
+            daemon=False
+        )
+        process.start()
+        self.workers[worker_id] = process
+
+    def _fail_stale_tests(self):
+        """Mark running tests whose worker stopped sending heartbeats as failed"""
+        cutoff = datetime.now() - timedelta(seconds=config.JOB_STALE_AFTER)
+
+        for test in storage.get_all_tests():
+            if test.status != 'running':
+                continue
+            last_seen = test.heartbeat_at or test.started_at
+            if last_seen and datetime.fromisoformat(last_seen) < cutoff:
+                logger.warning("Test %s has no heartbeat since %s, marking as failed", test.test_id, last_seen)
+                storage.update_test(
+                    test.test_id,
+                    status='failed',
+                    completed_at=datetime.now().isoformat(),
+                    error_message=f"Worker {test.worker_id} stopped responding",
+                )
+
+    def stop(self, *_):
+        self._stopping = True
+
+    def run_forever(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        for idx in range(self.num_workers):
+            self._start_worker(f"worker-{idx + 1}")
+
+        try:
+            while not self._stopping:
+                # Restart any worker that died (its test is caught by the stale check)
+                for worker_id, process in list(self.workers.items()):
+                    if not process.is_alive():
+                        logger.warning("%s exited with code %s, restarting", worker_id, process.exitcode)
+                        self._start_worker(worker_id)
+
+                self._fail_stale_tests()
+                time.sleep(self.poll_interval)
+        finally:
+            for process in self.workers.values():
+                process.terminate()
+            for process in self.workers.values():
+                process.join(timeout=10)
+
+
+def _read_pid(pid_file: Path) -> Optional[int]:
+    try:
+        return int(pid_file.read_text().strip())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def is_runner_alive() -> bool:
+    """Check whether the job runner recorded in the pid file is still running"""
+    pid = _read_pid(Path(config.JOB_PID_FILE))
+    if pid is None:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def ensure_workers() -> bool:
+    """
+    Start the job runner in a detached process if it is not already running.
+
+    Returns:
+        True if a new runner was started, False if one was already alive
+    """
+    if is_runner_alive():
+        return False
+
+    log_file = Path(config.JOB_LOG_FILE)
+    log_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(log_file, "a") as log:
+        subprocess.Popen(
+            [sys.executable, "-m", "utils.jobs"],
+            cwd=PROJECT_ROOT,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            start_new_session=True
+        )
+    return True
+
+
+def _setup_logging():
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(processName)s %(levelname)s %(message)s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run classifier tests in background workers")
+    parser.add_argument("--workers", type=int, default=config.JOB_WORKERS, help="Number of worker processes")
+    args = parser.parse_args()
+
+    _setup_logging()
+
+    pid_file = Path(config.JOB_PID_FILE)
+    if is_runner_alive():
+        logger.error("Job runner already running (pid %s)", _read_pid(pid_file))
+        sys.exit(1)
+
+    pid_file.parent.mkdir(parents=True, exist_ok=True)
+    pid_file.write_text(str(os.getpid()))
+    try:
+        JobRunner(num_workers=args.workers).run_forever()
+    finally:
+        if _read_pid(pid_file) == os.getpid():
+            pid_file.unlink()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Metrics module - mergeable KPI counts of classified emails
+
+KpiCounts holds the sufficient statistics of every KPI of ResultsAnalyzer:
+SR outcome counts (ground truth vs predicted opening), quickfill prediction
+and confusion counts, and cascade stage counts. Counts of two chunks or
+files merge by addition and their size depends on the number of labels,
+never on the number of rows. The classifier updates them chunk by chunk,
+so the Test Results page can show KPIs while a test runs and the final
+analysis does not have to read the result files again.
+"""
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from .config import config
+
+SR_ID_COLUMN = config.analysis["sr_id_column"]
+GT_QF_COLUMN = config.analysis["ground_truth_quickfill_column"]
+PRED_OPENING_COLUMN = config.analysis["predicted_opening_column"]
+PRED_QF_COLUMN = config.analysis["predicted_quickfill_column"]
+LABEL_STAGE_COLUMN = config.analysis["label_stage_column"]
+SR_LABEL = config.analysis["sr_labels"]["creation"]
+ARCHIVE_LABEL = config.analysis["sr_labels"]["archive"]
+REVIEW_LABEL = config.analysis["sr_labels"]["review"]
+
+# {true label: {predicted label: rows}}, non-zero pairs only
+PairCounts = Dict[str, Dict[str, int]]
+
+
+def label_codes(df: pd.DataFrame, columns: List[str]) -> Tuple[List[str], Dict[str, np.ndarray]]:
+    """
+    Integer codes of label columns in one shared, sorted label list (the SR
+    opening labels always included), so equal codes mean equal labels across
+    columns. Missing labels are code -1.
+
+    Returns:
+        (labels, {column: codes})
+    """
+    categories = {column: df[column].astype('category') for column in columns}
+    labels = set().union(
+        *(values.cat.categories.astype(str) for values in categories.values()),
+        [SR_LABEL, ARCHIVE_LABEL, REVIEW_LABEL]
+    )
+    labels = sorted(labels)
+    codes = {
+        column: values.cat.rename_categories(values.cat.categories.astype(str))
+        .cat.set_categories(labels).cat.codes.to_numpy()
+        for column, values in categories.items()
+    }
+    return labels, codes
+
+
+def pair_counts(labels: List[str], true_codes: np.ndarray, pred_codes: np.ndarray) -> PairCounts:
+    """Count (true, predicted) code pairs in one np.bincount pass"""
+    num_labels = len(labels)
+    counts = np.bincount(
+        true_codes.astype(np.int64) * num_labels + pred_codes, minlength=num_labels * num_labels
+    ).reshape(num_labels, num_labels)
+    pairs = {}
+    for true_code, pred_code in zip(*np.nonzero(counts)):
+        pairs.setdefault(labels[true_code], {})[labels[pred_code]] = int(counts[true_code, pred_code])
+    return pairs
+
+
+def _merge_pairs(target: PairCounts, pairs: PairCounts):
+    for true_label, row in pairs.items():
+        target_row = target.setdefault(true_label, {})
+        for pred_label, count in row.items():
+            target_row[pred_label] = target_row.get(pred_label, 0) + count
+
+
+@dataclass
+class KpiCounts:
+    """Sufficient statistics of the KPIs of a set of classified emails"""
+    rows: int = 0
+    gt_sr: int = 0  # Ground truth SR creations
+    # Ground truth SR / Archive -> predicted opening -> rows
+    sr_outcomes: PairCounts = field(default_factory=dict)
+    # Predicted quickfill of the predicted SR creations -> rows
+    quickfill_predicted: Dict[str, int] = field(default_factory=dict)
+    # Ground truth -> predicted quickfill -> rows (ground truth and predicted SR creations)
+    quickfill_confusion: PairCounts = field(default_factory=dict)
+    # Cascade stage -> {'count', 'scored' (not Review), 'correct'}; None without a label_stage column
+    stages: Optional[Dict[str, Dict[str, int]]] = None
+
+    def update(self, df: pd.DataFrame):
+        """Add the counts of a classified frame (a result file or chunk)"""
+        columns = [column for column in [PRED_OPENING_COLUMN, PRED_QF_COLUMN, GT_QF_COLUMN] if column in df.columns]
+        labels, codes = label_codes(df, columns)
+        sr_code, archive_code, review_code = (labels.index(label) for label in [SR_LABEL, ARCHIVE_LABEL, REVIEW_LABEL])
+
+        gt_sr = (df[SR_ID_COLUMN].notna() & (df[SR_ID_COLUMN] != 0)).to_numpy()
+        gt_opening = np.where(gt_sr, sr_code, archive_code)
+        pred_opening = codes[PRED_OPENING_COLUMN]
+        answered = pred_opening >= 0
+
+        self.rows += len(df)
+        self.gt_sr += int(gt_sr.sum())
+        _merge_pairs(self.sr_outcomes, pair_counts(labels, gt_opening[answered], pred_opening[answered]))
+
+        predicted_sr = pred_opening == sr_code
+        if PRED_QF_COLUMN in codes:
+            pred_qf = codes[PRED_QF_COLUMN]
+            predicted = pred_qf[predicted_sr & (pred_qf >= 0)]
+            for code, count in enumerate(np.bincount(predicted, minlength=len(labels))):
+                if count:
+                    self.quickfill_predicted[labels[code]] = self.quickfill_predicted.get(labels[code], 0) + int(count)
+
+            if GT_QF_COLUMN in codes:
+                gt_qf = codes[GT_QF_COLUMN]
+                valid = gt_sr & predicted_sr & (gt_qf >= 0) & (pred_qf >= 0)
+                _merge_pairs(self.quickfill_confusion, pair_counts(labels, gt_qf[valid], pred_qf[valid]))
+
+        if LABEL_STAGE_COLUMN in df.columns:
+            stages = df[LABEL_STAGE_COLUMN].astype('category')
+            stage_codes = stages.cat.codes.to_numpy()
+            in_stage = stage_codes >= 0
+            scored = pred_opening != review_code
+            correct = pred_opening == gt_opening
+            self.stages = self.stages or {}
+            num_stages = len(stages.cat.categories)
+            for name, weights in [('count', None), ('scored', scored), ('correct', correct)]:
+                totals = np.bincount(stage_codes[in_stage], weights=None if weights is None else weights[in_stage],
+                                     minlength=num_stages)
+                for code, stage in enumerate(stages.cat.categories.astype(str)):
+                    stage_counts = self.stages.setdefault(stage, {'count': 0, 'scored': 0, 'correct': 0})
+                    stage_counts[name] += int(totals[code])
+
+    def merge(self, other: 'KpiCounts'):
+        """Add the counts of another chunk, file or run"""
+        self.rows += other.rows
+        self.gt_sr += other.gt_sr
+        _merge_pairs(self.sr_outcomes, other.sr_outcomes)
+        for label, count in other.quickfill_predicted.items():
+            self.quickfill_predicted[label] = self.quickfill_predicted.get(label, 0) + count
+        _merge_pairs(self.quickfill_confusion, other.quickfill_confusion)
+        if other.stages is not None:
+            self.stages = self.stages or {}
+            _merge_pairs(self.stages, other.stages)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'KpiCounts':
+        counts = cls()
+        counts.update(df)
+        return counts
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'KpiCounts':
+        # Copy: merging into the result must not change `data`
+        counts = cls()
+        counts.merge(cls(**data))
+        return counts
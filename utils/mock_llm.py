@@ -0,0 +1,161 @@
+"""
+Mock LLM server - local OpenAI-compatible endpoint for offline throughput tests
+
+Answers chat completion requests with deterministic labels (derived from a
+hash of the email text) after a configurable simulated latency. Batched
+requests get one "<n>: <label>" line per email; a share of the lines can be
+dropped to exercise the engine's partial-failure handling. With
+max_in_flight set, requests beyond that many concurrent ones get HTTP 429,
+like a throttling provider. error_rate injects HTTP 500s and slow_rate
+stragglers answered after slow_latency_ms, to exercise retries and hedging.
+
+Start it with:
+    python -m utils.mock_llm --port 8765 --latency-ms 200
+"""
+import argparse
+import asyncio
+import hashlib
+import random
+import re
+from aiohttp import web
+from .config import config
+from .engine import estimate_tokens
+
+# Section header of each email in a batched request
+BATCH_EMAIL_RE = re.compile(r'^### Email (\d+)$', re.MULTILINE)
+
+
+class MockLLM:
+    """Request handler holding the simulated model behaviour"""
+
+    def __init__(self, latency_ms: float, latency_jitter_ms: float, sr_rate: float, batch_drop_rate: float = 0.0,
+                 max_in_flight: int = 0, error_rate: float = 0.0, slow_rate: float = 0.0,
+                 slow_latency_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.sr_rate = sr_rate
+        self.batch_drop_rate = batch_drop_rate
+        self.max_in_flight = max_in_flight
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_latency_ms = slow_latency_ms
+        self.in_flight = 0
+        self.quickfill_labels = config.mock_llm["quickfill_labels"]
+        self.sr_labels = config.analysis["sr_labels"]
+        self.prompts = config.llm["prompts"]
+        self.requests_served = 0
+
+    def _score(self, text: str) -> float:
+        """Stable pseudo-random number in [0, 1) for a given text"""
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        return int.from_bytes(digest[:8], "big") / 2 ** 64
+
+    def _answer(self, system_prompt: str, text: str) -> str:
+        score = self._score(text)
+        if system_prompt.startswith(self.prompts['qf']):
+            return self.quickfill_labels[int(score * len(self.quickfill_labels))]
+        if score < self.sr_rate:
+            return self.sr_labels['creation']
+        if score > 0.98:
+            return self.sr_labels['review']
+        return self.sr_labels['archive']
+
+    async def handle_completion(self, request: web.Request) -> web.Response:
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            return web.json_response({"error": {"message": "Rate limit exceeded"}}, status=429)
+
+        self.in_flight += 1
+        try:
+            return await self._complete(request)
+        finally:
+            self.in_flight -= 1
+
+    async def _complete(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        messages = payload.get("messages", [])
+        system_prompt = next((m["content"] for m in messages if m["role"] == "system"), "")
+        user_text = "\n".join(m["content"] for m in messages if m["role"] == "user")
+
+        delay = max(0.0, random.gauss(self.latency_ms, self.latency_jitter_ms)) / 1000
+        if random.random() < self.slow_rate:
+            delay = self.slow_latency_ms / 1000
+        await asyncio.sleep(delay)
+
+        if random.random() < self.error_rate:
+            return web.json_response({"error": {"message": "Internal error"}}, status=500)
+
+        self.requests_served += 1
+        parts = BATCH_EMAIL_RE.split(user_text)
+        if len(parts) > 1:
+            # parts = [preamble, n1, text1, n2, text2, ...]
+            lines = [
+                f"{number}: {self._answer(system_prompt, text.strip())}"
+                for number, text in zip(parts[1::2], parts[2::2])
+                if random.random() >= self.batch_drop_rate
+            ]
+            content = "\n".join(lines)
+        else:
+            content = self._answer(system_prompt, user_text.strip())
+        return web.json_response({
+            "id": f"mock-{self.requests_served}",
+            "object": "chat.completion",
+            "model": payload.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": sum(estimate_tokens(m["content"]) for m in messages),
+                "completion_tokens": estimate_tokens(content),
+            },
+        })
+
+
+def create_app(latency_ms: float = None, latency_jitter_ms: float = None, sr_rate: float = None,
+               batch_drop_rate: float = None, max_in_flight: int = None, error_rate: float = None,
+               slow_rate: float = None, slow_latency_ms: float = None) -> web.Application:
+    """Build the aiohttp application (defaults come from config.json)"""
+    settings = config.mock_llm
+    mock = MockLLM(
+        latency_ms=settings["latency_ms"] if latency_ms is None else latency_ms,
+        latency_jitter_ms=settings["latency_jitter_ms"] if latency_jitter_ms is None else latency_jitter_ms,
+        sr_rate=settings["sr_rate"] if sr_rate is None else sr_rate,
+        batch_drop_rate=settings["batch_drop_rate"] if batch_drop_rate is None else batch_drop_rate,
+        max_in_flight=settings["max_in_flight"] if max_in_flight is None else max_in_flight,
+        error_rate=settings["error_rate"] if error_rate is None else error_rate,
+        slow_rate=settings["slow_rate"] if slow_rate is None else slow_rate,
+        slow_latency_ms=settings["slow_latency_ms"] if slow_latency_ms is None else slow_latency_ms,
+    )
+    app = web.Application()
+    app["mock"] = mock
+    app.router.add_post("/v1/chat/completions", mock.handle_completion)
+    return app
+
+
+def main():
+    settings = config.mock_llm
+    parser = argparse.ArgumentParser(description="Run a local mock LLM endpoint")
+    parser.add_argument("--host", default=settings["host"])
+    parser.add_argument("--port", type=int, default=settings["port"])
+    parser.add_argument("--latency-ms", type=float, default=settings["latency_ms"])
+    parser.add_argument("--latency-jitter-ms", type=float, default=settings["latency_jitter_ms"])
+    parser.add_argument("--sr-rate", type=float, default=settings["sr_rate"])
+    parser.add_argument("--batch-drop-rate", type=float, default=settings["batch_drop_rate"],
+                        help="Share of answer lines dropped from batched responses")
+    parser.add_argument("--max-in-flight", type=int, default=settings["max_in_flight"],
+                        help="Concurrent requests served before answering 429 (0 = unlimited)")
+    parser.add_argument("--error-rate", type=float, default=settings["error_rate"],
+                        help="Share of requests answered with HTTP 500")
+    parser.add_argument("--slow-rate", type=float, default=settings["slow_rate"],
+                        help="Share of requests delayed to --slow-latency-ms (stragglers)")
+    parser.add_argument("--slow-latency-ms", type=float, default=settings["slow_latency_ms"])
+    args = parser.parse_args()
+
+    app = create_app(args.latency_ms, args.latency_jitter_ms, args.sr_rate, args.batch_drop_rate,
+                     args.max_in_flight, args.error_rate, args.slow_rate, args.slow_latency_ms)
+    web.run_app(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -18,15 +18,39 @@ class TestResult:
     async_mode: bool
     max_concurrency: int
     created_at: str
+    batch_size: Optional[int] = None  # Emails per LLM request (None = mode default)
+    streaming: bool = False  # Read / classify / write source files in chunks
+    resume: bool = False  # Continue from the checkpoints of an interrupted run
+    collapse_near_duplicates: bool = False  # Classify one email per near-duplicate cluster
+    cascade: bool = False  # Label confident SR / Archive cases with the local model first
+    adaptive_concurrency: bool = False  # Tune the in-flight limit at runtime (max_concurrency = start)
+    hedging: bool = False  # Duplicate requests slower than the observed p95 latency
+    output_format: str = 'same'  # Format of the *_result files: same / csv / xlsx / parquet
+    sample_fraction: Optional[float] = None  # Stratified sample per file: fraction of the filtered rows
+    sample_rows: Optional[int] = None  # Stratified sample per file: filtered rows (None for both = all)
     started_at: Optional[str] = None
     completed_at: Optional[str] = None
     error_message: Optional[str] = None
+    analysis_error: Optional[str] = None  # Why the detailed analysis of a completed test failed
     total_emails: Optional[int] = None
     processed_emails: Optional[int] = None
     sr_positive: Optional[int] = None
     sr_negative: Optional[int] = None
     category_breakdown: Optional[dict] = None
     file_analyses: Optional[List[dict]] = None  # Per-file detailed analysis
+    file_stats: Optional[List[dict]] = None  # Per-file pre-filter stats from run_classifier (for re-analysis)
+    cache_hits: Optional[int] = None  # Predictions served from the prediction cache
+    cache_misses: Optional[int] = None
+    prediction_stats: Optional[dict] = None  # Engine counters (requests, failures, tokens...)
+    concurrency_history: Optional[dict] = None  # File -> [[seconds, in-flight limit], ...]
+    latency_percentiles: Optional[dict] = None  # p50 / p95 / p99 prediction call latency (ms)
+    normalization_stats: Optional[dict] = None  # Stage -> {'ms': run time, 'tokens_removed': n}
+    live_metrics: Optional[dict] = None  # Source file -> KPI counts so far (utils/metrics.py), while running
+    worker_id: Optional[str] = None  # Job worker that claimed the test
+    heartbeat_at: Optional[str] = None  # Last liveness update from the worker
+    progress_current: Optional[int] = None
+    progress_total: Optional[int] = None
+    progress_message: Optional[str] = None
 
     def to_dict(self):
         return asdict(self)
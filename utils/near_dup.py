@@ -0,0 +1,168 @@
+"""
+Near-duplicate module - MinHash / LSH clustering of email texts
+
+Reply chains and automatic notifications are often almost identical. Each
+email is reduced to the set of its word shingles and summarised by a MinHash
+signature; LSH banding finds candidate pairs without comparing every pair,
+and candidates whose estimated Jaccard similarity reaches the threshold are
+merged into one cluster. Only one representative per cluster has to be sent
+to the LLM.
+"""
+import zlib
+from itertools import chain
+from typing import Dict, List, Tuple
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from .config import config
+
+# Mersenne prime 2^31 - 1: shingle hashes stay below 2^31, so h * base + w stays below 2^63
+_PRIME = np.uint64((1 << 31) - 1)
+# Base of the polynomial hash combining the word hashes of a shingle
+_SHINGLE_BASE = np.uint64(1_000_003)
+# Candidate pairs verified at once (bounds the memory of the signature comparison)
+_VERIFY_BLOCK = 100_000
+
+
+def shingle_hashes(texts: List[str], shingle_size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Stable 31-bit hashes of the lower-cased word shingles of every text.
+
+    Each distinct word is hashed once; shingle hashes are polynomial
+    combinations of their word hashes computed for all texts at once. A text
+    with fewer words than shingle_size is a single shingle (an empty text
+    hashes to 0).
+
+    Returns:
+        (hashes, starts): the shingle hashes of all texts concatenated, and
+        the offset of the first shingle of each text
+    """
+    words = [text.lower().split() for text in texts]
+    num_words = np.fromiter((len(w) for w in words), dtype=np.int64, count=len(words))
+    codes, vocabulary = pd.factorize(pd.Series(list(chain.from_iterable(words)), dtype=object))
+    # crc32 rather than hash(): identical across processes and runs
+    word_hashes = np.fromiter(
+        (zlib.crc32(word.encode("utf-8")) & 0x7FFFFFFF for word in vocabulary), dtype=np.uint64, count=len(vocabulary)
+    )
+    # Trailing 0 keeps the (masked) lookups of empty texts in bounds
+    flat = np.append(word_hashes[codes], np.uint64(0))
+
+    num_shingles = np.maximum(num_words - shingle_size + 1, 1)
+    starts = np.concatenate(([0], np.cumsum(num_shingles)[:-1]))
+    text_of_shingle = np.repeat(np.arange(len(texts)), num_shingles)
+    word_offsets = np.concatenate(([0], np.cumsum(num_words)[:-1]))
+    first_word = word_offsets[text_of_shingle] + np.arange(len(text_of_shingle)) - starts[text_of_shingle]
+    span = np.minimum(num_words, shingle_size)[text_of_shingle]
+
+    hashes = np.zeros(len(text_of_shingle), dtype=np.uint64)
+    for offset in range(shingle_size):
+        in_shingle = offset < span
+        combined = (hashes * _SHINGLE_BASE + flat[np.where(in_shingle, first_word + offset, -1)]) % _PRIME
+        hashes = np.where(in_shingle, combined, hashes)
+    return hashes, starts
+
+
+def minhash_signatures(texts: List[str], num_perm: int, shingle_size: int, seed: int = 1) -> np.ndarray:
+    """Return a (len(texts), num_perm) array of MinHash signatures"""
+    values, starts = shingle_hashes(texts, shingle_size)
+
+    # Multiply-shift hashing: the high 32 bits of a * x + b (mod 2^64) for odd a
+    rng = np.random.default_rng(seed)
+    a = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    b = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64)
+    shift = np.uint64(32)
+
+    signatures = np.empty((len(texts), num_perm), dtype=np.uint64)
+    permuted = np.empty_like(values)
+    # One permutation at a time, in place, keeps memory at O(total shingles);
+    # every text has at least one shingle, so reduceat segments are never empty
+    for perm in range(num_perm):
+        np.multiply(values, a[perm], out=permuted)
+        np.add(permuted, b[perm], out=permuted)
+        np.right_shift(permuted, shift, out=permuted)
+        signatures[:, perm] = np.minimum.reduceat(permuted, starts)
+    return signatures
+
+
+def _bucket_pairs(keys: np.ndarray, window: int) -> np.ndarray:
+    """
+    (n, 2) array of the pairs of positions sharing a key, each position
+    paired with the next `window` positions of its bucket
+    """
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    bucket_starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    sizes = np.diff(np.r_[bucket_starts, len(keys)])
+    # End (exclusive) of the bucket of every sorted position
+    ends = np.repeat(bucket_starts + sizes, sizes)
+
+    positions = np.arange(len(keys))
+    pairs = [np.empty((0, 2), dtype=np.int64)]
+    for gap in range(1, window + 1):
+        firsts = positions[positions + gap < ends]
+        if firsts.size == 0:
+            break
+        pairs.append(np.column_stack((order[firsts], order[firsts + gap])))
+    return np.concatenate(pairs)
+
+
+def near_duplicate_clusters(texts: pd.Series, settings: Dict = None) -> pd.Series:
+    """
+    Group near-duplicate texts.
+
+    Identical texts are hashed once. Within every LSH bucket each distinct
+    text is compared with the next bucket_window texts of the bucket (all of
+    them in buckets of up to bucket_window + 1 texts, while huge buckets of
+    templated notifications stay linear), and the clusters are the connected
+    components of the pairs that reach the similarity threshold.
+
+    Args:
+        texts: Email texts, indexed by row label
+        settings: MinHash / LSH parameters (defaults to the "near_duplicates"
+            section of config.json)
+
+    Returns:
+        Series aligned with `texts` holding, for every row, the label of the
+        first row of its cluster (a row that has no near-duplicate is its own
+        cluster)
+    """
+    if texts.empty:
+        return pd.Series(dtype=object, index=texts.index)
+
+    settings = settings or config.near_duplicates
+    num_perm = settings["num_perm"]
+    bands = settings["bands"]
+    rows_per_band = num_perm // bands
+
+    # Reply chains and notifications are often exact duplicates: hash each distinct text once
+    distinct, unique_texts = pd.factorize(texts, use_na_sentinel=False)
+    signatures = minhash_signatures(list(unique_texts), num_perm, settings["shingle_size"], settings.get("seed", 1))
+
+    candidates = []
+    for band in range(bands):
+        band_values = np.ascontiguousarray(signatures[:, band * rows_per_band:(band + 1) * rows_per_band])
+        keys = band_values.view(np.dtype((np.void, band_values.dtype.itemsize * rows_per_band))).ravel()
+        candidates.append(_bucket_pairs(keys, settings["bucket_window"]))
+    # Pairs found in several bands are verified once
+    candidates = np.sort(np.concatenate(candidates), axis=1)
+    pair_codes = np.unique(candidates @ np.array([len(signatures), 1]))
+    candidates = np.column_stack(np.divmod(pair_codes, len(signatures)))
+
+    # Verify candidates: the fraction of equal MinHash values estimates Jaccard similarity
+    similar = [np.empty((0, 2), dtype=np.int64)]
+    for start in range(0, len(candidates), _VERIFY_BLOCK):
+        block = candidates[start:start + _VERIFY_BLOCK]
+        similarity = (signatures[block[:, 0]] == signatures[block[:, 1]]).mean(axis=1)
+        similar.append(block[similarity >= settings["threshold"]])
+    similar = np.concatenate(similar)
+    graph = coo_matrix(
+        (np.ones(len(similar), dtype=np.int8), (similar[:, 0], similar[:, 1])), shape=(len(signatures),) * 2
+    )
+    _, components = connected_components(graph, directed=False)
+
+    # Label every cluster with its first row
+    components = components[distinct]
+    first_rows = np.full(components.max() + 1, len(texts))
+    np.minimum.at(first_rows, components, np.arange(len(texts)))
+    return pd.Series(texts.index[first_rows[components]], index=texts.index)
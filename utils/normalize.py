@@ -0,0 +1,166 @@
+"""
+Normalize module - vectorized clean-up of email texts before classification
+
+Stages run in the order listed in the "normalization" section of
+config.json, each as compiled regexes applied to a whole frame (or
+streaming chunk) with pandas string methods:
+    - html: convert HTML bodies (with known tags or markers) to plain text
+    - quoted_replies: drop "> " quoted lines and everything from the first
+      quoted earlier message ("-----Original Message-----", a line ending
+      in "On ... wrote:", "From: ... / Sent: ...")
+    - disclaimers: drop everything from the first disclaimer line on
+    - signatures: drop everything from the first signature line on
+    - whitespace: collapse runs of blanks and empty lines
+
+A stage never empties the body: an email that starts with a quoted or
+forwarded message, a signature or a disclaimer keeps its original text, as
+that is all the content there is.
+
+The normalized text is what the prediction cache key and the prompt are
+built from, so it saves tokens and turns trivially different emails into
+cache hits. Each stage reports its run time and the tokens it removed.
+"""
+import html
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+import pandas as pd
+from .config import config
+
+# Same ~4 characters per token rule as engine.estimate_tokens
+CHARS_PER_TOKEN = 4
+
+# A tag name is followed by attributes, "/" or ">": "<john.doe@bank.com>" is not a tag
+HTML_TAG_RE = re.compile(r'<(?:/?[a-zA-Z][\w:-]*(?:\s[^>]*)?/?|![^>]*)>')
+# Only texts with well-known tags or markers are treated as HTML
+HTML_MARKER_RE = re.compile(
+    r'<(?:!doctype\s+html|!--'
+    r'|/?(?:html|head|body|div|p|br|span|table|tr|td|th|tbody|thead|ul|ol|li|a|b|i|u|strong|em|font|img'
+    r'|h[1-6]|hr|style|script|meta|title|center|blockquote|pre)\b[^>]*)>',
+    re.IGNORECASE
+)
+HTML_HIDDEN_RE = re.compile(r'<(script|style|head)\b.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+HTML_BREAK_RE = re.compile(r'<(?:br|/p|/div|/tr|/li|/h[1-6])\b[^>]*>', re.IGNORECASE)
+HTML_ENTITY_RE = re.compile(r'&(?:#\d+|#x[0-9a-fA-F]+|[a-zA-Z]+\d*);')
+
+# "> " quoted lines of a reply
+QUOTED_LINE_RE = re.compile(r'^[ \t]*>.*(?:\n|$)', re.MULTILINE)
+# Header of a quoted earlier message, and everything after it
+QUOTED_THREAD_RE = re.compile(
+    r'^[ \t]*(?:-{2,}[ \t]*Original Message[ \t]*-{2,}'
+    r'|On [^\n]{1,200}wrote:[ \t]*$'
+    r'|From:[^\n]*\n[ \t]*(?:Sent|Date):)(?s:.*)',
+    re.IGNORECASE | re.MULTILINE
+)
+
+# Subject line built by classifier.build_email_text, and forwarded message
+# markers: neither counts as body content
+SUBJECT_LINE_RE = re.compile(r'\ASubject:[^\n]*')
+FORWARD_MARKER_RE = re.compile(
+    r'^[ \t]*-{2,}[ \t]*(?:Forwarded message|Original Message)[ \t]*-*[ \t]*$', re.IGNORECASE | re.MULTILINE
+)
+WORD_RE = re.compile(r'\w')
+
+BLANKS_RE = re.compile(r'[ \t\u00a0]+')
+TRAILING_BLANKS_RE = re.compile(r'[ \t]+$', re.MULTILINE)
+EMPTY_LINES_RE = re.compile(r'\n{3,}')
+
+
+def _cut_pattern(patterns: List[str]) -> Optional[re.Pattern]:
+    """One regex matching the first line that matches any pattern, through the end of the text"""
+    if not patterns:
+        return None
+    alternation = "|".join(f"(?:{pattern})" for pattern in patterns)
+    return re.compile(f"(?:{alternation})(?s:.*)", re.IGNORECASE | re.MULTILINE)
+
+
+def has_body(texts: pd.Series) -> pd.Series:
+    """Whether each text has body content besides its subject line and forwarded message markers"""
+    body = texts.str.replace(SUBJECT_LINE_RE, '', regex=True).str.replace(FORWARD_MARKER_RE, '', regex=True)
+    return body.str.contains(WORD_RE, na=False)
+
+
+def keep_body(original: pd.Series, stripped: pd.Series) -> pd.Series:
+    """Stripped texts, except where stripping left no body: those keep the original text"""
+    changed = stripped != original
+    emptied = pd.Series(False, index=original.index)
+    emptied[changed] = ~has_body(stripped[changed])
+    return stripped.where(~emptied, original)
+
+
+def cut_from(texts: pd.Series, pattern: re.Pattern) -> pd.Series:
+    """Drop everything from the first match of `pattern` on, unless that leaves no body"""
+    return keep_body(texts, texts.str.replace(pattern, '', regex=True))
+
+
+def html_to_text(texts: pd.Series) -> pd.Series:
+    has_html = texts.str.contains(HTML_MARKER_RE, na=False)
+    if not has_html.any():
+        return texts
+    converted = (
+        texts[has_html]
+        .str.replace(HTML_HIDDEN_RE, '', regex=True)
+        .str.replace(HTML_BREAK_RE, '\n', regex=True)
+        .str.replace(HTML_TAG_RE, '', regex=True)
+        .str.replace(HTML_ENTITY_RE, lambda match: html.unescape(match.group(0)), regex=True)
+    )
+    converted = keep_body(texts[has_html], converted)
+    texts = texts.copy()
+    texts[has_html] = converted
+    return texts
+
+
+def strip_quoted_replies(texts: pd.Series) -> pd.Series:
+    stripped = texts.str.replace(QUOTED_LINE_RE, '', regex=True).str.replace(QUOTED_THREAD_RE, '', regex=True)
+    return keep_body(texts, stripped)
+
+
+def collapse_whitespace(texts: pd.Series) -> pd.Series:
+    texts = texts.str.replace(BLANKS_RE, ' ', regex=True).str.replace(TRAILING_BLANKS_RE, '', regex=True)
+    return texts.str.replace(EMPTY_LINES_RE, '\n\n', regex=True).str.strip()
+
+
+def normalize_texts(texts: pd.Series, settings: Optional[Dict] = None) -> Tuple[pd.Series, Dict[str, Dict[str, int]]]:
+    """
+    Run the configured normalization stages over email texts.
+
+    Args:
+        texts: Email texts (subject and body)
+        settings: Normalization settings (defaults to the "normalization"
+            section of config.json)
+
+    Returns:
+        (normalized texts, {stage: {'ms': run time, 'tokens_removed': estimated tokens}})
+    """
+    settings = settings or config.normalization
+    if not settings["enabled"] or texts.empty:
+        return texts, {}
+
+    cuts = {
+        'disclaimers': _cut_pattern(settings["disclaimer_patterns"]),
+        'signatures': _cut_pattern(settings["signature_patterns"]),
+    }
+    stages = {
+        'html': html_to_text,
+        'quoted_replies': strip_quoted_replies,
+        'disclaimers': lambda values: cut_from(values, cuts['disclaimers']),
+        'signatures': lambda values: cut_from(values, cuts['signatures']),
+        'whitespace': collapse_whitespace,
+    }
+
+    stats = {}
+    total_chars = texts.str.len().sum()
+    for stage in settings["stages"]:
+        if stage not in stages:
+            raise ValueError(f"Unknown normalization stage: {stage}")
+        if stage in cuts and cuts[stage] is None:
+            continue
+        started = time.perf_counter()
+        texts = stages[stage](texts)
+        chars = texts.str.len().sum()
+        stats[stage] = {
+            'ms': round((time.perf_counter() - started) * 1000, 3),
+            'tokens_removed': int((total_chars - chars) // CHARS_PER_TOKEN),
+        }
+        total_chars = chars
+    return texts, stats
@@ -0,0 +1,36 @@
+"""
+Prediction cache - persistent SQLite store of LLM labels keyed by email content
+
+Keys are sha256(task, model/prompt version, normalized email text), so a
+prediction is reused only when the same email is classified with the same
+model and prompt. The LRU store itself is utils/sqlite_cache.py.
+"""
+import hashlib
+from .config import config
+from .sqlite_cache import SQLiteLRUCache
+
+
+def normalize_for_key(text: str) -> str:
+    """Collapse whitespace so formatting-only differences share a cache entry"""
+    return " ".join(text.split())
+
+
+def prompt_version(*parts: str) -> str:
+    """Short fingerprint of the model name and prompt text"""
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def make_key(task: str, version: str, text: str) -> str:
+    payload = f"{task}\x1f{version}\x1f{normalize_for_key(text)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class PredictionCache(SQLiteLRUCache):
+    """Size-bounded LRU cache of predicted labels (key -> label) backed by SQLite"""
+
+    TABLE = "predictions"
+    VALUE_COLUMN = "label"
+
+    def __init__(self, path: str = config.prediction_cache["path"],
+                 max_entries: int = config.prediction_cache["max_entries"]):
+        super().__init__(path, max_entries)
@@ -0,0 +1,56 @@
+"""
+Prompts module - token-budgeted prompt assembly
+
+The system message (task prompt, plus the batch instructions for batched
+requests) is built once per process and reused as the exact same string
+for every call, so providers that cache prompt prefixes can reuse it.
+
+Email texts (normalized by utils/normalize.py) are truncated to the
+max_email_tokens of the "prompt_budget" section of config.json before they
+are sent. Long threads would otherwise dominate both the latency and the
+cost of a run.
+"""
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+import pandas as pd
+from .config import config
+from .normalize import CHARS_PER_TOKEN
+
+
+@lru_cache(maxsize=None)
+def system_prompt(task: str, batched: bool) -> str:
+    """Static system message of a task (built once, byte-identical for every call)"""
+    prompt = config.llm["prompts"][task]
+    if batched:
+        return f"{prompt}\n\n{config.llm['batch_instructions']}"
+    return prompt
+
+
+def fit_emails(texts: pd.Series, settings: Optional[Dict] = None) -> Tuple[pd.Series, pd.Series, Dict[str, int]]:
+    """
+    Fit email texts to the per-email token budget.
+
+    Args:
+        texts: Email texts (subject and body)
+        settings: Budget settings (defaults to the "prompt_budget" section of config.json)
+
+    Returns:
+        (fitted texts, estimated tokens of each fitted text, counters:
+        trimmed_emails / trimmed_tokens)
+    """
+    settings = settings or config.prompt_budget
+    original_lengths = texts.str.len()
+
+    max_chars = settings["max_email_tokens"] * CHARS_PER_TOKEN
+    if max_chars:
+        # Keep the head: the subject and the newest part of the thread
+        texts = texts.str.slice(0, max_chars)
+
+    lengths = texts.str.len()
+    tokens = (lengths // CHARS_PER_TOKEN).clip(lower=1)
+    trimmed = lengths < original_lengths
+    counts = {
+        'trimmed_emails': int(trimmed.sum()),
+        'trimmed_tokens': int(((original_lengths - lengths) // CHARS_PER_TOKEN).sum()),
+    }
+    return texts, tokens, counts
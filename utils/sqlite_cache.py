@@ -0,0 +1,89 @@
+"""
+SQLite cache - size-bounded LRU key/value store shared by the persistent caches
+
+Each cache keeps one table of (key, value, last_used) rows; values are text
+and their encoding is left to the cache using the store. Entries are evicted
+least-recently-used once the table grows past max_entries.
+"""
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable
+
+# SQLite limits the number of bound parameters per statement
+_QUERY_CHUNK = 500
+
+
+class SQLiteLRUCache:
+    """Size-bounded LRU cache of text values backed by SQLite"""
+
+    # Set by subclasses: table name and name of its value column
+    TABLE: str
+    VALUE_COLUMN: str
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+
+        # Shared by job workers, analysis processes and the Streamlit pages:
+        # WAL lets readers proceed during writes
+        self.conn = sqlite3.connect(self.path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.TABLE} ("
+            " key TEXT PRIMARY KEY,"
+            f" {self.VALUE_COLUMN} TEXT NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_last_used ON {self.TABLE} (last_used)")
+        self.conn.commit()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, str]:
+        """Return the cached value of every key that is present"""
+        keys = list(dict.fromkeys(keys))
+        found: Dict[str, str] = {}
+        for start in range(0, len(keys), _QUERY_CHUNK):
+            chunk = keys[start:start + _QUERY_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT key, {self.VALUE_COLUMN} FROM {self.TABLE} WHERE key IN ({placeholders})", chunk
+            ).fetchall()
+            found.update(rows)
+
+        if found:
+            # Refresh recency of the hits for LRU eviction
+            now = time.time()
+            self.conn.executemany(
+                f"UPDATE {self.TABLE} SET last_used = ? WHERE key = ?",
+                [(now, key) for key in found]
+            )
+            self.conn.commit()
+        return found
+
+    def put_many(self, items: Dict[str, str]):
+        """Store values and evict the least recently used entries if over capacity"""
+        if not items:
+            return
+        now = time.time()
+        self.conn.executemany(
+            f"INSERT OR REPLACE INTO {self.TABLE} (key, {self.VALUE_COLUMN}, last_used) VALUES (?, ?, ?)",
+            [(key, value, now) for key, value in items.items()]
+        )
+        self._evict()
+        self.conn.commit()
+
+    def _evict(self):
+        count = self.conn.execute(f"SELECT COUNT(*) FROM {self.TABLE}").fetchone()[0]
+        if count <= self.max_entries:
+            return
+        # Evict down to 90% so eviction does not run on every insert
+        excess = count - int(self.max_entries * 0.9)
+        self.conn.execute(
+            f"DELETE FROM {self.TABLE} WHERE key IN "
+            f"(SELECT key FROM {self.TABLE} ORDER BY last_used LIMIT ?)",
+            (excess,)
+        )
+
+    def close(self):
+        self.conn.close()
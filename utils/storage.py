@@ -1,16 +1,32 @@
+import fcntl
 import json
+import os
+from contextlib import contextmanager
 from pathlib import Path
 from typing import List, Optional
+from .config import config
 from .models import TestResult
 
 
 class TestStorage:
-    def __init__(self, storage_path: str = "./data/test_history.json"):
+    def __init__(self, storage_path: str = config.TEST_HISTORY_FILE):
         self.storage_path = Path(storage_path)
         self.storage_path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock_path = self.storage_path.with_suffix(self.storage_path.suffix + ".lock")
         if not self.storage_path.exists():
             self.storage_path.write_text("[]")
 
+    @contextmanager
+    def _locked(self):
+        # History is shared between the Streamlit app and the job workers,
+        # so every read-modify-write cycle runs under an exclusive file lock
+        with open(self.lock_path, "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
     def _read_history(self) -> List[dict]:
         try:
             with open(self.storage_path, "r") as f:
@@ -22,24 +38,54 @@ class TestStorage:
         # Keep only the latest max_items
         if len(history) > max_items:
             history = history[-max_items:]
-        with open(self.storage_path, "w") as f:
+        # Write to a temp file and swap it in so readers never see a partial file
+        tmp_path = self.storage_path.with_suffix(self.storage_path.suffix + ".tmp")
+        with open(tmp_path, "w") as f:
             json.dump(history, f, indent=2)
+        os.replace(tmp_path, self.storage_path)
 
     def save_test(self, test: TestResult):
-        history = self._read_history()
-        test_dict = test.to_dict()
+        with self._locked():
+            history = self._read_history()
+            test_dict = test.to_dict()
 
-        # Update existing or append new
-        existing_idx = next(
-            (i for i, t in enumerate(history) if t["test_id"] == test.test_id),
-            None
-        )
-        if existing_idx is not None:
-            history[existing_idx] = test_dict
-        else:
-            history.append(test_dict)
+            # Update existing or append new
+            existing_idx = next(
+                (i for i, t in enumerate(history) if t["test_id"] == test.test_id),
+                None
+            )
+            if existing_idx is not None:
+                history[existing_idx] = test_dict
+            else:
+                history.append(test_dict)
 
-        self._write_history(history)
+            self._write_history(history)
+
+    def update_test(self, test_id: str, **fields) -> Optional[TestResult]:
+        with self._locked():
+            history = self._read_history()
+            test_dict = next((t for t in history if t["test_id"] == test_id), None)
+            if test_dict is None:
+                return None
+            test_dict.update(fields)
+            self._write_history(history)
+            return TestResult.from_dict(test_dict)
+
+    def claim_next_pending(self, worker_id: str, claimed_at: str) -> Optional[TestResult]:
+        with self._locked():
+            history = self._read_history()
+            # Oldest pending test first
+            test_dict = next((t for t in history if t["status"] == "pending"), None)
+            if test_dict is None:
+                return None
+            test_dict.update({
+                "status": "running",
+                "worker_id": worker_id,
+                "started_at": test_dict.get("started_at") or claimed_at,
+                "heartbeat_at": claimed_at,
+            })
+            self._write_history(history)
+            return TestResult.from_dict(test_dict)
 
     def get_test(self, test_id: str) -> Optional[TestResult]:
         history = self._read_history()
@@ -54,9 +100,10 @@ class TestStorage:
         return [TestResult.from_dict(t) for t in reversed(history)]
 
     def delete_test(self, test_id: str):
-        history = self._read_history()
-        history = [t for t in history if t["test_id"] != test_id]
-        self._write_history(history)
+        with self._locked():
+            history = self._read_history()
+            history = [t for t in history if t["test_id"] != test_id]
+            self._write_history(history)
 
 
 # Global storage instance